@@ -0,0 +1,218 @@
+"""
+Admission control for enhancement work
+
+Each enhancement is admitted against two limits: how many may run at once
+and how much memory their estimated working sets may claim together. Work
+that does not fit waits in a bounded FIFO queue for up to a deadline; when
+the queue is full or the deadline passes the request is shed with 503 and a
+Retry-After hint instead of piling onto the worker pool until the container
+runs out of memory.
+
+Costs are estimated from the image dimensions, which are read from the
+PNG/JPEG/BMP header (app.uploads) without decoding the image. Scratch
+buffers each worker keeps between float32 enhancements stay resident while
+it is idle, so that much is reserved off the budget up front (at most
+MAX_SCRATCH_FRACTION of it; scratch_limit_bytes lowers the per-worker limit
+to fit).
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional, Tuple
+
+from app.logger import get_logger
+from app.config import settings
+from app.exceptions import ServiceUnavailableError
+from app.metrics import admission_rejections_total, admission_waiting
+from app.uploads import read_image_header
+
+logger = get_logger(__name__)
+
+# Peak float working set of the engine per pixel (measured ~89 bytes)
+WORKING_BYTES_PER_PIXEL = 96
+
+# Share of the memory budget that workers' retained scratch buffers may take
+MAX_SCRATCH_FRACTION = 0.25
+
+# Rows FingerprintEnhancer.enhance resizes to unless full_resolution is set
+WORKING_ROWS = 350
+
+# Marker for "use ADMISSION_WAIT_TIMEOUT_SECONDS"
+DEFAULT_TIMEOUT = object()
+
+def estimate_memory_bytes(contents: bytes, full_resolution: bool = False) -> int:
+    """
+    Estimate the peak memory of enhancing an upload
+
+    Counts the upload, the decoded frame and the engine's float working set
+    (bounded by ENHANCEMENT_MEMORY_BUDGET_MB when tiled). Unreadable headers
+    are charged the full tiling budget.
+    """
+    budget = settings.enhancement_memory_budget_mb * 1024 * 1024
+    header = read_image_header(contents)
+    if header is None or header.width == 0 or header.height == 0:
+        return len(contents) + budget
+
+    width, height = header.width, header.height
+    pixels = width * height
+    if full_resolution:
+        working = min(pixels * WORKING_BYTES_PER_PIXEL, budget)
+    else:
+        working = WORKING_ROWS * math.ceil(WORKING_ROWS * width / height) * WORKING_BYTES_PER_PIXEL
+    # Decoding may go through a 3-channel buffer before conversion to gray
+    return len(contents) + pixels * 4 + working
+
+class AdmissionController:
+    """Concurrency and memory limits with a bounded, deadline-aware wait queue"""
+
+    def __init__(self, max_concurrent: int, memory_budget_bytes: int, max_waiting: int,
+                 wait_timeout_seconds: Optional[float], reserved_bytes: int = 0):
+        self.max_concurrent = max(1, max_concurrent)
+        if reserved_bytes >= memory_budget_bytes:
+            raise ValueError(f"Reserved memory ({reserved_bytes} bytes) leaves no admission memory budget")
+        # Memory held outside admitted work (idle workers' scratch) is not available to it
+        self.reserved_bytes = reserved_bytes
+        self.memory_budget_bytes = memory_budget_bytes - reserved_bytes
+        self.max_waiting = max_waiting
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self.active = 0
+        self.memory_in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # Smoothed time work holds its admission, for Retry-After estimates
+        self._hold_seconds = 1.0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        return max(1, math.ceil(self._hold_seconds * (self.waiting + 1) / self.max_concurrent))
+
+    def _fits(self, cost: int) -> bool:
+        return self.active < self.max_concurrent and self.memory_in_use + cost <= self.memory_budget_bytes
+
+    def _take(self, cost: int):
+        self.active += 1
+        self.memory_in_use += cost
+
+    def _release(self, cost: int):
+        self.active -= 1
+        self.memory_in_use -= cost
+        self._drain()
+
+    def _drain(self):
+        # Strict FIFO, so large images are not starved by a stream of small ones
+        while self._waiters and self._fits(self._waiters[0][0]):
+            waiter_cost, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._take(waiter_cost)
+            future.set_result(None)
+
+    def _shed(self, reason: str, message: str):
+        admission_rejections_total.labels(reason).inc()
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding enhancement ({reason}): {self.active} running, {self.waiting} waiting")
+        raise ServiceUnavailableError(message, retry_after=retry_after)
+
+    async def _acquire(self, cost: int, timeout: Optional[float], shed: bool):
+        if not self._waiters and self._fits(cost):
+            self._take(cost)
+            return
+        if shed and self.waiting >= self.max_waiting:
+            self._shed("queue_full", "Server is at capacity, retry later")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (cost, future)
+        self._waiters.append(entry)
+        admission_waiting.inc()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._shed("timeout", "Timed out waiting for enhancement capacity, retry later")
+        except BaseException:
+            # Cancelled (e.g. client went away) right after being admitted
+            if future.done() and not future.cancelled():
+                self._release(cost)
+            raise
+        finally:
+            admission_waiting.dec()
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                self._drain()
+
+    @asynccontextmanager
+    async def admit(self, cost_bytes: int, timeout=DEFAULT_TIMEOUT, shed: bool = True):
+        """
+        Hold an admission slot for the duration of the block
+
+        Args:
+            cost_bytes: Estimated peak memory; capped at the budget so an
+                oversized image still runs, alone
+            timeout: Seconds to wait for capacity (None waits indefinitely)
+            shed: Reject with 503 when the wait queue is full; internal
+                callers that are already bounded (jobs, batch items) pass False
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.wait_timeout_seconds
+        cost = min(cost_bytes, self.memory_budget_bytes)
+        await self._acquire(cost, timeout, shed)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - started)
+            self._release(cost)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "memory_in_use_bytes": self.memory_in_use,
+            "max_concurrent": self.max_concurrent,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "memory_reserved_bytes": self.reserved_bytes
+        }
+
+def scratch_limit_bytes(workers: int, memory_budget_bytes: int, float32: bool = True) -> int:
+    """
+    Per-thread scratch limit for a pool of enhancement workers
+
+    ENHANCEMENT_SCRATCH_MB, lowered so the scratch the whole pool keeps
+    stays within MAX_SCRATCH_FRACTION of memory_budget_bytes. Only float32
+    mode keeps scratch, so a pool that never runs it gets 0.
+
+    Raises:
+        ValueError: When what is left of the budget after the reserve cannot
+            hold one enhancement of ENHANCEMENT_MEMORY_BUDGET_MB
+    """
+    if not float32:
+        return 0
+    workers = max(workers, 1)
+    limit = min(settings.enhancement_scratch_mb * 1024 * 1024,
+                int(memory_budget_bytes * MAX_SCRATCH_FRACTION) // workers)
+    if limit and memory_budget_bytes - workers * limit < settings.enhancement_memory_budget_mb * 1024 * 1024:
+        raise ValueError(
+            f"A {memory_budget_bytes // (1024 * 1024)}MB memory budget cannot hold the scratch of {workers} "
+            f"workers and one {settings.enhancement_memory_budget_mb}MB enhancement; raise ADMISSION_MEMORY_MB "
+            f"or set ENHANCEMENT_SCRATCH_MB=0"
+        )
+    return limit
+
+# Enhancement workers in the server pool and the scratch each may keep
+_pool_workers = settings.enhancement_workers or os.cpu_count() or 1
+worker_scratch_bytes = scratch_limit_bytes(_pool_workers, settings.admission_memory_mb * 1024 * 1024)
+
+# Global admission controller (concurrency defaults to the worker count)
+admission_controller = AdmissionController(
+    max_concurrent=settings.admission_max_concurrent or _pool_workers,
+    memory_budget_bytes=settings.admission_memory_mb * 1024 * 1024,
+    max_waiting=settings.admission_max_waiting,
+    wait_timeout_seconds=settings.admission_wait_timeout_seconds or None,
+    reserved_bytes=_pool_workers * worker_scratch_bytes
+)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.logger import get_logger
+from app.config import settings
+from app.storage import retention_index
+
+logger = get_logger(__name__)
+
+class EnhancementCache:
+    """
+    Content-addressed cache of enhanced images
+
+    Entries are keyed by a hash of the uploaded bytes plus the enhancement
+    parameters. Lookups hit an in-memory LRU (bounded by a byte budget)
+    first, then an on-disk tier that expires with FILE_RETENTION_HOURS.
+    Expired disk entries are deleted by the background retention sweeper
+    (app.storage), never by a scan on the request path; a lookup only
+    checks the age of the entry it reads.
+    """
+
+    def __init__(self, memory_budget_bytes: int, disk_dir: Optional[str], retention_hours: int):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.retention_seconds = retention_hours * 3600
+        self._memory: "OrderedDict[str, Tuple[bytes, dict]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(contents: bytes, params: dict) -> str:
+        """Hash the upload together with the parameters that shaped the output"""
+        digest = hashlib.sha256(contents)
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _disk_paths(self, key: str) -> Tuple[Path, Path]:
+        shard = self.disk_dir / key[:2]
+        return shard / f"{key}.jpg", shard / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, dict, str]]:
+        """
+        Look up an entry
+
+        Returns:
+            (data, stats, tier) where tier is "memory" or "disk", or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0], entry[1], "memory"
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, *entry)
+        return entry[0], entry[1], "disk"
+
+    def put(self, key: str, data: bytes, stats: dict):
+        """Store an entry in both tiers"""
+        with self._lock:
+            self._remember(key, data, stats)
+        self._write_disk(key, data, stats)
+
+    def _remember(self, key: str, data: bytes, stats: dict):
+        if len(data) > self.memory_budget_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous[0])
+        self._memory[key] = (data, stats)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_budget_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[bytes, dict]]:
+        if self.disk_dir is None:
+            return None
+        data_path, stats_path = self._disk_paths(key)
+        try:
+            if time.time() - data_path.stat().st_mtime > self.retention_seconds:
+                self._remove_disk(data_path, stats_path)
+                return None
+            return data_path.read_bytes(), json.loads(stats_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, data: bytes, stats: dict):
+        if self.disk_dir is None:
+            return
+        data_path, stats_path = self._disk_paths(key)
+        try:
+            data_path.parent.mkdir(parents=True, exist_ok=True)
+            stats_path.write_text(json.dumps(stats))
+            # Write then rename so readers never see a partial image
+            tmp_path = data_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, data_path)
+            retention_index.track([str(data_path), str(stats_path)], self.retention_seconds)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {key}: {str(e)}")
+
+    @staticmethod
+    def _remove_disk(*paths: Path):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """Drop the memory tier and reset counters"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.memory_hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes
+            }
+
+# Global enhancement cache instance
+enhancement_cache = EnhancementCache(
+    memory_budget_bytes=settings.cache_memory_mb * 1024 * 1024,
+    disk_dir=os.path.join(settings.enhanced_dir, "cache") if settings.cache_disk_enabled else None,
+    retention_hours=settings.file_retention_hours
+)
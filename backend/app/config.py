@@ -18,6 +18,9 @@ class Settings(BaseSettings):
     max_upload_size_mb: int = Field(default=50, alias="MAX_UPLOAD_SIZE_MB")
     upload_dir: str = Field(default="./uploads", alias="UPLOAD_DIR")
     enhanced_dir: str = Field(default="./enhanced", alias="ENHANCED_DIR")
+    max_batch_files: int = Field(default=50, alias="MAX_BATCH_FILES")
+    max_batch_size_mb: int = Field(default=200, alias="MAX_BATCH_SIZE_MB")
+    max_image_megapixels: int = Field(default=150, alias="MAX_IMAGE_MEGAPIXELS")
     
     # CORS
     cors_origins: list[str] = Field(
@@ -35,6 +38,55 @@ class Settings(BaseSettings):
     
     # File Cleanup
     file_retention_hours: int = Field(default=24, alias="FILE_RETENTION_HOURS")
+    retention_sweep_interval_seconds: int = Field(default=300, alias="RETENTION_SWEEP_INTERVAL_SECONDS")
+    
+    # Profiling
+    profile_memory: bool = Field(default=False, alias="PROFILE_MEMORY")
+    profile_sample_rate: float = Field(default=0.0, alias="PROFILE_SAMPLE_RATE")
+    
+    # Result Cache
+    cache_enabled: bool = Field(default=True, alias="CACHE_ENABLED")
+    cache_memory_mb: int = Field(default=64, alias="CACHE_MEMORY_MB")
+    cache_disk_enabled: bool = Field(default=True, alias="CACHE_DISK_ENABLED")
+    
+    # Enhancement Workers (0 = one process per CPU core)
+    enhancement_workers: int = Field(default=0, alias="ENHANCEMENT_WORKERS")
+    warmup_enabled: bool = Field(default=True, alias="WARMUP_ENABLED")
+    shared_memory_mb: int = Field(default=256, alias="SHARED_MEMORY_MB")
+    enhancement_scratch_mb: int = Field(default=64, alias="ENHANCEMENT_SCRATCH_MB")
+    
+    # Full-resolution tiling (peak float working set per enhancement)
+    enhancement_memory_budget_mb: int = Field(default=512, alias="ENHANCEMENT_MEMORY_BUDGET_MB")
+    tile_size: int = Field(default=512, alias="TILE_SIZE")
+    tile_threads: int = Field(default=0, alias="TILE_THREADS")
+    
+    # Pyramid mode (orientation/frequency estimated 2**levels coarser)
+    pyramid_levels: int = Field(default=2, alias="PYRAMID_LEVELS")
+    
+    # Preview (?preview=true): working-size pyramid enhancement within this budget
+    preview_budget_ms: int = Field(default=1000, alias="PREVIEW_BUDGET_MS")
+    
+    # Quality gate: captures scoring below this (0-100) are rejected before filtering (0 = off)
+    quality_min_score: float = Field(default=20.0, alias="QUALITY_MIN_SCORE")
+    
+    # Template index (1:N search)
+    template_index_dir: str = Field(default="./template_index", alias="TEMPLATE_INDEX_DIR")
+    search_shortlist: int = Field(default=100, alias="SEARCH_SHORTLIST")
+    
+    # Admission control (0 concurrency = one per enhancement worker; 0 timeout = wait indefinitely)
+    admission_max_concurrent: int = Field(default=0, alias="ADMISSION_MAX_CONCURRENT")
+    admission_memory_mb: int = Field(default=2048, alias="ADMISSION_MEMORY_MB")
+    admission_max_waiting: int = Field(default=32, alias="ADMISSION_MAX_WAITING")
+    admission_wait_timeout_seconds: float = Field(default=30.0, alias="ADMISSION_WAIT_TIMEOUT_SECONDS")
+    
+    # Metrics (shared directory for multi-worker aggregation; empty = single process)
+    prometheus_multiproc_dir: str = Field(default="", alias="PROMETHEUS_MULTIPROC_DIR")
+    
+    # Background Jobs
+    job_concurrency: int = Field(default=2, alias="JOB_CONCURRENCY")
+    job_queue_size: int = Field(default=100, alias="JOB_QUEUE_SIZE")
+    job_max_retained: int = Field(default=500, alias="JOB_MAX_RETAINED")
+    job_max_result_mb: int = Field(default=256, alias="JOB_MAX_RESULT_MB")
     
     class Config:
         env_file = ".env"
@@ -1,5 +1,5 @@
 from fastapi import HTTPException, status
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 class APIException(HTTPException):
     """Base API Exception"""
@@ -7,17 +7,22 @@ class APIException(HTTPException):
         self,
         status_code: int = status.HTTP_400_BAD_REQUEST,
         detail: str = "An error occurred",
-        error_code: str = "UNKNOWN_ERROR"
+        error_code: str = "UNKNOWN_ERROR",
+        headers: Optional[Dict[str, str]] = None,
+        extra: Optional[Dict[str, Any]] = None
     ):
         self.error_code = error_code
         self.detail = detail
+        # Additional structured fields for the error body
+        self.extra = extra
         
         super().__init__(
             status_code=status_code,
             detail={
                 "error_code": error_code,
                 "message": detail
-            }
+            },
+            headers=headers
         )
 
 class ValidationError(APIException):
@@ -38,6 +43,25 @@ class FileUploadError(APIException):
             error_code="FILE_UPLOAD_ERROR"
         )
 
+class PayloadTooLargeError(APIException):
+    """Upload exceeds the configured size limit"""
+    def __init__(self, detail: str = "Upload too large"):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=detail,
+            error_code="PAYLOAD_TOO_LARGE"
+        )
+
+class LowQualityError(APIException):
+    """Capture scored below QUALITY_MIN_SCORE and was not enhanced"""
+    def __init__(self, detail: str = "Fingerprint quality too low", quality: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=detail,
+            error_code="LOW_QUALITY",
+            extra={"quality": quality} if quality is not None else None
+        )
+
 class ImageProcessingError(APIException):
     """Image processing error"""
     def __init__(self, detail: str = "Image processing failed"):
@@ -55,3 +79,22 @@ class NotFoundError(APIException):
             detail=detail,
             error_code="NOT_FOUND"
         )
+
+class ConflictError(APIException):
+    """Resource exists but is not in the requested state"""
+    def __init__(self, detail: str = "Resource is not ready"):
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=detail,
+            error_code="CONFLICT"
+        )
+
+class ServiceUnavailableError(APIException):
+    """Server is temporarily unable to accept work"""
+    def __init__(self, detail: str = "Service temporarily unavailable", retry_after: Optional[int] = None):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            error_code="SERVICE_UNAVAILABLE",
+            headers={"Retry-After": str(retry_after)} if retry_after is not None else None
+        )
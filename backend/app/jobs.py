@@ -0,0 +1,244 @@
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.logger import get_logger
+from app.config import settings
+from app.exceptions import APIException, ServiceUnavailableError
+from app.service import run_enhancement
+from app.metrics import errors_total, jobs_queued
+
+logger = get_logger(__name__)
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+@dataclass
+class Job:
+    """A unit of enhancement work and its bookkeeping"""
+    id: str
+    source_name: str
+    state: JobState = JobState.QUEUED
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    error_code: Optional[str] = None
+    message: Optional[str] = None
+    file_name: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (JobState.DONE, JobState.FAILED)
+
+class JobStore(ABC):
+    """
+    Storage backend for jobs and their results
+
+    The in-memory store is the default; a SQLite or file-backed store can
+    replace it by implementing these methods.
+    """
+
+    @abstractmethod
+    def add(self, job: Job):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def update(self, job: Job):
+        ...
+
+    @abstractmethod
+    def set_result(self, job_id: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def get_result(self, job_id: str) -> Optional[bytes]:
+        ...
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local job store that evicts the oldest finished jobs
+
+    Results are dropped on their own, oldest first, once they exceed
+    max_result_bytes together (the newest is always kept) or are older than
+    result_ttl_seconds; their jobs stay and report the result as expired.
+    """
+
+    def __init__(self, max_retained: int = 500, max_result_bytes: Optional[int] = None,
+                 result_ttl_seconds: Optional[float] = None):
+        self.max_retained = max_retained
+        self.max_result_bytes = max_result_bytes
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # job id -> (result, stored at), oldest first
+        self._results: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.result_bytes = 0
+
+    def add(self, job: Job):
+        self._jobs[job.id] = job
+        self._evict()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def update(self, job: Job):
+        self._jobs[job.id] = job
+
+    def set_result(self, job_id: str, data: bytes):
+        self._drop_result(job_id)
+        self._results[job_id] = (data, time.monotonic())
+        self.result_bytes += len(data)
+        self._evict()
+
+    def get_result(self, job_id: str) -> Optional[bytes]:
+        self._evict()
+        entry = self._results.get(job_id)
+        return entry[0] if entry is not None else None
+
+    def _drop_result(self, job_id: str):
+        entry = self._results.pop(job_id, None)
+        if entry is not None:
+            self.result_bytes -= len(entry[0])
+
+    def _evict(self):
+        # Oldest first; unfinished jobs are never dropped
+        excess = len(self._jobs) - self.max_retained
+        if excess > 0:
+            expired: List[str] = [job_id for job_id, job in self._jobs.items() if job.finished][:excess]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._drop_result(job_id)
+
+        if self.result_ttl_seconds is not None:
+            cutoff = time.monotonic() - self.result_ttl_seconds
+            while self._results and next(iter(self._results.values()))[1] < cutoff:
+                self._drop_result(next(iter(self._results)))
+        if self.max_result_bytes is not None:
+            while len(self._results) > 1 and self.result_bytes > self.max_result_bytes:
+                self._drop_result(next(iter(self._results)))
+
+class JobQueue:
+    """Bounded in-process queue drained by a fixed number of runner tasks"""
+
+    def __init__(self, store: JobStore, concurrency: int = 2, max_size: int = 100):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._runners: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start runner tasks on the current event loop"""
+        if self._runners:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info(f"Job queue started with {self.concurrency} runners")
+
+    async def stop(self):
+        """Cancel runner tasks; queued jobs are abandoned"""
+        jobs_queued.dec(self.depth)
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        self._queue = None
+        logger.info("Job queue stopped")
+
+    def submit(self, source_name: str, contents: bytes, save: bool = False, full_resolution: bool = False,
+               mode: str = "standard") -> Job:
+        """Enqueue enhancement work and return the queued job"""
+        if self._queue is None:
+            self.start()
+
+        job = Job(id=uuid.uuid4().hex, source_name=source_name)
+        try:
+            self._queue.put_nowait((job.id, contents, save, full_resolution, mode, time.time()))
+        except asyncio.QueueFull:
+            raise ServiceUnavailableError("Job queue is full, retry later")
+
+        jobs_queued.inc()
+        self.store.add(job)
+        logger.info(f"Queued job {job.id} for {source_name}")
+        return job
+
+    async def _run(self):
+        while True:
+            job_id, contents, save, full_resolution, mode, queued_at = await self._queue.get()
+            jobs_queued.dec()
+            try:
+                await self._process(job_id, contents, save, full_resolution, mode, queued_at)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job_id: str, contents: bytes, save: bool, full_resolution: bool, mode: str,
+                       queued_at: float):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        started = time.time()
+        job.state = JobState.RUNNING
+        job.started_at = datetime.utcnow()
+        job.timings["queued_ms"] = (started - queued_at) * 1000
+        self.store.update(job)
+
+        try:
+            # Jobs are already bounded by the job queue, so they wait for
+            # admission rather than being shed
+            enhanced_bytes, output_path, stats = await run_enhancement(
+                contents, job.source_name if save else None, full_resolution, mode=mode, wait_timeout=None, shed=False
+            )
+            for entry in stats.get("stages", []):
+                job.timings[f"{entry['name']}_ms"] = entry["duration_ms"]
+            self.store.set_result(job_id, enhanced_bytes)
+            job.file_name = Path(output_path).name if output_path else None
+            job.state = JobState.DONE
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"message": str(e.detail)}
+            job.error_code, job.message = e.error_code, detail["message"]
+            job.state = JobState.FAILED
+        except Exception as e:
+            logger.error(f"Job {job_id} failed unexpectedly: {str(e)}", exc_info=True)
+            job.error_code, job.message = "IMAGE_PROCESSING_ERROR", f"Unexpected error: {str(e)}"
+            job.state = JobState.FAILED
+
+        if job.state == JobState.FAILED:
+            errors_total.labels(job.error_code).inc()
+
+        finished = time.time()
+        job.finished_at = datetime.utcnow()
+        job.timings["processing_ms"] = (finished - started) * 1000
+        job.timings["total_ms"] = (finished - queued_at) * 1000
+        self.store.update(job)
+        logger.info(f"Job {job_id} {job.state.value} in {job.timings['total_ms']:.2f}ms")
+
+# Global job queue instance
+job_queue = JobQueue(
+    InMemoryJobStore(
+        settings.job_max_retained,
+        max_result_bytes=settings.job_max_result_mb * 1024 * 1024,
+        result_ttl_seconds=settings.file_retention_hours * 3600
+    ),
+    concurrency=settings.job_concurrency,
+    max_size=settings.job_queue_size
+)
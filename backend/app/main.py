@@ -4,6 +4,7 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import time
 import uuid
 
@@ -11,7 +12,19 @@ from app.config import settings
 from app.logger import get_logger
 from app.exceptions import APIException
 from app.utils import ensure_directories_exist
-from app.routes import health, enhancement
+from app.workers import enhancement_pool
+from app.jobs import job_queue
+from app.storage import retention_sweeper
+from app.uploads import UploadLimitMiddleware
+from app.metrics import (
+    http_requests_total,
+    http_request_duration_seconds,
+    request_bytes_total,
+    response_bytes_total,
+    errors_total,
+    mark_process_dead
+)
+from app.routes import health, enhancement, jobs, quality, minutiae, templates
 
 logger = get_logger(__name__)
 
@@ -25,10 +38,20 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 50)
     
     ensure_directories_exist()
+    # Workers start (and optionally run a synthetic enhancement) in the
+    # background; /ready reports 503 until this finishes
+    warm_up = asyncio.create_task(enhancement_pool.warm_up(synthetic=settings.warmup_enabled))
+    job_queue.start()
+    retention_sweeper.start()
     
     yield
     
     logger.info("Shutting down application")
+    warm_up.cancel()
+    await retention_sweeper.stop()
+    await job_queue.stop()
+    enhancement_pool.shutdown()
+    mark_process_dead()
 
 # Create FastAPI app
 app = FastAPI(
@@ -51,10 +74,21 @@ async def add_request_id(request, call_next):
     response.headers["X-Request-ID"] = request_id
     response.headers["X-Process-Time"] = str(process_time)
     
+    # Label by route template (e.g. /api/jobs/{job_id}) to bound cardinality
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    http_requests_total.labels(request.method, route_path, str(response.status_code)).inc()
+    http_request_duration_seconds.labels(request.method, route_path).observe(process_time)
+    request_bytes_total.inc(int(request.headers.get("content-length", 0) or 0))
+    response_bytes_total.inc(int(response.headers.get("content-length", 0) or 0))
+    
     logger.debug(f"Request {request_id} - {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
     
     return response
 
+# Cap request bodies as they stream in (CORS, added after, wraps the 413s)
+app.add_middleware(UploadLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -62,6 +96,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=enhancement.METADATA_HEADERS,
 )
 
 # Add trusted host middleware for production
@@ -74,18 +109,22 @@ if settings.is_production:
 # Exception handlers
 @app.exception_handler(APIException)
 async def api_exception_handler(request, exc):
+    errors_total.labels(exc.error_code).inc()
     return JSONResponse(
         status_code=exc.status_code,
         content={
             "error_code": exc.error_code,
             "message": exc.detail,
-            "request_id": request.state.request_id
-        }
+            "request_id": request.state.request_id,
+            **(getattr(exc, "extra", None) or {})
+        },
+        headers=exc.headers
     )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     logger.warning(f"Validation error: {exc}")
+    errors_total.labels("VALIDATION_ERROR").inc()
     return JSONResponse(
         status_code=400,
         content={
@@ -98,6 +137,10 @@ async def validation_exception_handler(request, exc):
 # Include routers
 app.include_router(health.router)
 app.include_router(enhancement.router)
+app.include_router(jobs.router)
+app.include_router(quality.router)
+app.include_router(minutiae.router)
+app.include_router(templates.router)
 
 @app.get("/")
 async def root():
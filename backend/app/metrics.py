@@ -0,0 +1,119 @@
+"""
+Prometheus metrics
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR (in .env or the
+environment) to an empty, writable directory shared by all workers; each
+worker then writes its samples there and /metrics aggregates them, so
+counters stay correct no matter which worker answers the scrape.
+"""
+
+import os
+from pathlib import Path
+from typing import Tuple
+
+from app.config import settings
+
+# prometheus_client chooses its value storage from the environment when it is
+# imported, and pydantic-settings never exports .env values, so a directory
+# configured in .env is exported (and created) first
+MULTIPROCESS = bool(settings.prometheus_multiproc_dir)
+if MULTIPROCESS:
+    Path(settings.prometheus_multiproc_dir).mkdir(parents=True, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.prometheus_multiproc_dir
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Megapixel upper bounds used to label enhancement timings by image size
+SIZE_BUCKETS_MP = ((0.25, "le_0.25mp"), (1.0, "le_1mp"), (4.0, "le_4mp"), (16.0, "le_16mp"))
+
+http_requests_total = Counter(
+    "http_requests_total",
+    "HTTP requests by method, route template and status code",
+    ["method", "route", "status"]
+)
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method and route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+
+enhancement_duration_seconds = Histogram(
+    "enhancement_duration_seconds",
+    "Enhancement time (cache misses) by input image size",
+    ["size"],
+    buckets=LATENCY_BUCKETS
+)
+
+enhancements_in_flight = Gauge(
+    "enhancements_in_flight",
+    "Enhancements currently dispatched to the worker pool",
+    multiprocess_mode="livesum"
+)
+
+jobs_queued = Gauge(
+    "jobs_queued",
+    "Jobs waiting in the background queue",
+    multiprocess_mode="livesum"
+)
+
+admission_waiting = Gauge(
+    "admission_waiting",
+    "Enhancements waiting for admission (concurrency or memory)",
+    multiprocess_mode="livesum"
+)
+
+admission_rejections_total = Counter(
+    "admission_rejections_total",
+    "Enhancements shed with 503 by reason (queue_full, timeout)",
+    ["reason"]
+)
+
+request_bytes_total = Counter("request_bytes_total", "Request body bytes received")
+response_bytes_total = Counter("response_bytes_total", "Response body bytes sent")
+
+errors_total = Counter(
+    "errors_total",
+    "API errors by error code",
+    ["error_code"]
+)
+
+cache_lookups_total = Counter(
+    "cache_lookups_total",
+    "Result cache lookups by outcome",
+    ["result"]
+)
+
+def size_label(width: int, height: int) -> str:
+    """Bucket label for an image of the given dimensions"""
+    megapixels = width * height / 1e6
+    for limit, label in SIZE_BUCKETS_MP:
+        if megapixels <= limit:
+            return label
+    return "gt_16mp"
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Serialize metrics (aggregated across workers in multiprocess mode)"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess directory"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,211 @@
+"""
+Minutiae extraction from the enhanced ridge map
+
+Works on the boolean map the Gabor stage produces (ridges True, i.e. before
+invert_output) and expresses every step as whole-frame array operations:
+
+1. Zhang-Suen thinning. A pixel's 8-neighbourhood is packed into one byte
+   by a single filter2D pass (neighbour i contributes 2**i), and the
+   deletion rule of each sub-iteration is a 256-entry lookup table on that
+   byte, so a pass over the frame is one convolution and one table lookup.
+2. Crossing number, from another table on the same neighbour byte: 1 marks
+   a ridge ending, 3 a bifurcation.
+3. Cleanup: candidates near the edge of the print, and pairs closer than
+   MIN_DISTANCE_PERIODS ridge periods (spurs, bridges, broken ridges), are
+   dropped.
+4. Angle and quality from a structure tensor of the ridge map. The tensor
+   only gives an axis; the direction along it is taken towards the centroid
+   of the nearby skeleton (back along the ridge for an ending, into the
+   fork for a bifurcation).
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.profiling import StageTimer, stage
+
+# Minutia types are their crossing numbers
+ENDING = 1
+BIFURCATION = 3
+
+# Candidates closer than this (in ridge periods) are treated as noise
+MIN_DISTANCE_PERIODS = 0.8
+
+# Candidates within this distance of the print's edge are dropped
+BORDER_PERIODS = 1.5
+
+# Local ridge density below which a pixel counts as background
+FOREGROUND_DENSITY = 0.1
+
+# Neighbours P2..P9 of the Zhang-Suen papers, clockwise from north, as (row, col)
+NEIGHBOUR_OFFSETS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+
+NEIGHBOUR_KERNEL = np.zeros((3, 3), dtype=np.float32)
+for _bit, (_row, _col) in enumerate(NEIGHBOUR_OFFSETS):
+    NEIGHBOUR_KERNEL[1 + _row, 1 + _col] = 1 << _bit
+
+# Neighbours that precede a pixel in raster order, for collapsing clusters
+PRECEDING_KERNEL = np.array([[1, 1, 1], [1, 0, 0], [0, 0, 0]], dtype=np.float32)
+
+def _lookup_tables():
+    bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    following = np.roll(bits, -1, axis=1)
+    count = bits.sum(axis=1)
+    transitions = ((bits == 0) & (following == 1)).sum(axis=1)
+    p2, _, p4, _, p6, _, p8, _ = bits.T
+
+    removable = (count >= 2) & (count <= 6) & (transitions == 1)
+    first = removable & (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+    second = removable & (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+    crossing = (np.abs(bits - following).sum(axis=1) // 2).astype(np.uint8)
+    return first, second, crossing
+
+THIN_FIRST, THIN_SECOND, CROSSING_NUMBER = _lookup_tables()
+
+@dataclass
+class Minutiae:
+    """Minutiae as parallel arrays, in ridge-map pixel coordinates"""
+    x: np.ndarray
+    y: np.ndarray
+    angle: np.ndarray
+    type: np.ndarray
+    quality: np.ndarray
+    ridge_period: float
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": len(self),
+            "x": self.x.tolist(),
+            "y": self.y.tolist(),
+            "angle": np.round(self.angle.astype(float), 4).tolist(),
+            "type": self.type.tolist(),
+            "quality": np.round(self.quality.astype(float), 3).tolist(),
+            "ridge_period": round(self.ridge_period, 2)
+        }
+
+def _neighbour_code(skeleton: np.ndarray) -> np.ndarray:
+    code = cv2.filter2D(skeleton, cv2.CV_32F, NEIGHBOUR_KERNEL, borderType=cv2.BORDER_CONSTANT)
+    return code.astype(np.uint8)
+
+def thin(ridges: np.ndarray) -> np.ndarray:
+    """
+    Zhang-Suen thinning of a boolean ridge map to one-pixel-wide ridges
+
+    Returns:
+        Boolean skeleton of the same shape
+    """
+    skeleton = ridges.astype(np.uint8)
+    removed = True
+    while removed:
+        removed = False
+        for table in (THIN_FIRST, THIN_SECOND):
+            deletable = table[_neighbour_code(skeleton)] & (skeleton == 1)
+            if deletable.any():
+                skeleton[deletable] = 0
+                removed = True
+    return skeleton.astype(bool)
+
+def _density(ridges: np.ndarray, window: float) -> np.ndarray:
+    size = 2 * int(round(window / 2)) + 1
+    return cv2.blur(ridges.astype(np.float32), (size, size), borderType=cv2.BORDER_CONSTANT)
+
+def _foreground(ridges: np.ndarray, period: float) -> np.ndarray:
+    """Area covered by ridges, shrunk by BORDER_PERIODS"""
+    density = _density(ridges, 2 * period)
+    margin = int(round(BORDER_PERIODS * period))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1, 2 * margin + 1))
+    return cv2.erode(
+        (density > FOREGROUND_DENSITY).astype(np.uint8), kernel,
+        borderType=cv2.BORDER_CONSTANT, borderValue=0
+    ).astype(bool)
+
+def _orientation(ridges: np.ndarray, period: float, rows: np.ndarray, cols: np.ndarray):
+    """Ridge axis angle (image coordinates) and coherence at the given pixels"""
+    values = ridges.astype(np.float32)
+    grad_x = cv2.Sobel(values, cv2.CV_32F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(values, cv2.CV_32F, 0, 1, ksize=3)
+    moments = [
+        cv2.GaussianBlur(product, (0, 0), period)[rows, cols]
+        for product in (grad_x * grad_x, grad_y * grad_y, grad_x * grad_y)
+    ]
+    grad_x2, grad_y2, grad_xy = moments
+    axis = 0.5 * np.arctan2(2 * grad_xy, grad_x2 - grad_y2) + np.pi / 2
+    coherence = np.hypot(grad_x2 - grad_y2, 2 * grad_xy) / (grad_x2 + grad_y2 + np.finfo(np.float32).eps)
+    return axis, coherence
+
+def _skeleton_centroids(skeleton: np.ndarray, rows: np.ndarray, cols: np.ndarray, radius: int):
+    """Mean (col, row) offset of skeleton pixels in a window around each point"""
+    padded = np.pad(skeleton, radius)
+    offsets = np.arange(-radius, radius + 1)
+    patches = padded[
+        rows[:, None, None] + radius + offsets[None, :, None],
+        cols[:, None, None] + radius + offsets[None, None, :]
+    ].astype(np.float32)
+    counts = patches.sum(axis=(1, 2))
+    return (patches * offsets[None, None, :]).sum(axis=(1, 2)) / counts, \
+        (patches * offsets[None, :, None]).sum(axis=(1, 2)) / counts
+
+def extract_minutiae(ridges: np.ndarray, timer: Optional[StageTimer] = None) -> Minutiae:
+    """
+    Detect ridge endings and bifurcations
+
+    Args:
+        ridges: Boolean ridge map with ridges True (enhance(..., invert_output=False))
+        timer: Optional StageTimer receiving "thinning" and "minutiae" timings
+
+    Returns:
+        Minutiae; angles are radians in [0, 2*pi), counter-clockwise from
+        the +x axis as the image is displayed, and quality is the local
+        orientation coherence (0-1)
+    """
+    with stage(timer, "thinning"):
+        skeleton = thin(ridges)
+
+    with stage(timer, "minutiae"):
+        skeleton_pixels = np.count_nonzero(skeleton)
+        if skeleton_pixels == 0:
+            empty = np.zeros(0)
+            return Minutiae(empty.astype(np.int32), empty.astype(np.int32), empty.astype(np.float32),
+                            empty.astype(np.uint8), empty.astype(np.float32), 0.0)
+
+        # Print area divided by centreline length is the ridge spacing; the
+        # ridge width (area over length) sizes the window that finds the print
+        width = np.count_nonzero(ridges) / skeleton_pixels
+        covered = _density(ridges, 4 * width) > FOREGROUND_DENSITY
+        period = max(3.0, np.count_nonzero(covered) / skeleton_pixels)
+
+        crossing = np.where(skeleton, CROSSING_NUMBER[_neighbour_code(skeleton.astype(np.uint8))], 0)
+        candidates = (crossing == ENDING) | (crossing == BIFURCATION)
+        # A thick junction can leave adjacent bifurcation pixels; keep the first
+        clustered = cv2.filter2D((crossing == BIFURCATION).astype(np.uint8), cv2.CV_32F, PRECEDING_KERNEL,
+                                 borderType=cv2.BORDER_CONSTANT)
+        candidates &= ~((crossing == BIFURCATION) & (clustered > 0))
+        candidates &= _foreground(ridges, period)
+
+        rows, cols = np.nonzero(candidates)
+        kinds = crossing[rows, cols].astype(np.uint8)
+
+        if len(rows) > 1:
+            pairs = cKDTree(np.column_stack([cols, rows])).query_pairs(MIN_DISTANCE_PERIODS * period,
+                                                                         output_type="ndarray")
+            keep = np.ones(len(rows), dtype=bool)
+            keep[pairs.ravel()] = False
+            rows, cols, kinds = rows[keep], cols[keep], kinds[keep]
+
+        axis, coherence = _orientation(ridges, period, rows, cols)
+        centroid_x, centroid_y = _skeleton_centroids(skeleton, rows, cols, max(3, int(round(period / 2))))
+        flip = np.cos(axis) * centroid_x + np.sin(axis) * centroid_y < 0
+        # Image rows grow downwards, so negate to report counter-clockwise angles
+        angle = np.mod(-(axis + np.pi * flip), 2 * np.pi)
+
+        return Minutiae(
+            cols.astype(np.int32), rows.astype(np.int32), angle.astype(np.float32),
+            kinds, coherence.astype(np.float32), float(period)
+        )
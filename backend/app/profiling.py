@@ -0,0 +1,81 @@
+import cProfile
+import random
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import ContextManager, List, Optional
+
+from app.logger import get_logger, LOG_DIR
+from app.config import settings
+
+logger = get_logger(__name__)
+
+PROFILE_DIR = LOG_DIR / "profiles"
+
+class StageTimer:
+    """
+    Collects named stage durations for one enhancement
+
+    With track_memory, tracemalloc records the peak Python/NumPy heap of
+    each stage; this roughly doubles allocation cost, so it is opt-in.
+    """
+
+    def __init__(self, track_memory: bool = False):
+        self.track_memory = track_memory
+        self.stages: List[dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        started_tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {"name": name, "duration_ms": (time.perf_counter() - start) * 1000}
+            if self.track_memory:
+                entry["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(entry)
+
+    def add(self, name: str, duration_ms: float):
+        """Record a stage measured elsewhere"""
+        self.stages.append({"name": name, "duration_ms": duration_ms})
+
+def stage(timer: Optional[StageTimer], name: str) -> ContextManager:
+    """Time a stage when a timer is attached, otherwise do nothing"""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+@contextmanager
+def sampled_profile(label: str):
+    """
+    Run the block under cProfile for a PROFILE_SAMPLE_RATE fraction of calls
+
+    Profiles are written to logs/profiles/ and can be opened with pstats,
+    snakeviz or converted for flame graphs.
+    """
+    if settings.profile_sample_rate <= 0 or random.random() >= settings.profile_sample_rate:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.prof"
+        try:
+            profiler.dump_stats(str(path))
+            logger.info(f"Profile written: {path}")
+        except OSError as e:
+            logger.warning(f"Failed to write profile: {str(e)}")
@@ -1,67 +1,163 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, Query, Header, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, Response
+from typing import List, Optional, Set
+import asyncio
+import base64
+import json
+import mimetypes
 import time
-import os
-import uuid
 from pathlib import Path
 
 from app.logger import get_logger
-from app.schemas import FileUploadResponse, EnhancementStats
-from app.exceptions import FileUploadError, ImageProcessingError
+from app.schemas import (
+    FileUploadResponse,
+    BatchItemResult,
+    BatchEnhancementResponse,
+    EnhancementStats
+)
+from app.exceptions import APIException, FileUploadError, ImageProcessingError, ServiceUnavailableError
 from app.utils import (
-    validate_image_file,
-    process_fingerprint_image,
-    encode_image_to_base64,
-    cleanup_old_files
+    OUTPUT_FORMATS,
+    EnhancementMode,
+    is_zip_upload,
+    extract_zip_images
 )
 from app.config import settings
+from app.service import run_enhancement
+from app.jobs import job_queue
+from app.storage import resolve_output
+from app.uploads import read_upload, validate_image_bytes
+from app.metrics import errors_total
 
 router = APIRouter(prefix="/api", tags=["Enhancement"])
 logger = get_logger(__name__)
 
+# Accept media types answered with raw image bytes, mapped to an output format
+BINARY_MEDIA_TYPES = {
+    "image/jpeg": "jpeg",
+    "image/jpg": "jpeg",
+    "image/*": "jpeg",
+    "application/octet-stream": "jpeg",
+    "image/png": "png"
+}
+
+# Response headers browsers may read across origins
+METADATA_HEADERS = [
+    "X-Processing-Time-Ms",
+    "X-Image-Width",
+    "X-Image-Height",
+    "X-Original-Width",
+    "X-Original-Height",
+    "X-Enhanced-File-Name",
+    "X-Cache",
+    "X-Enhancement-Mode",
+    "X-Foreground-Fraction",
+    "X-Preview",
+    "X-Job-Id",
+    "X-Result-Url",
+    "X-Stage-Timings"
+]
+
+def _negotiate_output(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick the response representation from an Accept header
+
+    Returns:
+        None for the JSON/base64 response, otherwise an OUTPUT_FORMATS key
+    """
+    if not accept:
+        return None
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and media_type:
+            candidates.append((-quality, position, media_type.lower()))
+
+    # Highest q wins; ties go to the order the client listed them in
+    for _, _, media_type in sorted(candidates):
+        if media_type in ("application/json", "*/*"):
+            return None
+        if media_type in BINARY_MEDIA_TYPES:
+            return BINARY_MEDIA_TYPES[media_type]
+    return None
+
 @router.post("/enhance", response_model=FileUploadResponse)
-async def enhance_fingerprint(file: UploadFile = File(...)):
+async def enhance_fingerprint(
+    file: UploadFile = File(...),
+    save: bool = Query(False, description="Keep a downloadable copy in the enhanced directory"),
+    full_resolution: bool = Query(False, description="Enhance at capture resolution (tiled for large scans)"),
+    mode: EnhancementMode = Query(
+        "standard", description="'pyramid' (coarse orientation/frequency) and 'float32' (single precision) are faster"
+    ),
+    preview: bool = Query(False, description="Answer with a quick working-size preview and queue the full result as a job"),
+    accept: Optional[str] = Header(None)
+):
     """
     Enhance a fingerprint image using Gabor filters
     
     - **file**: Image file (JPEG, PNG, BMP)
-    - Returns: Enhanced image as base64 string
+    - **save**: Persist the result so it can be fetched from /api/download
+    - **full_resolution**: Skip the 350-row working resize; large frames are tiled
+    - **mode**: "standard", "pyramid" (coarse-level orientation/frequency
+      fields) or "float32" (single precision with reused buffers)
+    - **preview**: Return a working-size pyramid enhancement within
+      PREVIEW_BUDGET_MS; the enhancement asked for by the other parameters
+      runs as a job (job_id / result_url). A preview that misses the budget
+      is answered with 202, the job and no image
+    - Returns: Enhanced image as base64 string (default), or the raw image when
+      Accept asks for image/jpeg, image/png or application/octet-stream; timings
+      and dimensions are then sent as X-* response headers
     """
     start_time = time.time()
-    temp_file_path = None
-    enhanced_file_path = None
     
     try:
         # Validate file
         if not file.filename:
             raise FileUploadError("Filename is missing")
         
-        # Read file content
-        contents = await file.read()
+        # Read under the size cap; the header is sniffed from the start of the
+        # spooled file so non-images are rejected before it is loaded
+        contents, header = await read_upload(file)
         file_size = len(contents)
         
-        # Validate
-        validate_image_file(file.filename, file_size, file.content_type)
+        logger.info(
+            f"Processing file: {file.filename}, size: {file_size} bytes, "
+            f"{header.format} {header.width}x{header.height}x{header.channels}"
+        )
         
-        logger.info(f"Processing file: {file.filename}, size: {file_size} bytes")
+        output_format = _negotiate_output(accept)
         
-        # Save temporary file
-        temp_dir = Path(settings.upload_dir)
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        temp_filename = f"temp_{uuid.uuid4()}_{file.filename}"
-        temp_file_path = temp_dir / temp_filename
+        if preview:
+            return await _enhance_preview(
+                contents, file.filename, save, full_resolution, mode, output_format, start_time
+            )
         
-        with open(temp_file_path, "wb") as f:
-            f.write(contents)
+        # Decode, enhance and encode in memory (or serve a cached result)
+        enhanced_bytes, enhanced_file_path, stats = await run_enhancement(
+            contents, file.filename if save else None, full_resolution, output_format or "jpeg", mode
+        )
         
-        # Process image
-        enhanced_file_path, stats = process_fingerprint_image(str(temp_file_path))
+        if output_format is not None:
+            processing_time = (time.time() - start_time) * 1000
+            logger.info(f"Enhancement completed in {processing_time:.2f}ms ({output_format} body)")
+            return _binary_response(enhanced_bytes, output_format, enhanced_file_path, stats, processing_time)
         
         # Encode to base64
-        enhanced_image_base64 = encode_image_to_base64(enhanced_file_path)
-        
-        # Clean up old files periodically
-        cleanup_old_files()
+        base64_start = time.perf_counter()
+        enhanced_image_base64 = base64.b64encode(enhanced_bytes).decode("utf-8")
+        stages = stats.get("stages", []) + [
+            {"name": "base64", "duration_ms": (time.perf_counter() - base64_start) * 1000}
+        ]
         
         processing_time = (time.time() - start_time) * 1000  # Convert to ms
         
@@ -72,8 +168,10 @@ async def enhance_fingerprint(file: UploadFile = File(...)):
             success=True,
             message="Image enhanced successfully",
             enhanced_image=f"data:image/jpeg;base64,{enhanced_image_base64}",
-            file_name=Path(enhanced_file_path).name,
-            processing_time_ms=processing_time
+            file_name=Path(enhanced_file_path).name if enhanced_file_path else None,
+            processing_time_ms=processing_time,
+            foreground_fraction=stats.get("foreground_fraction"),
+            stages=stages
         )
         
     except FileUploadError as e:
@@ -82,37 +180,229 @@ async def enhance_fingerprint(file: UploadFile = File(...)):
     except ImageProcessingError as e:
         logger.error(f"Image processing error: {str(e)}")
         raise
+    except APIException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during enhancement: {str(e)}", exc_info=True)
         raise ImageProcessingError(f"Unexpected error: {str(e)}")
-    finally:
-        # Cleanup temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-                logger.debug(f"Cleaned up temporary file: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Failed to cleanup temp file: {str(e)}")
+
+# Previews still running, referenced so they finish after their request gives up
+_pending_previews: Set[asyncio.Task] = set()
+
+def _forget_preview(task: asyncio.Task):
+    _pending_previews.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.info(f"Preview finished after its request: {task.exception()}")
+
+async def _enhance_preview(contents: bytes, filename: str, save: bool, full_resolution: bool, mode: str,
+                           output_format: Optional[str], start_time: float):
+    """
+    Enhance a working-size copy in pyramid mode within PREVIEW_BUDGET_MS,
+    then queue the requested enhancement as a job
+
+    When the preview misses its budget the job is still queued and answered
+    with 202 and no image, so the caller only has to wait for the job.
+    """
+    budget = settings.preview_budget_ms / 1000
+    # Admission waits count against the budget too. Only this request stops
+    # waiting when the budget runs out: the shielded preview keeps its
+    # admission slot until the worker is done and caches its result
+    preview = asyncio.ensure_future(
+        run_enhancement(contents, None, False, output_format or "jpeg", "pyramid", wait_timeout=budget)
+    )
+    _pending_previews.add(preview)
+    preview.add_done_callback(_forget_preview)
+    try:
+        preview_bytes, _, stats = await asyncio.wait_for(asyncio.shield(preview), budget)
+    except (asyncio.TimeoutError, ServiceUnavailableError):
+        preview_bytes = stats = None
+    
+    job = job_queue.submit(filename, contents, save, full_resolution, mode)
+    result_url = f"/api/jobs/{job.id}/result"
+    processing_time = (time.time() - start_time) * 1000
+    
+    if preview_bytes is None:
+        logger.info(f"Preview missed its {settings.preview_budget_ms}ms budget, full result queued as job {job.id}")
+        headers = {"X-Preview": "false", "X-Job-Id": job.id, "X-Result-Url": result_url}
+        if output_format is not None:
+            return Response(status_code=status.HTTP_202_ACCEPTED, headers=headers)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            headers=headers,
+            content=jsonable_encoder(FileUploadResponse(
+                success=True,
+                message=f"Preview exceeded its {settings.preview_budget_ms}ms budget; full result queued",
+                processing_time_ms=processing_time,
+                job_id=job.id,
+                result_url=result_url
+            ))
+        )
+    
+    logger.info(f"Preview ready in {processing_time:.2f}ms, full result queued as job {job.id}")
+    
+    if output_format is not None:
+        response = _binary_response(preview_bytes, output_format, None, stats, processing_time)
+        response.headers.update({"X-Preview": "true", "X-Job-Id": job.id, "X-Result-Url": result_url})
+        return response
+    
+    return FileUploadResponse(
+        success=True,
+        message="Preview ready; full result queued",
+        enhanced_image=f"data:image/jpeg;base64,{base64.b64encode(preview_bytes).decode('utf-8')}",
+        processing_time_ms=processing_time,
+        foreground_fraction=stats.get("foreground_fraction"),
+        preview=True,
+        job_id=job.id,
+        result_url=result_url,
+        stages=stats.get("stages")
+    )
+
+def _binary_response(enhanced_bytes: bytes, output_format: str, enhanced_file_path: Optional[str],
+                     stats: dict, processing_time: float) -> Response:
+    """Raw image body with the JSON response's metadata moved into headers"""
+    width, height = stats.get("enhanced_dimensions", (0, 0))
+    original_width, original_height = stats.get("dimensions", (0, 0))
+    headers = {
+        "X-Processing-Time-Ms": f"{processing_time:.2f}",
+        "X-Image-Width": str(width),
+        "X-Image-Height": str(height),
+        "X-Original-Width": str(original_width),
+        "X-Original-Height": str(original_height),
+        "X-Cache": stats.get("cache", "miss"),
+        "X-Enhancement-Mode": stats.get("mode", "standard"),
+        "X-Stage-Timings": json.dumps(
+            {entry["name"]: round(entry["duration_ms"], 2) for entry in stats.get("stages", [])},
+            separators=(",", ":")
+        ),
+        "Vary": "Accept"
+    }
+    if stats.get("foreground_fraction") is not None:
+        headers["X-Foreground-Fraction"] = str(stats["foreground_fraction"])
+    if enhanced_file_path:
+        headers["X-Enhanced-File-Name"] = Path(enhanced_file_path).name
+    
+    return Response(content=enhanced_bytes, media_type=OUTPUT_FORMATS[output_format][1], headers=headers)
+
+async def _enhance_batch_item(name: str, contents: bytes, save: bool, mode: str = "standard") -> BatchItemResult:
+    """Enhance one batch entry, turning failures into a per-item error"""
+    start_time = time.time()
+    
+    try:
+        validate_image_bytes(contents)
+        # The batch is bounded by MAX_BATCH_FILES, so items queue for admission
+        # (up to the wait deadline) instead of being shed individually
+        enhanced_bytes, enhanced_file_path, stats = await run_enhancement(
+            contents, name if save else None, mode=mode, shed=False
+        )
+        return BatchItemResult(
+            source_name=name,
+            success=True,
+            enhanced_image=f"data:image/jpeg;base64,{base64.b64encode(enhanced_bytes).decode('utf-8')}",
+            file_name=Path(enhanced_file_path).name if enhanced_file_path else None,
+            processing_time_ms=(time.time() - start_time) * 1000,
+            foreground_fraction=stats.get("foreground_fraction")
+        )
+    except APIException as e:
+        logger.warning(f"Batch item {name} failed: {e.error_code}")
+        errors_total.labels(e.error_code).inc()
+        detail = e.detail if isinstance(e.detail, dict) else {"message": str(e.detail)}
+        error_code, message = e.error_code, detail["message"]
+    except Exception as e:
+        logger.error(f"Unexpected error for batch item {name}: {str(e)}", exc_info=True)
+        errors_total.labels("IMAGE_PROCESSING_ERROR").inc()
+        error_code, message = "IMAGE_PROCESSING_ERROR", f"Unexpected error: {str(e)}"
+    
+    return BatchItemResult(
+        source_name=name,
+        success=False,
+        processing_time_ms=(time.time() - start_time) * 1000,
+        error_code=error_code,
+        message=message
+    )
+
+@router.post("/enhance/batch", response_model=BatchEnhancementResponse)
+async def enhance_fingerprint_batch(
+    files: List[UploadFile] = File(...),
+    save: bool = Query(False, description="Keep downloadable copies in the enhanced directory"),
+    mode: EnhancementMode = Query(
+        "standard", description="'pyramid' (coarse orientation/frequency) and 'float32' (single precision) are faster"
+    )
+):
+    """
+    Enhance several fingerprint images in one request
+    
+    - **files**: Image files (JPEG, PNG, BMP) and/or zip archives of images
+    - **save**: Persist the results so they can be fetched from /api/download
+    - Returns: Per-file results; one bad file does not fail the batch
+    """
+    start_time = time.time()
+    
+    # Expand uploads (and zip archives) into (name, bytes, mime) entries
+    entries = []
+    # Archives count at their inflated size against the whole-batch cap
+    batch_bytes_left = settings.max_batch_size_mb * 1024 * 1024
+    for file in files:
+        name = file.filename or "unnamed"
+        # Size-capped here; image headers are sniffed per item so one bad
+        # file does not fail the batch
+        contents, _ = await read_upload(file, require_image=False)
+        if is_zip_upload(name, file.content_type):
+            archive_entries = extract_zip_images(contents, batch_bytes_left)
+            entries.extend(archive_entries)
+            batch_bytes_left -= sum(len(entry[1]) for entry in archive_entries)
+        else:
+            entries.append((name, contents, file.content_type))
+            batch_bytes_left -= len(contents)
+            if batch_bytes_left < 0:
+                raise FileUploadError(f"Batch exceeds {settings.max_batch_size_mb}MB limit")
+        
+        if len(entries) > settings.max_batch_files:
+            raise FileUploadError(f"Batch exceeds {settings.max_batch_files} file limit")
+    
+    if not entries:
+        raise FileUploadError("No images found in upload")
+    
+    logger.info(f"Processing batch of {len(entries)} files")
+    
+    # Fan out across the worker pool; results keep upload order
+    results = await asyncio.gather(
+        *(_enhance_batch_item(name, contents, save, mode) for name, contents, _ in entries)
+    )
+    
+    succeeded = sum(1 for result in results if result.success)
+    processing_time = (time.time() - start_time) * 1000
+    
+    logger.info(f"Batch completed: {succeeded}/{len(results)} succeeded in {processing_time:.2f}ms")
+    
+    return BatchEnhancementResponse(
+        success=succeeded == len(results),
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results,
+        processing_time_ms=processing_time,
+        total_item_time_ms=sum(result.processing_time_ms for result in results)
+    )
 
 @router.get("/download/{filename}")
 async def download_enhanced_image(filename: str):
     """Download enhanced image"""
     try:
-        file_path = os.path.join(settings.enhanced_dir, filename)
-        
-        # Security check: ensure file is in enhanced directory
-        if not os.path.abspath(file_path).startswith(os.path.abspath(settings.enhanced_dir)):
+        # Security check: only bare file names inside the enhanced directory
+        if Path(filename).name != filename or filename.startswith("."):
             logger.warning(f"Attempted path traversal: {filename}")
             raise FileUploadError("Invalid file path")
         
-        if not os.path.exists(file_path):
+        # The shard directory follows from the name, so no listing is needed
+        file_path = resolve_output(filename)
+        if file_path is None:
             raise FileUploadError("File not found")
         
         logger.info(f"Downloading file: {filename}")
         
         return FileResponse(
             path=file_path,
-            media_type="image/jpeg",
+            media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
             filename=filename
         )
         
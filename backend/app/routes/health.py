@@ -1,9 +1,14 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, Response
 from datetime import datetime
 
 from app.logger import get_logger
 from app.config import settings
 from app.schemas import HealthResponse
+from app.cache import enhancement_cache
+from app.admission import admission_controller
+from app.metrics import render_metrics
+from app.workers import enhancement_pool
 
 router = APIRouter(tags=["Health"])
 logger = get_logger(__name__)
@@ -17,6 +22,13 @@ async def health_check():
         version=settings.api_version
     )
 
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the worker pool has been started and warmed up"""
+    if not enhancement_pool.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
 @router.get("/status")
 async def status():
     """Get API status"""
@@ -24,5 +36,13 @@ async def status():
         "status": "running",
         "environment": settings.fastapi_env,
         "debug": settings.debug,
+        "cache": enhancement_cache.stats(),
+        "admission": admission_controller.stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
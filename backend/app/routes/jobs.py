@@ -0,0 +1,77 @@
+from fastapi import APIRouter, UploadFile, File, Query, status
+from fastapi.responses import Response
+
+from app.logger import get_logger
+from app.schemas import JobStatusResponse
+from app.exceptions import FileUploadError, NotFoundError, ConflictError
+from app.jobs import Job, JobState, job_queue
+from app.uploads import read_upload
+from app.utils import EnhancementMode
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+logger = get_logger(__name__)
+
+def _job_response(job: Job) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.id,
+        status=job.state.value,
+        source_name=job.source_name,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        timings=job.timings,
+        file_name=job.file_name,
+        result_url=f"/api/jobs/{job.id}/result" if job.state == JobState.DONE else None,
+        error_code=job.error_code,
+        message=job.message
+    )
+
+def _get_job(job_id: str) -> Job:
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise NotFoundError(f"Job {job_id} not found")
+    return job
+
+@router.post("", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    file: UploadFile = File(...),
+    save: bool = Query(False, description="Keep a downloadable copy in the enhanced directory"),
+    full_resolution: bool = Query(False, description="Enhance at capture resolution (tiled for large scans)"),
+    mode: EnhancementMode = Query(
+        "standard", description="'pyramid' (coarse orientation/frequency) and 'float32' (single precision) are faster"
+    )
+):
+    """
+    Queue a fingerprint image for enhancement
+
+    - **file**: Image file (JPEG, PNG, BMP)
+    - Returns: Job id to poll at /api/jobs/{job_id}
+    """
+    if not file.filename:
+        raise FileUploadError("Filename is missing")
+
+    contents, _ = await read_upload(file)
+
+    job = job_queue.submit(file.filename, contents, save, full_resolution, mode)
+    return _job_response(job)
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Get job state and per-stage timings"""
+    return _job_response(_get_job(job_id))
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Get the enhanced JPEG of a finished job"""
+    job = _get_job(job_id)
+
+    if job.state == JobState.FAILED:
+        raise ConflictError(f"Job {job_id} failed: {job.message}")
+    if job.state != JobState.DONE:
+        raise ConflictError(f"Job {job_id} is {job.state.value}")
+
+    result = job_queue.store.get_result(job_id)
+    if result is None:
+        raise NotFoundError(f"Result for job {job_id} has expired")
+
+    return Response(content=result, media_type="image/jpeg")
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, UploadFile, File, Query
+import time
+
+from app.logger import get_logger
+from app.schemas import MinutiaeResponse
+from app.exceptions import FileUploadError
+from app.service import run_minutiae_extraction
+from app.uploads import read_upload
+from app.utils import EnhancementMode
+
+router = APIRouter(prefix="/api", tags=["Minutiae"])
+logger = get_logger(__name__)
+
+@router.post("/minutiae", response_model=MinutiaeResponse)
+async def extract_fingerprint_minutiae(
+    file: UploadFile = File(...),
+    full_resolution: bool = Query(False, description="Extract at capture resolution instead of the working size"),
+    mode: EnhancementMode = Query("standard", description="Orientation/frequency estimation mode")
+):
+    """
+    Enhance a fingerprint and extract its ridge endings and bifurcations
+    
+    - **file**: Image file (JPEG, PNG, BMP)
+    - Returns: Parallel x, y, angle, type and quality arrays in ridge-map
+      pixel coordinates; captures below QUALITY_MIN_SCORE are rejected
+    """
+    start_time = time.time()
+    
+    if not file.filename:
+        raise FileUploadError("Filename is missing")
+    
+    contents, _ = await read_upload(file)
+    result = await run_minutiae_extraction(contents, full_resolution, mode)
+    
+    processing_time = (time.time() - start_time) * 1000
+    logger.info(f"Extracted {result['count']} minutiae from {file.filename} in {processing_time:.2f}ms")
+    
+    capture_quality = result.pop("capture_quality")
+    return MinutiaeResponse(**result, quality_score=capture_quality["score"], processing_time_ms=processing_time)
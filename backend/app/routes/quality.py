@@ -0,0 +1,42 @@
+from fastapi import APIRouter, UploadFile, File, Query
+import time
+
+from app.logger import get_logger
+from app.config import settings
+from app.schemas import QualityResponse
+from app.exceptions import FileUploadError
+from app.service import run_quality_assessment
+from app.uploads import read_upload
+
+router = APIRouter(prefix="/api", tags=["Quality"])
+logger = get_logger(__name__)
+
+@router.post("/quality", response_model=QualityResponse)
+async def assess_fingerprint_quality(
+    file: UploadFile = File(...),
+    full_resolution: bool = Query(False, description="Score at capture resolution instead of the working size")
+):
+    """
+    Score a fingerprint capture without enhancing it
+    
+    - **file**: Image file (JPEG, PNG, BMP)
+    - Returns: Score (0-100) with its coherence, contrast and foreground
+      components; /api/enhance rejects captures below QUALITY_MIN_SCORE
+    """
+    start_time = time.time()
+    
+    if not file.filename:
+        raise FileUploadError("Filename is missing")
+    
+    contents, _ = await read_upload(file)
+    report = await run_quality_assessment(contents, full_resolution)
+    
+    processing_time = (time.time() - start_time) * 1000
+    logger.info(f"Quality of {file.filename}: {report['score']:.1f} in {processing_time:.2f}ms")
+    
+    return QualityResponse(
+        **report,
+        acceptable=report["score"] >= settings.quality_min_score,
+        min_score=settings.quality_min_score,
+        processing_time_ms=processing_time
+    )
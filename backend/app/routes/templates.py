@@ -0,0 +1,63 @@
+from fastapi import APIRouter, UploadFile, File, Query
+import time
+
+from app.logger import get_logger
+from app.schemas import EnrollmentResponse, SearchResponse
+from app.exceptions import FileUploadError
+from app.service import run_template_enrollment, run_template_search
+from app.uploads import read_upload
+
+router = APIRouter(prefix="/api/templates", tags=["Templates"])
+logger = get_logger(__name__)
+
+@router.post("", response_model=EnrollmentResponse)
+async def enroll_fingerprint(
+    file: UploadFile = File(...),
+    subject_id: str = Query(..., min_length=1, max_length=128, description="Identity the template belongs to")
+):
+    """
+    Enroll a fingerprint in the 1:N template index
+    
+    - **file**: Image file (JPEG, PNG, BMP)
+    - **subject_id**: Several impressions may be enrolled under one subject
+    - Returns: Row id of the stored template and the new index size
+    """
+    start_time = time.time()
+    
+    if not file.filename:
+        raise FileUploadError("Filename is missing")
+    
+    contents, _ = await read_upload(file)
+    result = await run_template_enrollment(contents, subject_id)
+    
+    processing_time = (time.time() - start_time) * 1000
+    logger.info(f"Enrolled template {result['template_id']} for {subject_id} in {processing_time:.2f}ms")
+    
+    return EnrollmentResponse(**result, processing_time_ms=processing_time)
+
+@router.post("/search", response_model=SearchResponse)
+async def search_fingerprint(
+    file: UploadFile = File(...),
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of subjects to return")
+):
+    """
+    Identify a fingerprint against every enrolled template
+    
+    - **file**: Image file (JPEG, PNG, BMP)
+    - Returns: Best-matching subjects with scores (0-100), best first
+    """
+    start_time = time.time()
+    
+    if not file.filename:
+        raise FileUploadError("Filename is missing")
+    
+    contents, _ = await read_upload(file)
+    result = await run_template_search(contents, limit)
+    
+    processing_time = (time.time() - start_time) * 1000
+    logger.info(
+        f"Searched {result['index_size']} templates ({result['shortlisted']} shortlisted) "
+        f"for {file.filename} in {processing_time:.2f}ms"
+    )
+    
+    return SearchResponse(**result, processing_time_ms=processing_time)
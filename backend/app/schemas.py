@@ -2,6 +2,12 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional
 from datetime import datetime
 
+class StageTiming(BaseModel):
+    """Timing of one named pipeline stage"""
+    name: str
+    duration_ms: float
+    peak_memory_bytes: Optional[int] = Field(None, description="Peak heap allocated in the stage (PROFILE_MEMORY)")
+
 class FileUploadResponse(BaseModel):
     """Response model for file upload"""
     success: bool
@@ -9,6 +15,102 @@ class FileUploadResponse(BaseModel):
     enhanced_image: Optional[str] = Field(None, description="Base64 encoded enhanced image")
     file_name: Optional[str] = Field(None, description="Enhanced file name")
     processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+    foreground_fraction: Optional[float] = Field(
+        None, description="Fraction of the frame segmented as fingerprint; only this region is filtered"
+    )
+    preview: bool = Field(False, description="enhanced_image is a quick preview; the full result follows as a job")
+    job_id: Optional[str] = Field(None, description="Job producing the full result (preview requests)")
+    result_url: Optional[str] = Field(None, description="Where the full result can be fetched once the job is done")
+    stages: Optional[list[StageTiming]] = Field(None, description="Per-stage timing breakdown")
+
+class BatchItemResult(BaseModel):
+    """Result for a single file in a batch enhancement request"""
+    source_name: str = Field(..., description="Uploaded (or archived) file name")
+    success: bool
+    enhanced_image: Optional[str] = Field(None, description="Base64 encoded enhanced image")
+    file_name: Optional[str] = Field(None, description="Enhanced file name")
+    processing_time_ms: float = Field(..., description="Time spent on this file in milliseconds")
+    foreground_fraction: Optional[float] = Field(
+        None, description="Fraction of the frame segmented as fingerprint; only this region is filtered"
+    )
+    error_code: Optional[str] = None
+    message: Optional[str] = None
+
+class BatchEnhancementResponse(BaseModel):
+    """Response model for batch enhancement"""
+    success: bool = Field(..., description="True when every file was enhanced")
+    total: int
+    succeeded: int
+    failed: int
+    results: list[BatchItemResult]
+    processing_time_ms: float = Field(..., description="Wall-clock time for the whole batch")
+    total_item_time_ms: float = Field(..., description="Sum of per-file processing times")
+
+class JobStatusResponse(BaseModel):
+    """Status of an asynchronous enhancement job"""
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    source_name: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    timings: dict[str, float] = Field(default_factory=dict, description="Per-stage timings in milliseconds")
+    file_name: Optional[str] = Field(None, description="Enhanced file name when saved")
+    result_url: Optional[str] = None
+    error_code: Optional[str] = None
+    message: Optional[str] = None
+
+class QualityResponse(BaseModel):
+    """Quality assessment of a capture"""
+    score: float = Field(..., description="0-100; coherence scaled down by low contrast or small area")
+    acceptable: bool = Field(..., description="True when the score meets QUALITY_MIN_SCORE")
+    min_score: float
+    coherence: float = Field(..., description="Mean ridge orientation coherence of foreground blocks (0-1)")
+    contrast: float = Field(..., description="Median grey-level std of foreground blocks")
+    foreground_fraction: float = Field(..., description="Fraction of the frame segmented as fingerprint")
+    dimensions: tuple[int, int]
+    processing_time_ms: float
+    stages: Optional[list[StageTiming]] = None
+
+class MinutiaeResponse(BaseModel):
+    """Minutiae as parallel arrays; index i of each array describes one minutia"""
+    count: int
+    x: list[int] = Field(..., description="Column in the ridge map (enhanced_dimensions)")
+    y: list[int] = Field(..., description="Row in the ridge map (enhanced_dimensions)")
+    angle: list[float] = Field(..., description="Radians in [0, 2*pi), counter-clockwise from +x")
+    type: list[int] = Field(..., description="Crossing number: 1 = ridge ending, 3 = bifurcation")
+    quality: list[float] = Field(..., description="Local ridge orientation coherence (0-1)")
+    ridge_period: float = Field(..., description="Estimated ridge spacing in pixels")
+    mode: str
+    dimensions: tuple[int, int]
+    enhanced_dimensions: tuple[int, int]
+    quality_score: float
+    processing_time_ms: float
+    stages: Optional[list[StageTiming]] = None
+
+class EnrollmentResponse(BaseModel):
+    """Template added to the 1:N index"""
+    template_id: int
+    subject_id: str
+    minutiae: int = Field(..., description="Minutiae stored in the template")
+    index_size: int = Field(..., description="Templates in the index after enrollment")
+    processing_time_ms: float
+    stages: Optional[list[StageTiming]] = None
+
+class SearchCandidate(BaseModel):
+    """Best-scoring template of one enrolled subject"""
+    subject_id: str
+    template_id: int
+    score: float = Field(..., description="0-100; share of minutiae paired after alignment")
+
+class SearchResponse(BaseModel):
+    """1:N search result"""
+    candidates: list[SearchCandidate]
+    shortlisted: int = Field(..., description="Templates the candidate lookup passed to alignment scoring")
+    minutiae: int = Field(..., description="Minutiae in the query template")
+    index_size: int
+    processing_time_ms: float
+    stages: Optional[list[StageTiming]] = None
 
 class EnhancementStats(BaseModel):
     """Statistics about enhancement"""
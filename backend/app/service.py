@@ -0,0 +1,172 @@
+import asyncio
+import math
+import time
+from typing import Optional, Tuple
+
+from app.logger import get_logger
+from app.config import settings
+from app.cache import EnhancementCache, enhancement_cache
+from app.profiling import StageTimer
+from app.admission import DEFAULT_TIMEOUT, WORKING_ROWS, admission_controller, estimate_memory_bytes
+from app.metrics import (
+    cache_lookups_total,
+    enhancement_duration_seconds,
+    enhancements_in_flight,
+    size_label
+)
+from app.exceptions import LowQualityError
+from app.uploads import read_image_header
+from app.utils import (
+    OUTPUT_FORMATS,
+    assess_image_bytes,
+    enhance_image_bytes,
+    enhancer_params,
+    enroll_template_bytes,
+    extract_minutiae_bytes,
+    save_enhanced_bytes,
+    search_template_bytes
+)
+from app.workers import enhancement_pool
+
+logger = get_logger(__name__)
+
+# Everything besides the input bytes that determines the output image.
+# Bump "version" whenever the engine output changes to invalidate the cache.
+ENHANCEMENT_PARAMS = {
+    "engine": "gabor",
+    "version": 2,
+    "invert_output": True
+}
+
+def _result_capacity(contents: bytes, full_resolution: bool) -> int:
+    """Room to reserve for the encoded result: a byte per enhanced pixel plus headers"""
+    header = read_image_header(contents)
+    if header is None or header.width == 0 or header.height == 0:
+        return 0
+    if full_resolution:
+        pixels = header.width * header.height
+    else:
+        pixels = WORKING_ROWS * math.ceil(WORKING_ROWS * header.width / header.height)
+    return pixels + 64 * 1024
+
+async def _run_in_pool(contents: bytes, save_as: Optional[str], full_resolution: bool,
+                       output_format: str, mode: str, timer: StageTimer, wait_timeout, shed: bool
+                       ) -> Tuple[bytes, Optional[str], dict]:
+    """
+    Dispatch to the worker pool once admitted, recording in-flight work and
+    duration by size
+    """
+    cost = estimate_memory_bytes(contents, full_resolution)
+    admission_start = time.perf_counter()
+    async with admission_controller.admit(cost, wait_timeout, shed):
+        timer.add("admission", (time.perf_counter() - admission_start) * 1000)
+        start_time = time.perf_counter()
+        enhancements_in_flight.inc()
+        try:
+            enhanced_bytes, output_path, stats = await enhancement_pool.run_shared(
+                enhance_image_bytes, contents, _result_capacity(contents, full_resolution),
+                save_as, full_resolution, output_format, mode
+            )
+        finally:
+            enhancements_in_flight.dec()
+    enhancement_duration_seconds.labels(size_label(*stats["dimensions"])).observe(time.perf_counter() - start_time)
+    return enhanced_bytes, output_path, stats
+
+async def run_enhancement(
+    contents: bytes,
+    save_as: Optional[str] = None,
+    full_resolution: bool = False,
+    output_format: str = "jpeg",
+    mode: str = "standard",
+    wait_timeout=DEFAULT_TIMEOUT,
+    shed: bool = True
+) -> Tuple[bytes, Optional[str], dict]:
+    """
+    Enhance uploaded bytes, serving repeated inputs from the result cache
+
+    Args:
+        contents: Raw uploaded image bytes
+        save_as: Original file name; when given, a downloadable copy is kept
+        full_resolution: Enhance at capture resolution (tiled when large)
+        output_format: "jpeg" or "png"
+        mode: "standard", "pyramid" or "float32" (see app.utils.ENHANCEMENT_MODES)
+        wait_timeout: Seconds a cache miss may wait for admission (None
+            waits indefinitely; default ADMISSION_WAIT_TIMEOUT_SECONDS)
+        shed: Reject with 503 instead of queueing when the admission
+            queue is full
+
+    Returns:
+        Tuple of (image_bytes, output_path or None, enhancement_stats); the
+        stats carry a "cache" field of "memory", "disk" or "miss"
+    """
+    timer = StageTimer()
+    if not settings.cache_enabled:
+        enhanced_bytes, output_path, stats = await _run_in_pool(
+            contents, save_as, full_resolution, output_format, mode, timer, wait_timeout, shed
+        )
+        stats["stages"] = timer.stages + stats.get("stages", [])
+        return enhanced_bytes, output_path, {**stats, "cache": "disabled"}
+
+    with timer.stage("cache_lookup"):
+        key = EnhancementCache.make_key(contents, {
+            **ENHANCEMENT_PARAMS, "full_resolution": full_resolution, "output_format": output_format,
+            **({"mode": mode, **enhancer_params(mode)} if mode != "standard" else {})
+        })
+        cached = await asyncio.to_thread(enhancement_cache.get, key)
+
+    cache_lookups_total.labels(cached[2] if cached is not None else "miss").inc()
+    if cached is not None:
+        enhanced_bytes, stats, tier = cached
+        logger.info(f"Cache hit ({tier}) for {key[:12]}")
+        # The quality gate may have been raised since the result was cached
+        quality = stats.get("quality")
+        if quality is not None and quality["score"] < settings.quality_min_score:
+            raise LowQualityError(
+                f"Fingerprint quality score {quality['score']:.1f} is below the minimum of "
+                f"{settings.quality_min_score:g}",
+                quality
+            )
+        output_path = None
+        if save_as is not None:
+            with timer.stage("save"):
+                output_path = await asyncio.to_thread(
+                    save_enhanced_bytes, enhanced_bytes, save_as, OUTPUT_FORMATS[output_format][0]
+                )
+        return enhanced_bytes, output_path, {
+            **stats, "original_size": len(contents), "cache": tier, "stages": timer.stages
+        }
+
+    enhanced_bytes, output_path, stats = await _run_in_pool(
+        contents, save_as, full_resolution, output_format, mode, timer, wait_timeout, shed
+    )
+    # Stage timings describe this run only, so they are not cached
+    stats["stages"] = timer.stages + stats.get("stages", [])
+    cached_stats = {name: value for name, value in stats.items() if name != "stages"}
+    await asyncio.to_thread(enhancement_cache.put, key, enhanced_bytes, cached_stats)
+    return enhanced_bytes, output_path, {**stats, "cache": "miss"}
+
+async def run_quality_assessment(contents: bytes, full_resolution: bool = False) -> dict:
+    """Score an upload in the worker pool, admitted like an enhancement"""
+    cost = estimate_memory_bytes(contents, full_resolution)
+    async with admission_controller.admit(cost):
+        return await enhancement_pool.run(assess_image_bytes, contents, full_resolution)
+
+async def run_minutiae_extraction(contents: bytes, full_resolution: bool = False, mode: str = "standard") -> dict:
+    """Extract minutiae in the worker pool, admitted like an enhancement"""
+    cost = estimate_memory_bytes(contents, full_resolution)
+    async with admission_controller.admit(cost):
+        return await enhancement_pool.run(extract_minutiae_bytes, contents, full_resolution, mode)
+
+async def run_template_enrollment(contents: bytes, subject_id: str) -> dict:
+    """Extract a template and append it to the index in the worker pool"""
+    cost = estimate_memory_bytes(contents)
+    async with admission_controller.admit(cost):
+        return await enhancement_pool.run(enroll_template_bytes, contents, subject_id, settings.template_index_dir)
+
+async def run_template_search(contents: bytes, limit: int = 10) -> dict:
+    """Extract a template and search the index with it in the worker pool"""
+    cost = estimate_memory_bytes(contents)
+    async with admission_controller.admit(cost):
+        return await enhancement_pool.run(
+            search_template_bytes, contents, limit, settings.search_shortlist, settings.template_index_dir
+        )
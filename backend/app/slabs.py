@@ -0,0 +1,150 @@
+"""
+Shared-memory handoff between the web process and enhancement workers
+
+Uploads and enhanced results can be tens of megabytes for full-resolution
+scans, and sending them to a worker as task arguments pickles them through
+a pipe: a copy into the pickle, a write and a read through the kernel, and a
+copy out again, in both directions. Instead the web process copies the
+upload into a multiprocessing.shared_memory slab and sends only the slab's
+name. The worker decodes straight from an ndarray view of the slab and,
+once decoding has consumed the upload, writes the encoded result over it,
+returning just its length.
+
+Slabs come in power-of-two size classes and are recycled across requests,
+so a steady stream of similar scans reuses the same few segments instead
+of creating, zero-filling and unlinking one per request. The pool's total
+size is capped by SHARED_MEMORY_MB, and free space on /dev/shm is checked
+before a new segment is created (writing past a full tmpfs kills the
+process with SIGBUS). When either limit is hit, work falls back to
+pickling.
+
+Only the standard library is used here, so the web process still never
+imports numpy.
+"""
+
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, NamedTuple, Optional
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Smallest slab; larger size classes are powers of two
+MIN_SLAB_BYTES = 1 << 20
+
+# Payloads below this are cheaper to pickle (python -m benchmarks.run --suites handoff)
+MIN_SHARED_BYTES = 256 * 1024
+
+# Where POSIX shared memory lives on Linux
+SHM_DIR = "/dev/shm"
+
+class SlabHandle(NamedTuple):
+    """Picklable reference to a leased slab holding size bytes of input"""
+    name: str
+    size: int
+    capacity: int
+
+def size_class(nbytes: int) -> int:
+    """Slab size used for a payload of nbytes"""
+    return max(MIN_SLAB_BYTES, 1 << (max(nbytes, 1) - 1).bit_length())
+
+def _shm_free_bytes() -> Optional[int]:
+    try:
+        stats = os.statvfs(SHM_DIR)
+    except OSError:
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+class SlabPool:
+    """Recycled shared-memory segments, leased one per in-flight task"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._idle: Dict[int, List[shared_memory.SharedMemory]] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.created = 0
+        self.reused = 0
+
+    def _evict_idle(self, needed: int):
+        """Unlink idle slabs of other sizes until needed more bytes fit"""
+        for size, slabs in self._idle.items():
+            while slabs and self.total_bytes + needed > self.max_bytes:
+                self._destroy(slabs.pop())
+
+    def _destroy(self, slab: shared_memory.SharedMemory):
+        self.total_bytes -= slab.size
+        slab.close()
+        slab.unlink()
+
+    def lease(self, contents: bytes, capacity: int = 0) -> Optional[shared_memory.SharedMemory]:
+        """
+        Copy contents into a slab with room for at least capacity bytes
+
+        Returns:
+            The slab, or None when the pool is disabled or full, or
+            /dev/shm lacks the space (the caller should pickle instead)
+        """
+        size = size_class(max(len(contents), capacity))
+        with self._lock:
+            idle = self._idle.get(size)
+            if idle:
+                slab = idle.pop()
+                self.reused += 1
+            else:
+                self._evict_idle(size)
+                if self.total_bytes + size > self.max_bytes:
+                    return None
+                free = _shm_free_bytes()
+                if free is not None and free < size:
+                    return None
+                try:
+                    slab = shared_memory.SharedMemory(create=True, size=size)
+                except OSError as e:
+                    logger.warning(f"Could not create a {size} byte shared memory slab: {str(e)}")
+                    return None
+                self.total_bytes += slab.size
+                self.created += 1
+        slab.buf[:len(contents)] = contents
+        return slab
+
+    def release(self, slab: shared_memory.SharedMemory):
+        """Return a slab for reuse once no worker is using it"""
+        with self._lock:
+            self._idle.setdefault(slab.size, []).append(slab)
+
+    def clear(self):
+        """Unlink every idle slab"""
+        with self._lock:
+            for slabs in self._idle.values():
+                while slabs:
+                    self._destroy(slabs.pop())
+
+def read_result(slab: shared_memory.SharedMemory, result) -> bytes:
+    """Bytes a worker returned, either as a length written to the slab or inline"""
+    if isinstance(result, int):
+        return bytes(slab.buf[:result])
+    return result
+
+def run_on_slab(func, handle: SlabHandle, *args):
+    """
+    Worker side: call func(upload, *args) on a zero-copy view of the slab
+
+    func must return a tuple whose first item is bytes (e.g.
+    enhance_image_bytes). That item is written back into the slab when it
+    fits and replaced by its length; otherwise it is returned as is.
+    """
+    slab = shared_memory.SharedMemory(name=handle.name)
+    upload = slab.buf[:handle.size]
+    try:
+        result, *rest = func(upload, *args)
+        if len(result) <= handle.capacity:
+            slab.buf[:len(result)] = result
+            result = len(result)
+        return (result, *rest)
+    finally:
+        # The slice holds an export on the mapping, which close() refuses
+        upload.release()
+        slab.close()
@@ -0,0 +1,120 @@
+"""
+Long-lived enhancement worker speaking a framed protocol over stdin/stdout
+
+Started by the Node web server (fingerprint-web/pythonPool.js) as
+``python -m app.stdio_worker`` from the backend directory, so numpy, SciPy,
+OpenCV and the Gabor kernel bank are loaded once per worker rather than once
+per upload.
+
+Every message in either direction is one frame:
+
+    4-byte big-endian header length | JSON header | payload
+
+The header's "length" field gives the payload size (0 when absent).
+
+Requests:  {"id": 7, "op": "enhance", "length": N, "full_resolution": false, "mode": "standard"}
+           {"id": 8, "op": "ping"}
+Responses: {"id": 7, "ok": true, "length": M, "stats": {...}}  + JPEG bytes
+           {"id": 7, "ok": false, "error_code": "...", "message": "..."}
+           {"id": 8, "ok": true, "pong": true}
+
+Requests are answered in order. The ids let the client pipeline several
+requests to one worker and match the replies. Logs go to stderr.
+"""
+
+import json
+import os
+import struct
+import sys
+from typing import BinaryIO, Optional, Tuple
+
+HEADER_LENGTH = struct.Struct(">I")
+MAX_HEADER_BYTES = 1 << 20
+
+def read_frame(stream: BinaryIO) -> Optional[Tuple[dict, bytes]]:
+    """Read one frame; None on a clean end of stream"""
+    prefix = stream.read(HEADER_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < HEADER_LENGTH.size:
+        raise EOFError("Truncated frame prefix")
+    (header_length,) = HEADER_LENGTH.unpack(prefix)
+    if header_length > MAX_HEADER_BYTES:
+        raise ValueError(f"Frame header too large: {header_length} bytes")
+
+    header = json.loads(_read_exact(stream, header_length))
+    payload = _read_exact(stream, int(header.get("length", 0)))
+    return header, payload
+
+def write_frame(stream: BinaryIO, header: dict, payload: bytes = b""):
+    encoded = json.dumps({**header, "length": len(payload)}).encode("utf-8")
+    stream.write(HEADER_LENGTH.pack(len(encoded)) + encoded + payload)
+    stream.flush()
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = stream.read(size)
+        if not chunk:
+            raise EOFError("Truncated frame")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def handle(header: dict, payload: bytes) -> Tuple[dict, bytes]:
+    """Serve one request and return the response frame"""
+    from app.exceptions import APIException
+    from app.utils import ENHANCEMENT_MODES, enhance_image_bytes
+
+    request_id = header.get("id")
+    op = header.get("op")
+    if op == "ping":
+        return {"id": request_id, "ok": True, "pong": True, "pid": os.getpid()}, b""
+    if op != "enhance":
+        return {"id": request_id, "ok": False, "error_code": "BAD_REQUEST", "message": f"Unknown op: {op}"}, b""
+
+    mode = header.get("mode", "standard")
+    if mode not in ENHANCEMENT_MODES:
+        return {"id": request_id, "ok": False, "error_code": "BAD_REQUEST", "message": f"Unknown mode: {mode}"}, b""
+
+    try:
+        image_bytes, _, stats = enhance_image_bytes(
+            payload, full_resolution=bool(header.get("full_resolution")), mode=mode
+        )
+    except APIException as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"message": str(e.detail)}
+        return {"id": request_id, "ok": False, "error_code": e.error_code, "message": detail["message"]}, b""
+    except Exception as e:
+        return {"id": request_id, "ok": False, "error_code": "IMAGE_PROCESSING_ERROR", "message": str(e)}, b""
+    return {"id": request_id, "ok": True, "stats": stats}, image_bytes
+
+def serve(requests: BinaryIO, responses: BinaryIO):
+    """Answer frames until the client closes stdin"""
+    while True:
+        frame = read_frame(requests)
+        if frame is None:
+            return
+        write_frame(responses, *handle(*frame))
+
+def main():
+    # Frames own the real stdout; anything else printed (including the app
+    # logger's console handler) is routed to stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    from app.enhancer import warm_kernel_bank
+    from app.logger import get_logger
+
+    logger = get_logger("app.stdio_worker")
+    warm_kernel_bank()
+    logger.info(f"stdio worker {os.getpid()} ready")
+
+    try:
+        serve(sys.stdin.buffer, channel)
+    except (EOFError, BrokenPipeError):
+        pass
+    logger.info(f"stdio worker {os.getpid()} exiting")
+
+if __name__ == "__main__":
+    main()
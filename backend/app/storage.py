@@ -0,0 +1,189 @@
+"""
+Output file storage and retention
+
+Enhanced files live in hash-sharded subdirectories of ENHANCED_DIR
+(enhanced/<shard>/<file>), so a download resolves its path from the file
+name alone and no directory grows with the retained total. Every stored
+file is recorded in a SQLite expiry index shared by all worker processes;
+the background sweeper deletes only rows whose expiry has passed instead of
+listing and stat-ing every retained file.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from app.logger import get_logger
+from app.config import settings
+
+logger = get_logger(__name__)
+
+INDEX_FILE_NAME = ".retention.sqlite3"
+
+def shard_for(filename: str) -> str:
+    """Two-hex-digit shard directory for a file name"""
+    return hashlib.sha1(filename.encode("utf-8")).hexdigest()[:2]
+
+def output_path_for(filename: str) -> Path:
+    """Sharded location of an enhanced output file"""
+    return Path(settings.enhanced_dir) / shard_for(filename) / filename
+
+def resolve_output(filename: str) -> Optional[Path]:
+    """
+    Locate a stored output by name without scanning the directory
+
+    Returns:
+        The file path, or None for unsafe names and missing files
+    """
+    if not filename or Path(filename).name != filename or filename.startswith("."):
+        return None
+    # Files written before sharding sit directly in ENHANCED_DIR
+    for path in (output_path_for(filename), Path(settings.enhanced_dir) / filename):
+        if path.is_file():
+            return path
+    return None
+
+class RetentionIndex:
+    """Expiry index of retained files, ordered by expiry time"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are cheap and never shared across threads or processes
+        if not self._initialized:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS files_expires_at ON files (expires_at)")
+            self._initialized = True
+        return conn
+
+    def track(self, paths: Iterable[str], retention_seconds: Optional[float] = None):
+        """Record files to delete once the retention window has passed"""
+        if retention_seconds is None:
+            retention_seconds = settings.file_retention_hours * 3600
+        expires_at = time.time() + retention_seconds
+        rows = [(os.path.abspath(path), expires_at) for path in paths]
+        try:
+            with closing(self._connect()) as conn:
+                conn.executemany("INSERT OR REPLACE INTO files (path, expires_at) VALUES (?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to index files for retention: {str(e)}")
+
+    def expired(self, now: Optional[float] = None, limit: int = 1000) -> List[str]:
+        """Paths whose expiry has passed, oldest first"""
+        now = time.time() if now is None else now
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT path FROM files WHERE expires_at <= ? ORDER BY expires_at LIMIT ?", (now, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def forget(self, paths: List[str]):
+        with closing(self._connect()) as conn:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def sweep(self, now: Optional[float] = None, batch_size: int = 1000) -> int:
+        """Delete expired files and their index rows; returns files removed"""
+        removed = 0
+        while True:
+            paths = self.expired(now, batch_size)
+            if not paths:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to delete expired file {path}: {str(e)}")
+            self.forget(paths)
+            if len(paths) < batch_size:
+                break
+        return removed
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+def _unindexed_files(directories: Iterable[str], indexed: set) -> Iterable[Tuple[str, float]]:
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if name.startswith(INDEX_FILE_NAME) or path in indexed:
+                    continue
+                try:
+                    yield path, os.path.getmtime(path)
+                except OSError:
+                    continue
+
+def adopt_existing_files(index: RetentionIndex, directories: Iterable[str]) -> int:
+    """
+    Index files that predate the index (e.g. from earlier releases)
+
+    Runs once at startup; expiry is derived from each file's mtime.
+    """
+    retention_seconds = settings.file_retention_hours * 3600
+    with closing(index._connect()) as conn:
+        indexed = {row[0] for row in conn.execute("SELECT path FROM files")}
+        rows = [(path, mtime + retention_seconds) for path, mtime in _unindexed_files(directories, indexed)]
+        conn.executemany("INSERT OR IGNORE INTO files (path, expires_at) VALUES (?, ?)", rows)
+    if rows:
+        logger.info(f"Indexed {len(rows)} existing files for retention")
+    return len(rows)
+
+class RetentionSweeper:
+    """Periodically deletes expired files from the retention index"""
+
+    def __init__(self, index: RetentionIndex, interval_seconds: float, directories: List[str]):
+        self.index = index
+        self.interval_seconds = interval_seconds
+        self.directories = directories
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the sweep loop on the current event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Retention sweeper started (every {self.interval_seconds:.0f}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("Retention sweeper stopped")
+
+    async def _run(self):
+        try:
+            await asyncio.to_thread(adopt_existing_files, self.index, self.directories)
+        except Exception as e:
+            logger.warning(f"Failed to index existing files: {str(e)}")
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.index.sweep)
+                if removed:
+                    logger.info(f"Retention sweep removed {removed} expired files")
+            except Exception as e:
+                logger.warning(f"Retention sweep failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+# Global retention index and sweeper
+retention_index = RetentionIndex(os.path.join(settings.enhanced_dir, INDEX_FILE_NAME))
+retention_sweeper = RetentionSweeper(
+    retention_index,
+    interval_seconds=settings.retention_sweep_interval_seconds,
+    directories=[settings.upload_dir, settings.enhanced_dir]
+)
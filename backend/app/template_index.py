@@ -0,0 +1,516 @@
+"""
+Minutiae template index for 1:N identification
+
+Templates live in fixed-width NumPy arrays memory-mapped from
+TEMPLATE_INDEX_DIR, so opening the index costs nothing and every worker
+process, across all uvicorn workers, shares one copy through the page cache:
+
+- minutiae.npy         (capacity, MAX_TEMPLATE_MINUTIAE) packed minutiae
+- headers.npy          (capacity,) minutia count and the template's span of keys.u32
+- keys.u32             every template's sorted triplet keys, appended in row order
+- postings-<n>.u32     inverted index over the first n templates: rows grouped by key
+- offsets-<n>.npy      (INDEX_BUCKETS + 1,) start of each key's rows in postings-<n>.u32
+- subjects.txt         one JSON-encoded subject id per template row
+- meta.json            row, key and indexed counts; replaced last, so readers
+                       never see partial rows
+
+Enrollment appends under an exclusive file lock and doubles the arrays when
+full. Search runs in two stages:
+
+1. Candidate lookup. Each template is described by hashed minutia triplets
+   (each minutia with pairs of its nearest neighbours), keyed on side
+   lengths and on minutia directions relative to the triangle, neither of
+   which changes under rotation or translation. The inverted index maps
+   each key to the templates containing it, so a query reads only the
+   posting lists of its own keys and counts, per template, the keys they
+   share; templates sharing none are never touched. The keys are
+   quantized finely enough that an unrelated template shares well under
+   one key with a query on average (a mate shares tens), so the work is a
+   small fraction of the index size rather than a pass over every row.
+   Templates enrolled since the postings were last built (at most
+   max(TAIL_MIN_ROWS, indexed / TAIL_FRACTION) rows) are matched against
+   the query's keys directly. Enrollment rebuilds the postings once that
+   tail is full, which keeps the amortized cost per enrollment constant
+   but makes that one enrollment wait for a rebuild of the whole index.
+2. Scoring. For each trial rotation, the minutia pairs that roughly agree
+   with it vote for a translation. The strongest vote aligns the query, a
+   least-squares fit on the paired minutiae refines it, and the score
+   counts the minutiae that then agree in position and direction. The
+   SEARCH_SHORTLIST templates sharing the most keys are scored together in
+   array operations.
+
+Coordinates are rescaled to REFERENCE_PERIOD pixels per ridge period on the
+way in, so templates extracted at different resolutions are comparable.
+"""
+
+import fcntl
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from app.minutiae import Minutiae
+
+# Highest-quality minutiae kept per template
+MAX_TEMPLATE_MINUTIAE = 64
+
+# Fewer minutiae than this cannot be matched reliably
+MIN_TEMPLATE_MINUTIAE = 8
+
+# Template coordinates are scaled to this many pixels per ridge period
+REFERENCE_PERIOD = 8.0
+
+MINUTIA_DTYPE = np.dtype([("x", "<i2"), ("y", "<i2"), ("angle", "u1"), ("type", "u1")])
+HEADER_DTYPE = np.dtype([("minutiae", "u1"), ("keys", "<u2"), ("keys_start", "<u8")])
+
+# Triplets are formed from each minutia and pairs of its nearest neighbours
+TRIPLET_NEIGHBOURS = 6
+
+# Quantization of triplet side lengths (template units) and minutia directions;
+# fine enough that unrelated templates rarely share a key, coarse enough that
+# a second impression of the same finger shares many
+TRIPLET_LENGTH_BIN = 12.0
+TRIPLET_DIRECTION_BINS = 12
+
+# Triplet keys are hashed onto this many inverted-index buckets
+INDEX_BUCKETS = 1 << 20
+
+# Enrollments matched without the inverted index before it is rebuilt
+TAIL_MIN_ROWS = 2048
+TAIL_FRACTION = 8
+
+# Alignment vote grid: rotation bins and translation cell size (template units)
+ROTATION_BINS = 24
+TRANSLATION_CELL = 24.0
+TRANSLATION_RANGE = 320.0
+
+# Aligned minutiae closer than this in position and direction are paired
+MATCH_DISTANCE = 12.0
+MATCH_ANGLE = np.pi / 6
+
+# Rows allocated when the index is created; grows by doubling
+INITIAL_CAPACITY = 1024
+
+def make_template(minutiae: Minutiae) -> np.ndarray:
+    """Pack the best MAX_TEMPLATE_MINUTIAE minutiae, rescaled to REFERENCE_PERIOD"""
+    order = np.argsort(-minutiae.quality, kind="stable")[:MAX_TEMPLATE_MINUTIAE]
+    scale = REFERENCE_PERIOD / minutiae.ridge_period if minutiae.ridge_period else 1.0
+    template = np.zeros(len(order), dtype=MINUTIA_DTYPE)
+    template["x"] = np.round(minutiae.x[order] * scale)
+    template["y"] = np.round(minutiae.y[order] * scale)
+    # Minutiae angles are counter-clockwise as displayed; store them clockwise,
+    # in the same y-down frame as the coordinates, so one rotation turns both
+    template["angle"] = np.round(-minutiae.angle[order] * (256 / (2 * np.pi))).astype(np.int64) % 256
+    template["type"] = minutiae.type[order]
+    return template
+
+def _unpack(template: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """x, y and angle (radians) as float32 arrays of the template's shape"""
+    return (template["x"].astype(np.float32), template["y"].astype(np.float32),
+            template["angle"].astype(np.float32) * np.float32(2 * np.pi / 256))
+
+def triplet_keys(template: np.ndarray) -> np.ndarray:
+    """Sorted, distinct inverted-index buckets of a template's minutia triplets"""
+    count = len(template)
+    if count < 3:
+        return np.zeros(0, dtype=np.uint32)
+    x, y, angle = _unpack(template)
+    distances = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    np.fill_diagonal(distances, np.inf)
+
+    neighbours = min(TRIPLET_NEIGHBOURS, count - 1)
+    nearest = np.argpartition(distances, neighbours - 1, axis=1)[:, :neighbours]
+    first, second = np.triu_indices(neighbours, 1)
+    triplets = np.column_stack([
+        np.repeat(np.arange(count), len(first)), nearest[:, first].ravel(), nearest[:, second].ravel()
+    ])
+    triplets = np.unique(np.sort(triplets, axis=1), axis=0)
+
+    # Order each triangle's vertices by the length of the side opposite them
+    a, b, c = triplets.T
+    sides = np.column_stack([distances[b, c], distances[a, c], distances[a, b]])
+    order = np.argsort(sides, axis=1)
+    triplets = np.take_along_axis(triplets, order, axis=1)
+    sides = np.take_along_axis(sides, order, axis=1)
+
+    # Minutia directions relative to the direction from the triangle's centroid
+    outward = np.arctan2(y[triplets] - y[triplets].mean(axis=1, keepdims=True),
+                         x[triplets] - x[triplets].mean(axis=1, keepdims=True))
+    directions = np.floor(np.mod(angle[triplets] - outward, 2 * np.pi) * (TRIPLET_DIRECTION_BINS / (2 * np.pi)))
+
+    keys = np.zeros(len(triplets), dtype=np.uint64)
+    for feature, levels in ((np.minimum(np.floor(sides / TRIPLET_LENGTH_BIN), 63), 64),
+                            (np.mod(directions, TRIPLET_DIRECTION_BINS), TRIPLET_DIRECTION_BINS)):
+        for column in feature.T.astype(np.uint64):
+            keys = keys * np.uint64(levels) + column
+    # Fibonacci hashing onto the index buckets
+    buckets = (keys * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(64 - int(np.log2(INDEX_BUCKETS)))
+    return np.unique(buckets.astype(np.uint32))
+
+def score_candidates(query: np.ndarray, candidates: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Alignment-based similarity of one template against many
+
+    Args:
+        query: Query template (MINUTIA_DTYPE)
+        candidates: (K, MAX_TEMPLATE_MINUTIAE) candidate rows
+        counts: Valid minutiae per candidate row
+
+    Returns:
+        (K,) scores in [0, 1]: paired minutiae squared over the product of
+        both template sizes
+    """
+    rows, width = candidates.shape
+    if rows == 0 or len(query) == 0:
+        return np.zeros(rows)
+    filled = np.arange(width)[None, :] < counts[:, None]
+
+    # Centre both sides so rotating about the origin moves minutiae little
+    qx, qy, q_angle = _unpack(query)
+    qx, qy = qx - qx.mean(), qy - qy.mean()
+    cx, cy, c_angle = _unpack(candidates)
+    total = np.maximum(counts, 1)[:, None]
+    cx = cx - (cx * filled).sum(axis=1, keepdims=True) / total
+    cy = cy - (cy * filled).sum(axis=1, keepdims=True) / total
+
+    # Every (candidate, query minutia, candidate minutia) pair, grouped by the
+    # rotation it implies; padding goes to an extra bin no rotation reads
+    turn = c_angle[:, None, :] - q_angle[None, :, None]
+    turn[turn < 0] += np.float32(2 * np.pi)
+    turn_bin = (turn * np.float32(ROTATION_BINS / (2 * np.pi))).astype(np.uint8) % ROTATION_BINS
+    turn_bin[~np.broadcast_to(filled[:, None, :], turn_bin.shape)] = ROTATION_BINS
+    order = np.argsort(turn_bin, axis=None, kind="stable")[:np.count_nonzero(filled) * len(query)]  # radix sort
+    turn, turn_bin = turn.ravel()[order], turn_bin.ravel()[order]
+    row, first, second = order // (len(query) * width), order // width % len(query), order % width
+    pair_cx, pair_cy = cx.ravel()[row * width + second], cy.ravel()[row * width + second]
+    pair_qx, pair_qy = qx[first], qy[first]
+    bounds = np.searchsorted(turn_bin, np.arange(ROTATION_BINS + 1))
+
+    side = int(2 * TRANSLATION_RANGE / TRANSLATION_CELL) + 1
+    cells = side * side
+
+    def vote_cells(pairs, angle) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        cos, sin = np.cos(angle), np.sin(angle)
+        shift_x = pair_cx[pairs] - (cos * pair_qx[pairs] - sin * pair_qy[pairs])
+        shift_y = pair_cy[pairs] - (sin * pair_qx[pairs] + cos * pair_qy[pairs])
+        cell_x = np.clip(((shift_x + TRANSLATION_RANGE) / TRANSLATION_CELL).astype(np.int64), 0, side - 1)
+        cell_y = np.clip(((shift_y + TRANSLATION_RANGE) / TRANSLATION_CELL).astype(np.int64), 0, side - 1)
+        return shift_x, shift_y, cell_x * side + cell_y
+
+    # Try each rotation with the pairs that roughly agree with it (its bin and both neighbours)
+    best_votes = np.zeros(rows, dtype=np.int64)
+    best_rotation = np.zeros(rows, dtype=np.int64)
+    best_cell = np.zeros(rows, dtype=np.int64)
+    for rotation in range(ROTATION_BINS):
+        angle = np.float32((rotation + 0.5) * 2 * np.pi / ROTATION_BINS)
+        keys = []
+        for neighbour in (rotation - 1, rotation, rotation + 1):
+            pairs = slice(bounds[neighbour % ROTATION_BINS], bounds[neighbour % ROTATION_BINS + 1])
+            keys.append(row[pairs] * cells + vote_cells(pairs, angle)[2])
+        votes = np.bincount(np.concatenate(keys), minlength=rows * cells).reshape(rows, cells)
+        peak_cell = votes.argmax(axis=1)
+        peak = votes[np.arange(rows), peak_cell]
+        better = peak > best_votes
+        best_votes[better] = peak[better]
+        best_rotation[better] = rotation
+        best_cell[better] = peak_cell[better]
+
+    # Refine the winning alignment to the mean of the pairs that voted for it
+    angle = ((best_rotation + 0.5) * 2 * np.pi / ROTATION_BINS).astype(np.float32)
+    offset = np.abs(turn_bin.astype(np.int64) - best_rotation[row])
+    agreeing = np.minimum(offset, ROTATION_BINS - offset) <= 1
+    agreeing[agreeing] = vote_cells(agreeing, angle[row[agreeing]])[2] == best_cell[row[agreeing]]
+    voters = row[agreeing]
+    angle = np.where(best_votes > 0, np.arctan2(
+        np.bincount(voters, np.sin(turn[agreeing]), minlength=rows),
+        np.bincount(voters, np.cos(turn[agreeing]), minlength=rows)
+    ), angle).astype(np.float32)
+    shift_x, shift_y, _ = vote_cells(agreeing, angle[voters])
+    weight = np.maximum(np.bincount(voters, minlength=rows), 1)
+    offset_x = np.bincount(voters, shift_x, minlength=rows) / weight
+    offset_y = np.bincount(voters, shift_y, minlength=rows) / weight
+
+    def pair_up(angle, offset_x, offset_y):
+        cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+        aligned_x = cos * qx - sin * qy + offset_x[:, None]
+        aligned_y = sin * qx + cos * qy + offset_y[:, None]
+        aligned_angle = q_angle[None, :] + angle[:, None]
+        # Directions agree when the cosine of their difference is large enough
+        agree = (np.cos(c_angle)[:, None, :] * np.cos(aligned_angle)[:, :, None]
+                 + np.sin(c_angle)[:, None, :] * np.sin(aligned_angle)[:, :, None]) > np.cos(MATCH_ANGLE)
+        distance2 = (cx[:, None, :] - aligned_x[:, :, None]) ** 2 + (cy[:, None, :] - aligned_y[:, :, None]) ** 2
+        return filled[:, None, :] & agree & (distance2 < MATCH_DISTANCE ** 2)
+
+    paired = pair_up(angle, offset_x.astype(np.float32), offset_y.astype(np.float32))
+
+    # One least-squares (Procrustes) fit to the paired minutiae, then pair again
+    weight = paired.astype(np.float32)
+    total = np.maximum(weight.sum(axis=(1, 2)), 1)
+    mean_qx = np.einsum("kmn,m->k", weight, qx) / total
+    mean_qy = np.einsum("kmn,m->k", weight, qy) / total
+    mean_cx = np.einsum("kmn,kn->k", weight, cx) / total
+    mean_cy = np.einsum("kmn,kn->k", weight, cy) / total
+    dot = np.einsum("kmn,m,kn->k", weight, qx, cx) + np.einsum("kmn,m,kn->k", weight, qy, cy) \
+        - total * (mean_qx * mean_cx + mean_qy * mean_cy)
+    cross = np.einsum("kmn,m,kn->k", weight, qx, cy) - np.einsum("kmn,m,kn->k", weight, qy, cx) \
+        - total * (mean_qx * mean_cy - mean_qy * mean_cx)
+    fitted = weight.sum(axis=(1, 2)) >= 2
+    angle = np.where(fitted, np.arctan2(cross, dot), angle).astype(np.float32)
+    cos, sin = np.cos(angle), np.sin(angle)
+    offset_x = np.where(fitted, mean_cx - (cos * mean_qx - sin * mean_qy), offset_x).astype(np.float32)
+    offset_y = np.where(fitted, mean_cy - (sin * mean_qx + cos * mean_qy), offset_y).astype(np.float32)
+    paired = pair_up(angle, offset_x, offset_y)
+
+    # Count each side's paired minutiae, which bounds a one-to-one pairing
+    pairs = np.minimum(paired.any(axis=2).sum(axis=1), paired.any(axis=1).sum(axis=1))
+    return pairs ** 2 / np.maximum(len(query) * counts, 1)
+
+def _shared_keys(query_keys: np.ndarray, postings: np.ndarray, offsets: np.ndarray, indexed: int,
+                 tail: np.ndarray, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows sharing at least one key with the query, and how many they share
+
+    Args:
+        query_keys: The query's triplet keys
+        postings, offsets: Inverted index over rows [0, indexed)
+        tail: Headers of the rows enrolled since, matched key by key
+        keys: Every enrolled template's triplet keys
+    """
+    starts, stops = offsets[query_keys].astype(np.int64), offsets[query_keys + 1].astype(np.int64)
+    hits = [postings[start:stop] for start, stop in zip(starts, stops) if stop > start]
+    if len(tail):
+        in_query = np.zeros(INDEX_BUCKETS, dtype=bool)
+        in_query[query_keys] = True
+        rows = np.repeat(np.arange(indexed, indexed + len(tail), dtype=np.uint32), tail["keys"].astype(np.int64))
+        start = int(tail["keys_start"][0])
+        hits.append(rows[in_query[keys[start:start + len(rows)]]])
+    if not hits:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    rows, shared = np.unique(np.concatenate(hits), return_counts=True)
+    return rows.astype(np.int64), shared
+
+class TemplateIndex:
+    """Append-only, memory-mapped template store with an inverted triplet index"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._count = 0
+        self._indexed = 0
+        self._minutiae: Optional[np.ndarray] = None
+        self._headers: Optional[np.ndarray] = None
+        self._keys = np.zeros(0, dtype=np.uint32)
+        self._postings = np.zeros(0, dtype=np.uint32)
+        self._offsets = np.broadcast_to(np.uint64(0), (INDEX_BUCKETS + 1,))
+        self._subjects: List[str] = []
+        self._subjects_bytes = 0
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            return json.loads(self._path("meta.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta: dict):
+        tmp_path = self._path("meta.json.tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self._path("meta.json"))
+
+    def _arrays(self, capacity: int) -> Dict[str, Tuple[np.dtype, tuple]]:
+        return {
+            "minutiae.npy": (MINUTIA_DTYPE, (capacity, MAX_TEMPLATE_MINUTIAE)),
+            "headers.npy": (HEADER_DTYPE, (capacity,))
+        }
+
+    def _grow(self, count: int, capacity: int):
+        """Copy the arrays into files of a larger capacity, swapping each in atomically"""
+        for name, (dtype, shape) in self._arrays(capacity).items():
+            tmp_path = self._path(f"{name}.tmp")
+            grown = open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            if count:
+                grown[:count] = open_memmap(self._path(name), mode="r")[:count]
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self._path(name))
+
+    def _build_postings(self, meta: dict) -> int:
+        """
+        Write the inverted index over every enrolled template as a new generation
+
+        Files are named by the rows they cover and published by the next
+        meta.json, so readers never pair offsets with the wrong postings.
+        Returns the rows covered.
+        """
+        count = meta["count"]
+        headers = open_memmap(self._path("headers.npy"), mode="r")[:count]
+        keys = self._map("keys.u32", meta["keys"])
+        order = np.argsort(keys, kind="stable")
+        rows = np.repeat(np.arange(count, dtype=np.uint32), headers["keys"].astype(np.int64))
+        offsets = np.zeros(INDEX_BUCKETS + 1, dtype=np.uint64)
+        np.cumsum(np.bincount(keys, minlength=INDEX_BUCKETS), out=offsets[1:])
+
+        rows[order].tofile(self._path(f"postings-{count}.u32.tmp"))
+        os.replace(self._path(f"postings-{count}.u32.tmp"), self._path(f"postings-{count}.u32"))
+        with open(self._path(f"offsets-{count}.npy.tmp"), "wb") as f:
+            np.save(f, offsets)
+        os.replace(self._path(f"offsets-{count}.npy.tmp"), self._path(f"offsets-{count}.npy"))
+        return count
+
+    def _map(self, name: str, length: int) -> np.ndarray:
+        """Read-only view of the first length uint32 values of a raw file"""
+        if length == 0:
+            return np.zeros(0, dtype=np.uint32)
+        return np.memmap(self._path(name), dtype=np.uint32, mode="r", shape=(length,))
+
+    def _remove_postings(self, keep: int):
+        """Unlink superseded generations (readers keep any they have mapped)"""
+        for path in list(self.directory.glob("postings-*.u32")) + list(self.directory.glob("offsets-*.npy")):
+            if path.name not in (f"postings-{keep}.u32", f"offsets-{keep}.npy"):
+                path.unlink(missing_ok=True)
+
+    def _refresh(self):
+        """Pick up rows appended by any process since the last call"""
+        try:
+            stat = os.stat(self._path("meta.json"))
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        meta = self._read_meta()
+        if self._headers is None or len(self._headers) != meta["capacity"]:
+            self._minutiae = open_memmap(self._path("minutiae.npy"), mode="r")
+            self._headers = open_memmap(self._path("headers.npy"), mode="r")
+        if meta["keys"] != len(self._keys):
+            self._keys = self._map("keys.u32", meta["keys"])
+        if meta["indexed"] != self._indexed:
+            indexed = meta["indexed"]
+            self._offsets = np.load(self._path(f"offsets-{indexed}.npy"), mmap_mode="r")
+            self._postings = self._map(f"postings-{indexed}.u32", int(self._offsets[-1]))
+            self._indexed = indexed
+        if meta["subjects_bytes"] > self._subjects_bytes:
+            with open(self._path("subjects.txt"), "rb") as f:
+                f.seek(self._subjects_bytes)
+                appended = f.read(meta["subjects_bytes"] - self._subjects_bytes)
+            self._subjects.extend(json.loads(line) for line in appended.splitlines())
+            self._subjects_bytes = meta["subjects_bytes"]
+        self._count = meta["count"]
+        self._stamp = stamp
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._count
+
+    def add(self, subject_id: str, template: np.ndarray) -> int:
+        """
+        Enroll a template (from make_template) under a subject id
+
+        Returns:
+            Row id of the new template
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        template = template[:MAX_TEMPLATE_MINUTIAE]
+        keys = triplet_keys(template)
+        with open(self._path(".lock"), "a") as lock:
+            # Serializes writers across every worker process
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                meta = self._read_meta() or {"count": 0, "capacity": 0, "keys": 0, "indexed": 0, "subjects_bytes": 0}
+                row = meta["count"]
+                if row >= meta["capacity"]:
+                    meta["capacity"] = max(INITIAL_CAPACITY, 2 * meta["capacity"])
+                    self._grow(row, meta["capacity"])
+
+                minutiae = open_memmap(self._path("minutiae.npy"), mode="r+")
+                minutiae[row] = np.zeros(MAX_TEMPLATE_MINUTIAE, dtype=MINUTIA_DTYPE)
+                minutiae[row, :len(template)] = template
+                minutiae.flush()
+                headers = open_memmap(self._path("headers.npy"), mode="r+")
+                headers[row] = (len(template), len(keys), meta["keys"])
+                headers.flush()
+
+                # Drop anything a crashed writer left beyond the committed counts
+                with open(self._path("keys.u32"), "ab") as f:
+                    f.truncate(meta["keys"] * 4)
+                    f.write(keys.astype("<u4").tobytes())
+                meta["keys"] += len(keys)
+                line = (json.dumps(subject_id) + "\n").encode("utf-8")
+                with open(self._path("subjects.txt"), "ab") as f:
+                    f.truncate(meta["subjects_bytes"])
+                    f.write(line)
+                meta["subjects_bytes"] += len(line)
+                meta["count"] = row + 1
+
+                if meta["count"] - meta["indexed"] > max(TAIL_MIN_ROWS, meta["indexed"] // TAIL_FRACTION):
+                    meta["indexed"] = self._build_postings(meta)
+                    self._write_meta(meta)
+                    self._remove_postings(keep=meta["indexed"])
+                else:
+                    self._write_meta(meta)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return row
+
+    def search(self, template: np.ndarray, limit: int = 10, shortlist: int = 200) -> Tuple[List[dict], int]:
+        """
+        Find the enrolled subjects most similar to a template
+
+        Args:
+            template: Query template (from make_template)
+            limit: Subjects to return
+            shortlist: Templates kept by the candidate lookup for scoring
+
+        Returns:
+            (candidates, shortlisted) where candidates are dicts of
+            subject_id, template_id and score (0-100), best first, one
+            per subject
+        """
+        template = template[:MAX_TEMPLATE_MINUTIAE]
+        query_keys = triplet_keys(template).astype(np.int64)
+        with self._lock:
+            self._refresh()
+            count = self._count
+            if count == 0 or len(template) == 0:
+                return [], 0
+            minutiae, headers, subjects = self._minutiae, self._headers, self._subjects
+            postings, offsets, keys, indexed = self._postings, self._offsets, self._keys, self._indexed
+
+        if count <= shortlist:
+            # Small enough to score everything
+            rows = np.arange(count)
+        else:
+            rows, shared = _shared_keys(query_keys, postings, offsets, indexed, headers[indexed:count], keys)
+            if len(rows) > shortlist:
+                rows = np.sort(rows[np.argpartition(-shared, shortlist - 1)[:shortlist]])
+
+        shortlisted = len(rows)
+        scores = score_candidates(template, minutiae[rows], headers["minutiae"][rows].astype(np.int64))
+
+        candidates = {}
+        for row, score in sorted(zip(rows.tolist(), scores.tolist()), key=lambda item: -item[1]):
+            subject_id = subjects[row]
+            if subject_id not in candidates:
+                candidates[subject_id] = {"subject_id": subject_id, "template_id": row, "score": round(100 * score, 2)}
+            if len(candidates) == limit:
+                break
+        return list(candidates.values()), shortlisted
+
+# One open index per directory per process
+_indexes: Dict[str, TemplateIndex] = {}
+_indexes_lock = threading.Lock()
+
+def open_index(directory: str) -> TemplateIndex:
+    """The process-wide TemplateIndex for a directory"""
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = TemplateIndex(directory)
+        return _indexes[directory]
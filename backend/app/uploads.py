@@ -0,0 +1,210 @@
+"""
+Upload ingestion
+
+Uploads are capped twice: UploadLimitMiddleware rejects a request body as
+soon as its Content-Length, or the bytes actually received, pass the limit
+(one file's cap, or MAX_BATCH_SIZE_MB for a batch), while it is still
+streaming in. The multipart parser spools file parts larger than 1MB to
+temporary files, so a body under the cap is held on disk rather than in
+memory until a route reads it. read_upload then sniffs the image's magic
+bytes and header (format, width, height, channels) from the start of the
+spooled file, so non-images and absurd dimensions are rejected before the
+file is loaded into memory, and reads the accepted file in a single copy.
+The client-supplied content type is not trusted.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.logger import get_logger
+from app.config import settings
+from app.exceptions import FileUploadError, PayloadTooLargeError
+
+logger = get_logger(__name__)
+
+# Headers must be found within this prefix (JPEG EXIF blocks can precede SOF)
+HEADER_SCAN_BYTES = 256 * 1024
+
+# Allowance for multipart boundaries and part headers on top of the file cap
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# JPEG start-of-frame markers (everything in C0-CF except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# PNG colour type -> channels
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+@dataclass
+class ImageHeader:
+    format: str
+    width: int
+    height: int
+    channels: int
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format}"
+
+def detect_format(data: bytes) -> Optional[str]:
+    """Identify PNG, JPEG or BMP from magic bytes"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:2] == b"BM":
+        return "bmp"
+    return None
+
+def read_image_header(data: bytes) -> Optional[ImageHeader]:
+    """
+    Parse format, dimensions and channel count from the start of an image
+
+    Returns:
+        None when the format is unknown or the header is not yet complete
+    """
+    image_format = detect_format(data)
+
+    if image_format == "png":
+        if len(data) < 26 or data[12:16] != b"IHDR":
+            return None
+        width, height = struct.unpack(">II", data[16:24])
+        return ImageHeader("png", width, height, _PNG_CHANNELS.get(data[25], 0))
+
+    if image_format == "bmp":
+        if len(data) < 30:
+            return None
+        width, height = struct.unpack("<ii", data[18:26])
+        (bits_per_pixel,) = struct.unpack("<H", data[28:30])
+        # Negative height means rows are stored top-down
+        return ImageHeader("bmp", abs(width), abs(height), max(1, bits_per_pixel // 8))
+
+    if image_format == "jpeg":
+        offset = 2
+        while offset + 4 <= len(data):
+            if data[offset] != 0xFF:
+                return None
+            marker = data[offset + 1]
+            if marker == 0xFF:  # fill byte
+                offset += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # standalone markers
+                offset += 2
+                continue
+            if marker in _JPEG_SOF_MARKERS:
+                if offset + 10 > len(data):
+                    return None
+                height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+                return ImageHeader("jpeg", width, height, data[offset + 9])
+            (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+            offset += 2 + length
+
+    return None
+
+def validate_image_header(header: ImageHeader):
+    """Reject empty frames and frames beyond MAX_IMAGE_MEGAPIXELS"""
+    if header.width == 0 or header.height == 0:
+        raise FileUploadError("Image has no pixels")
+    megapixels = header.width * header.height / 1e6
+    if megapixels > settings.max_image_megapixels:
+        raise FileUploadError(
+            f"Image is {header.width}x{header.height} ({megapixels:.0f} MP), "
+            f"limit is {settings.max_image_megapixels} MP"
+        )
+
+def _sniff(data: bytes, final: bool) -> Optional[ImageHeader]:
+    """Header of a (possibly partial) upload; raises once it cannot be an image"""
+    if detect_format(data) is None:
+        if len(data) >= 8 or final:
+            raise FileUploadError("Unsupported file type: expected a JPEG, PNG or BMP image")
+        return None
+    header = read_image_header(data)
+    if header is None and (final or len(data) >= HEADER_SCAN_BYTES):
+        raise FileUploadError("Could not read image header")
+    if header is not None:
+        validate_image_header(header)
+    return header
+
+def validate_image_bytes(contents: bytes) -> ImageHeader:
+    """Size-check and sniff bytes that are already in memory (batch/zip entries)"""
+    if len(contents) > settings.max_upload_size_mb * 1024 * 1024:
+        raise PayloadTooLargeError(f"File size exceeds {settings.max_upload_size_mb}MB limit")
+    return _sniff(contents[:HEADER_SCAN_BYTES], final=True)
+
+async def read_upload(file: UploadFile, require_image: bool = True) -> Tuple[bytes, Optional[ImageHeader]]:
+    """
+    Read a spooled upload under MAX_UPLOAD_SIZE_MB
+
+    Args:
+        file: The multipart file
+        require_image: Sniff and validate the image header before the file
+            is read into memory (off for archives)
+
+    Returns:
+        (contents, header); header is None when require_image is off
+    """
+    max_bytes = settings.max_upload_size_mb * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
+        raise PayloadTooLargeError(f"File size exceeds {settings.max_upload_size_mb}MB limit")
+
+    header = None
+    if require_image:
+        head = await file.read(HEADER_SCAN_BYTES)
+        header = _sniff(head, final=len(head) < HEADER_SCAN_BYTES)
+        await file.seek(0)
+
+    # One read straight into the returned buffer; one byte past the cap
+    # tells an oversized file apart
+    contents = await file.read(max_bytes + 1)
+    if len(contents) > max_bytes:
+        raise PayloadTooLargeError(f"File size exceeds {settings.max_upload_size_mb}MB limit")
+    return contents, header
+
+def request_body_limit(path: str) -> Optional[int]:
+    """Largest request body accepted on a path (None = unlimited)"""
+    if path == "/api/enhance/batch":
+        return settings.max_batch_size_mb * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+    if path.startswith("/api/"):
+        return settings.max_upload_size_mb * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+    return None
+
+class UploadLimitMiddleware:
+    """Cap request bodies while they stream in, before anything buffers them"""
+
+    def __init__(self, app: ASGIApp, limit_for: Callable[[str], Optional[int]] = request_body_limit):
+        self.app = app
+        self.limit_for = limit_for
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limit = self.limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"Rejected {content_length.decode()} byte body on {scope['path']}")
+            response = JSONResponse(
+                status_code=413,
+                content={"error_code": "PAYLOAD_TOO_LARGE", "message": f"Request body exceeds {limit} bytes"}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing, so the API error handler answers
+                    raise PayloadTooLargeError(f"Request body exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,13 +1,22 @@
+import io
 import os
-import cv2
-import numpy as np
+import uuid
+import base64
+import zipfile
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Tuple
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Literal, Optional, Tuple, get_args
 
 from app.logger import get_logger
 from app.config import settings
-from app.exceptions import ImageProcessingError, FileUploadError
+from app.exceptions import ImageProcessingError, FileUploadError, LowQualityError, ValidationError
+from app.profiling import StageTimer, sampled_profile
+from app.storage import output_path_for, retention_index
+
+# OpenCV, NumPy and SciPy are imported where images are processed (the
+# worker processes), keeping them out of the web process's import graph
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = get_logger(__name__)
 
@@ -30,86 +39,383 @@ def validate_image_file(filename: str, size_bytes: int, mime_type: str) -> bool:
     
     return True
 
-def process_fingerprint_image(image_path: str) -> Tuple[str, dict]:
+IMAGE_EXTENSION_MIMES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".bmp": "image/bmp"
+}
+
+def is_zip_upload(filename: str, mime_type: Optional[str]) -> bool:
+    """Check whether an upload is a zip archive of images"""
+    return mime_type in ("application/zip", "application/x-zip-compressed") or filename.lower().endswith(".zip")
+
+def extract_zip_images(contents: bytes, max_total_bytes: Optional[int] = None) -> List[Tuple[str, bytes, str]]:
     """
-    Enhanced fingerprint image using Gabor filters
+    Read image entries from an in-memory zip archive
     
     Args:
-        image_path: Path to input image
+        contents: Raw zip bytes
+        max_total_bytes: Cap on the combined inflated size of the entries
+            (default MAX_BATCH_SIZE_MB)
         
     Returns:
-        Tuple of (output_path, enhancement_stats)
+        List of (entry_name, entry_bytes, mime_type); unknown extensions get
+        an empty mime type so they fail validation individually
     """
+    max_size = settings.max_upload_size_mb * 1024 * 1024
+    if max_total_bytes is None:
+        max_total_bytes = settings.max_batch_size_mb * 1024 * 1024
+    entries = []
+    total_bytes = 0
+    
     try:
-        # Import here to avoid circular imports
-        from fingerprint_enhancer.fingerprint_image_enhancer import FingerprintImageEnhancer
-        
-        logger.info(f"Starting image enhancement: {image_path}")
-        
-        # Read image
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ImageProcessingError("Failed to read image file")
-        
-        original_height, original_width = img.shape[:2]
-        
-        # Convert to grayscale if necessary
-        if len(img.shape) > 2:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Create enhancer and process
-        enhancer = FingerprintImageEnhancer()
-        enhancer.enhance(img, invert_output=True)
-        
-        # Generate output path
-        filename = Path(image_path).stem
-        output_path = os.path.join(
-            settings.enhanced_dir,
-            f"enhanced_{filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+        with zipfile.ZipFile(io.BytesIO(contents)) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or Path(info.filename).name.startswith("."):
+                    continue
+                if len(entries) >= settings.max_batch_files:
+                    raise FileUploadError(f"Archive exceeds {settings.max_batch_files} file limit")
+                # Check declared sizes before inflating to avoid zip bombs;
+                # reads stop at the declared size, so a member cannot lie past it
+                if info.file_size > max_size:
+                    raise FileUploadError(f"{info.filename} exceeds {settings.max_upload_size_mb}MB limit")
+                total_bytes += info.file_size
+                if total_bytes > max_total_bytes:
+                    raise FileUploadError(f"Archive contents exceed {settings.max_batch_size_mb}MB batch limit")
+                mime_type = IMAGE_EXTENSION_MIMES.get(Path(info.filename).suffix.lower(), "")
+                entries.append((info.filename, archive.read(info), mime_type))
+    except zipfile.BadZipFile:
+        raise FileUploadError("Invalid zip archive")
+    
+    return entries
+
+# Supported output formats: name -> (file extension, media type)
+OUTPUT_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "png": (".png", "image/png")
+}
+
+# Per-request estimation modes: "standard" matches the reference pipeline,
+# "pyramid" estimates orientation and frequency on a downsampled level,
+# "float32" runs the standard pipeline in single precision with reused buffers
+EnhancementMode = Literal["standard", "pyramid", "float32"]
+ENHANCEMENT_MODES = get_args(EnhancementMode)
+
+def enhancer_params(mode: str = "standard") -> dict:
+    """FingerprintEnhancer overrides for an enhancement mode"""
+    if mode == "pyramid":
+        return {"pyramid_levels": settings.pyramid_levels}
+    if mode == "float32":
+        return {"dtype": "float32"}
+    return {}
+
+def decode_image(contents: bytes) -> "np.ndarray":
+    """Decode uploaded image bytes straight into a grayscale array"""
+    import cv2
+    import numpy as np
+    
+    img = cv2.imdecode(np.frombuffer(contents, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ImageProcessingError("Failed to decode image data")
+    return img
+
+def encode_image(img: "np.ndarray", extension: str = ".jpg") -> bytes:
+    """Encode an image array in memory (e.g. to JPEG)"""
+    import cv2
+    
+    ok, buffer = cv2.imencode(extension, img)
+    if not ok:
+        raise ImageProcessingError("Failed to encode image")
+    return buffer.tobytes()
+
+def save_enhanced_bytes(image_bytes: bytes, source_name: str, extension: str = ".jpg") -> str:
+    """Persist an enhanced image for download and return its path"""
+    output_path = output_path_for(
+        f"enhanced_{uuid.uuid4().hex[:8]}_{Path(source_name).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
+    )
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(image_bytes)
+    retention_index.track([str(output_path)])
+    return str(output_path)
+
+def _enhance_decoded(contents: bytes, full_resolution: bool, mode: str, invert_output: bool,
+                     timer: StageTimer):
+    """
+    Decode, quality-gate and enhance an upload
+    
+    Returns:
+        Tuple of (ridge_map, original (width, height), tile count,
+        foreground_fraction, QualityReport)
+    """
+    from app.enhancer import FingerprintEnhancer, resize_to_working
+    from app.tiling import plan_tiles, enhance_tiled
+    
+    with timer.stage("decode"):
+        img = decode_image(contents)
+    original_height, original_width = img.shape[:2]
+    
+    if not full_resolution:
+        with timer.stage("resize"):
+            img = resize_to_working(img)
+    
+    # Create enhancer and process
+    enhancer_kwargs = enhancer_params(mode)
+    enhancer = FingerprintEnhancer(**enhancer_kwargs)
+    
+    with timer.stage("quality"):
+        quality = _assess(img, enhancer)
+    if quality.score < settings.quality_min_score:
+        raise LowQualityError(
+            f"Fingerprint quality score {quality.score:.1f} is below the minimum of "
+            f"{settings.quality_min_score:g}",
+            quality.to_dict()
         )
+    
+    plan = None
+    if full_resolution:
+        plan = plan_tiles(
+            img.shape,
+            enhancer,
+            settings.enhancement_memory_budget_mb * 1024 * 1024,
+            max_tile_size=settings.tile_size,
+            max_parallel=settings.tile_threads
+        )
+    
+    if plan is not None:
+        logger.info(f"Tiled enhancement: {len(plan.tiles)} tiles of {plan.tile_size}px, {plan.parallelism} in parallel")
+        enhanced = enhance_tiled(img, plan, enhancer_kwargs, invert_output=invert_output, timer=timer)
+        foreground_fraction = plan.foreground_fraction
+    else:
+        enhanced = enhancer.enhance(img, resize=False, invert_output=invert_output, timer=timer)
+        foreground_fraction = enhancer.roi.fraction
+    
+    tiles = len(plan.tiles) if plan is not None else 1
+    return enhanced, (original_width, original_height), tiles, foreground_fraction, quality
+
+def enhance_image_bytes(
+    contents: bytes,
+    save_as: Optional[str] = None,
+    full_resolution: bool = False,
+    output_format: str = "jpeg",
+    mode: str = "standard"
+) -> Tuple[bytes, Optional[str], dict]:
+    """
+    Enhance a fingerprint image entirely in memory
+    
+    Args:
+        contents: Raw uploaded image bytes
+        save_as: Original file name; when given, a copy is also persisted
+            to the enhanced directory for later download
+        full_resolution: Enhance at the capture resolution instead of the
+            engine's 350-row working size; frames over the memory budget
+            are processed in tiles
+        output_format: Key of OUTPUT_FORMATS ("jpeg" or "png")
+        mode: Key of ENHANCEMENT_MODES
         
-        # Save enhanced image
-        enhancer.save_enhanced_image(output_path)
-        
-        # Get file statistics
-        enhanced_size = os.path.getsize(output_path)
-        original_size = os.path.getsize(image_path)
+    Returns:
+        Tuple of (image_bytes, output_path or None, enhancement_stats); the
+        stats include a "stages" list of per-stage timings
+    """
+    import numpy as np
+    
+    timer = StageTimer(track_memory=settings.profile_memory)
+    extension, _ = OUTPUT_FORMATS[output_format]
+    
+    try:
+        with sampled_profile("enhance"):
+            enhanced, dimensions, tiles, foreground_fraction, quality = _enhance_decoded(
+                contents, full_resolution, mode, True, timer
+            )
+            
+            with timer.stage("encode"):
+                image_bytes = encode_image(enhanced.astype(np.uint8) * 255, extension)
+            
+            output_path = None
+            if save_as is not None:
+                with timer.stage("save"):
+                    output_path = save_enhanced_bytes(image_bytes, save_as, extension)
         
         stats = {
-            "original_size": original_size,
-            "enhanced_size": enhanced_size,
-            "format": "JPEG",
-            "dimensions": (original_width, original_height)
+            "original_size": len(contents),
+            "enhanced_size": len(image_bytes),
+            "format": output_format.upper(),
+            "mode": mode,
+            "dimensions": dimensions,
+            "enhanced_dimensions": (enhanced.shape[1], enhanced.shape[0]),
+            "tiles": tiles,
+            "foreground_fraction": round(foreground_fraction, 4),
+            "quality": quality.to_dict(),
+            "stages": timer.stages
         }
         
-        logger.info(f"Image enhancement completed: {output_path}")
-        
-        return output_path, stats
+        return image_bytes, output_path, stats
         
+    except (ImageProcessingError, LowQualityError):
+        raise
     except Exception as e:
         logger.error(f"Image processing error: {str(e)}", exc_info=True)
         raise ImageProcessingError(f"Image processing failed: {str(e)}")
 
-def cleanup_old_files():
-    """Remove files older than FILE_RETENTION_HOURS"""
-    try:
-        cutoff_time = datetime.now() - timedelta(hours=settings.file_retention_hours)
+def _assess(img: "np.ndarray", enhancer=None):
+    """Quality of an image at the size it is about to be enhanced at"""
+    from app.admission import WORKING_BYTES_PER_PIXEL
+    from app.quality import assess_quality
+    
+    # Full-resolution scans beyond the tiling budget are scored on a reduced copy
+    max_pixels = settings.enhancement_memory_budget_mb * 1024 * 1024 // WORKING_BYTES_PER_PIXEL
+    return assess_quality(img, enhancer, max_pixels)
+
+def assess_image_bytes(contents: bytes, full_resolution: bool = False) -> dict:
+    """
+    Score a fingerprint image without enhancing it
+    
+    Args:
+        contents: Raw uploaded image bytes
+        full_resolution: Score at capture resolution instead of the
+            engine's working size
         
-        for dir_path in [settings.upload_dir, settings.enhanced_dir]:
-            for filename in os.listdir(dir_path):
-                file_path = os.path.join(dir_path, filename)
-                if os.path.isfile(file_path):
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    if file_time < cutoff_time:
-                        os.remove(file_path)
-                        logger.debug(f"Deleted old file: {file_path}")
+    Returns:
+        Quality report fields plus "dimensions" and "stages"
+    """
+    from app.enhancer import resize_to_working
+    
+    timer = StageTimer()
+    with timer.stage("decode"):
+        img = decode_image(contents)
+    original_height, original_width = img.shape[:2]
+    if not full_resolution:
+        with timer.stage("resize"):
+            img = resize_to_working(img)
+    with timer.stage("quality"):
+        quality = _assess(img)
+    
+    return {**quality.to_dict(), "dimensions": (original_width, original_height), "stages": timer.stages}
+
+def extract_minutiae_bytes(contents: bytes, full_resolution: bool = False, mode: str = "standard") -> dict:
+    """
+    Enhance an upload in memory and extract minutiae from its ridge map
+    
+    Args:
+        contents: Raw uploaded image bytes
+        full_resolution: Extract at capture resolution (tiled when large)
+            instead of the engine's working size
+        mode: Key of ENHANCEMENT_MODES
+        
+    Returns:
+        Minutiae arrays (see app.minutiae.Minutiae.to_dict) plus
+        "dimensions", "enhanced_dimensions", "mode", "capture_quality" (the
+        QualityReport) and "stages"
+    """
+    from app.minutiae import extract_minutiae
+    
+    timer = StageTimer(track_memory=settings.profile_memory)
+    try:
+        with sampled_profile("minutiae"):
+            ridges, dimensions, _, _, quality = _enhance_decoded(contents, full_resolution, mode, False, timer)
+            minutiae = extract_minutiae(ridges, timer)
+    except (ImageProcessingError, LowQualityError):
+        raise
     except Exception as e:
-        logger.warning(f"Error during file cleanup: {str(e)}")
+        logger.error(f"Minutiae extraction error: {str(e)}", exc_info=True)
+        raise ImageProcessingError(f"Minutiae extraction failed: {str(e)}")
+    
+    return {
+        **minutiae.to_dict(),
+        "dimensions": dimensions,
+        "enhanced_dimensions": (ridges.shape[1], ridges.shape[0]),
+        "mode": mode,
+        "capture_quality": quality.to_dict(),
+        "stages": timer.stages
+    }
+
+def _query_template(contents: bytes, timer: StageTimer):
+    """Working-size minutiae template of an upload, for enrollment or search"""
+    from app.minutiae import extract_minutiae
+    from app.template_index import MIN_TEMPLATE_MINUTIAE, make_template
+    
+    ridges, _, _, _, _ = _enhance_decoded(contents, False, "standard", False, timer)
+    minutiae = extract_minutiae(ridges, timer)
+    if len(minutiae) < MIN_TEMPLATE_MINUTIAE:
+        raise ValidationError(
+            f"Only {len(minutiae)} minutiae found; at least {MIN_TEMPLATE_MINUTIAE} are needed for matching"
+        )
+    return make_template(minutiae)
+
+def enroll_template_bytes(contents: bytes, subject_id: str, index_dir: str) -> dict:
+    """
+    Extract a minutiae template from an upload and add it to the index
+    
+    Returns:
+        Dict with template_id, subject_id, minutiae, index_size and stages
+    """
+    from app.template_index import open_index
+    
+    timer = StageTimer()
+    template = _query_template(contents, timer)
+    index = open_index(index_dir)
+    with timer.stage("enroll"):
+        template_id = index.add(subject_id, template)
+    
+    return {
+        "template_id": template_id,
+        "subject_id": subject_id,
+        "minutiae": len(template),
+        "index_size": len(index),
+        "stages": timer.stages
+    }
+
+def search_template_bytes(contents: bytes, limit: int, shortlist: int, index_dir: str) -> dict:
+    """
+    Search the index for the subjects whose templates best match an upload
+    
+    Returns:
+        Dict with candidates (subject_id, template_id, score), shortlisted,
+        minutiae, index_size and stages
+    """
+    from app.template_index import open_index
+    
+    timer = StageTimer()
+    template = _query_template(contents, timer)
+    index = open_index(index_dir)
+    with timer.stage("search"):
+        candidates, shortlisted = index.search(template, limit, shortlist)
+    
+    return {
+        "candidates": candidates,
+        "shortlisted": shortlisted,
+        "minutiae": len(template),
+        "index_size": len(index),
+        "stages": timer.stages
+    }
+
+def process_fingerprint_image(image_path: str) -> Tuple[str, dict]:
+    """
+    Enhance a fingerprint image file and save the result to the enhanced directory
+    
+    Args:
+        image_path: Path to input image
+        
+    Returns:
+        Tuple of (output_path, enhancement_stats)
+    """
+    logger.info(f"Starting image enhancement: {image_path}")
+    
+    try:
+        with open(image_path, "rb") as f:
+            contents = f.read()
+    except OSError as e:
+        raise ImageProcessingError(f"Failed to read image file: {str(e)}")
+    
+    _, output_path, stats = enhance_image_bytes(contents, save_as=Path(image_path).name)
+    
+    logger.info(f"Image enhancement completed: {output_path}")
+    
+    return output_path, stats
 
 def encode_image_to_base64(image_path: str) -> str:
     """Encode image to base64 string"""
-    import base64
-    
     try:
         with open(image_path, 'rb') as f:
             image_data = f.read()
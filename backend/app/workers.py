@@ -0,0 +1,154 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.logger import get_logger
+from app.admission import worker_scratch_bytes
+from app.config import settings
+from app.exceptions import ImageProcessingError
+from app.slabs import MIN_SHARED_BYTES, SlabHandle, SlabPool, read_result, run_on_slab
+
+logger = get_logger(__name__)
+
+def _warm_worker(scratch_limit_bytes: Optional[int] = None):
+    """Import the enhancement stack, set its scratch limit and build the Gabor kernel bank once per worker"""
+    from app.enhancer import set_scratch_limit, warm_kernel_bank
+    if scratch_limit_bytes is not None:
+        set_scratch_limit(scratch_limit_bytes)
+    warm_kernel_bank()
+
+def _ping(_: int) -> int:
+    """No-op task used to force worker processes to start"""
+    return os.getpid()
+
+def _synthetic_enhancement(_: int) -> int:
+    """Enhance a small synthetic ridge pattern to prime decode, engine and encode paths"""
+    import cv2
+    import numpy as np
+    from app.utils import enhance_image_bytes
+
+    yy, xx = np.mgrid[0:240, 0:200]
+    rings = 127 + 100 * np.sin(np.hypot(yy - 120, xx - 100) * 2 * np.pi / 9)
+    ok, png = cv2.imencode(".png", rings.astype(np.uint8))
+    enhance_image_bytes(png.tobytes())
+    return os.getpid()
+
+class EnhancementPool:
+    """Bounded process pool that runs CPU-bound enhancement off the event loop"""
+
+    def __init__(self, max_workers: int = 0, shared_memory_bytes: int = 0,
+                 scratch_limit_bytes: Optional[int] = None):
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        # Per-thread scratch limit in the workers (None = ENHANCEMENT_SCRATCH_MB)
+        self.scratch_limit_bytes = scratch_limit_bytes
+        self.slabs = SlabPool(shared_memory_bytes)
+        self.min_shared_bytes = MIN_SHARED_BYTES
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.ready = False
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        # Warm-up starts the pool from a thread while requests may already arrive
+        with self._lock:
+            if self._executor is None:
+                # Spawn (not fork) so workers never inherit event loop or thread state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                    initargs=(self.scratch_limit_bytes,)
+                )
+            return self._executor
+
+    def start(self):
+        """Start the pool and wait until every worker has been warmed up"""
+        executor = self._ensure_executor()
+        pids = set(executor.map(_ping, range(self.max_workers)))
+        logger.info(f"Enhancement pool started with {len(pids)}/{self.max_workers} warm workers")
+
+    async def warm_up(self, synthetic: bool = True):
+        """
+        Start the pool off the event loop, optionally run one synthetic
+        enhancement per worker, then mark the pool ready
+        """
+        try:
+            await asyncio.to_thread(self.start)
+            if synthetic:
+                await asyncio.gather(*(self.run(_synthetic_enhancement, i) for i in range(self.max_workers)))
+                logger.info("Warm-up enhancement completed")
+        except Exception as e:
+            # Serve anyway; the first real requests pay the warm-up instead
+            logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+        self.ready = True
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) in a worker process without blocking the event loop"""
+        executor = self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            self._crashed()
+
+    async def run_shared(self, func: Callable[..., tuple], contents: bytes, result_capacity: int,
+                         *args: Any) -> tuple:
+        """
+        Run func(contents, *args) in a worker, handing contents and the
+        first item of the result (bytes) over through a shared-memory slab
+
+        Small payloads, and any that do not fit the slab pool, are pickled
+        as with run().
+
+        Args:
+            result_capacity: Expected size of the bytes result, so the slab
+                is large enough to take it back
+        """
+        slab = None
+        if len(contents) >= self.min_shared_bytes:
+            slab = self.slabs.lease(contents, result_capacity)
+        if slab is None:
+            return await self.run(func, contents, *args)
+
+        handle = SlabHandle(slab.name, len(contents), slab.size)
+        future = None
+        try:
+            future = self._ensure_executor().submit(run_on_slab, func, handle, *args)
+            result, *rest = await asyncio.wrap_future(future)
+            return (read_result(slab, result), *rest)
+        except BrokenProcessPool:
+            self._crashed()
+        finally:
+            # A cancelled caller must not recycle the slab while a worker still writes to it
+            if future is None or future.done():
+                self.slabs.release(slab)
+            else:
+                future.add_done_callback(lambda _: self.slabs.release(slab))
+
+    def _crashed(self):
+        # A worker died (e.g. OOM kill); replace the pool for later requests
+        logger.error("Enhancement worker crashed, recreating pool")
+        self.shutdown(wait=False)
+        raise ImageProcessingError("Enhancement worker crashed")
+
+    def shutdown(self, wait: bool = True):
+        """Stop all workers, cancelling queued work"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._executor = None
+        self.slabs.clear()
+        logger.info("Enhancement pool stopped")
+
+# Global enhancement pool instance
+# Workers keep the scratch admission control reserved for them
+enhancement_pool = EnhancementPool(
+    settings.enhancement_workers, settings.shared_memory_mb * 1024 * 1024, worker_scratch_bytes
+)
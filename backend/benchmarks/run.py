@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+"""
+Enhancement benchmark suite
+
+Suites:
+    stages     - engine stages in-process (per-stage timings, peak heap)
+    testclient - full /api/enhance round trip through FastAPI's TestClient
+    uvicorn    - full round trip against a local uvicorn server over HTTP
+    handoff    - moving a size x size byte payload to a worker and back,
+                 pickled versus through a shared-memory slab
+
+Examples (run from backend/):
+    python -m benchmarks.run --sizes 256 512 1024 2048 --output bench.json
+    python -m benchmarks.run --suites stages --baseline bench.json --tolerance 0.15
+    python -m benchmarks.run --suites stages --modes standard pyramid --full-resolution
+    python -m benchmarks.run --suites handoff --sizes 512 1024 2048 4096 8192
+
+Non-standard modes are also scored against the standard engine on the same
+images (binary pixel agreement, ridge frequency error against the synthetic
+ridge period), so the results show what the speed-up costs in quality.
+
+Every iteration uses a freshly seeded image so the result cache never hits.
+Exits with status 1 when a p50/p95 latency regresses past the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.synthetic import synthetic_fingerprint, synthetic_ridge_frequency, encode_png  # noqa: E402
+
+DEFAULT_SIZES = [256, 512, 1024, 2048]
+SUITES = ["stages", "testclient", "uvicorn", "handoff"]
+MODES = ["standard", "pyramid", "float32"]
+SYNTHETIC_RIDGE_PERIOD = 9.0
+
+def summarize(latencies_s: List[float], wall_s: Optional[float] = None) -> dict:
+    """Latency percentiles (ms) and throughput for a list of timings in seconds"""
+    values = np.asarray(latencies_s) * 1000
+    wall = wall_s if wall_s is not None else float(np.sum(latencies_s))
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "throughput_per_s": float(values.size / wall) if wall > 0 else 0.0
+    }
+
+def peak_rss_mb(include_children: bool = False) -> float:
+    """Peak resident set size of this process (and reaped children), in MB"""
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak_kb = max(peak_kb, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak_kb / 1024
+
+def _pid_peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak RSS (VmHWM) of another process on Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _images(size: int, count: int, seed: int) -> List[bytes]:
+    return [encode_png(synthetic_fingerprint(size, seed=seed + i)) for i in range(count)]
+
+def mode_quality(size: int, mode: str, full_resolution: bool, seed: int, count: int = 3) -> dict:
+    """
+    Score a mode against the standard engine on the same images
+
+    Reports the fraction of output pixels that agree, and each engine's mean
+    ridge frequency error against the synthetic images' known ridge
+    frequency (scaled with the image when it is resized to the working
+    height). Sizes whose working-size ridges are finer than the engine's
+    shortest wavelength (5 px) report large errors for every mode.
+    """
+    from app.admission import WORKING_ROWS
+    from app.enhancer import FingerprintEnhancer
+    from app.utils import enhancer_params
+
+    agreement, reference_error, candidate_error = [], [], []
+    for i in range(count):
+        img = synthetic_fingerprint(size, seed=seed + i, ridge_period=SYNTHETIC_RIDGE_PERIOD)
+        true_freq = synthetic_ridge_frequency(size, seed + i, SYNTHETIC_RIDGE_PERIOD)
+        if not full_resolution:
+            true_freq *= img.shape[0] / WORKING_ROWS
+        reference = FingerprintEnhancer()
+        expected = reference.enhance(img, resize=not full_resolution)
+        candidate = FingerprintEnhancer(**enhancer_params(mode))
+        actual = candidate.enhance(img, resize=not full_resolution)
+        agreement.append(float(np.mean(expected == actual)))
+        reference_error.append(abs(reference._mean_freq - true_freq) / true_freq)
+        candidate_error.append(abs(candidate._mean_freq - true_freq) / true_freq)
+    return {
+        "pixel_agreement": float(np.mean(agreement)),
+        "standard_freq_rel_error": float(np.mean(reference_error)),
+        "freq_rel_error": float(np.mean(candidate_error))
+    }
+
+def bench_stages(size: int, repeat: int, full_resolution: bool, seed: int, mode: str = "standard") -> dict:
+    """Time enhance_image_bytes stage by stage in this process"""
+    from app.enhancer import warm_kernel_bank
+    from app.config import settings
+    import app.utils as utils
+
+    warm_kernel_bank()
+    payloads = _images(size, repeat + 1, seed)
+    utils.enhance_image_bytes(payloads[0], None, full_resolution, mode=mode)  # warm-up
+
+    latencies = []
+    foreground = []
+    stage_samples: Dict[str, List[float]] = defaultdict(list)
+    for contents in payloads[1:]:
+        start = time.perf_counter()
+        _, _, stats = utils.enhance_image_bytes(contents, None, full_resolution, mode=mode)
+        latencies.append(time.perf_counter() - start)
+        foreground.append(stats["foreground_fraction"])
+        for entry in stats["stages"]:
+            stage_samples[entry["name"]].append(entry["duration_ms"])
+
+    # One extra traced run for peak heap per stage (tracing skews timings)
+    original = settings.profile_memory
+    settings.profile_memory = True
+    try:
+        _, _, stats = utils.enhance_image_bytes(payloads[-1], None, full_resolution, mode=mode)
+    finally:
+        settings.profile_memory = original
+    peak_heap = max(entry.get("peak_memory_bytes", 0) for entry in stats["stages"])
+
+    return {
+        "latency": summarize(latencies),
+        "stages_p50_ms": {name: float(np.median(samples)) for name, samples in stage_samples.items()},
+        "foreground_fraction": float(np.mean(foreground)),
+        "peak_heap_mb": peak_heap / 2 ** 20,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def _run_http(post: Callable[[bytes], int], payloads: List[bytes], concurrency: int) -> dict:
+    post(payloads[0])  # warm-up (pool start, first-request costs)
+
+    def timed(contents: bytes) -> float:
+        start = time.perf_counter()
+        status = post(contents)
+        if status != 200:
+            raise RuntimeError(f"/api/enhance returned {status}")
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, payloads[1:]))
+    return {"latency": summarize(latencies, time.perf_counter() - start)}
+
+def bench_testclient(size: int, repeat: int, full_resolution: bool, seed: int, concurrency: int,
+                     mode: str = "standard") -> dict:
+    """Round trip through TestClient (ASGI in-process, enhancement in the pool)"""
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+
+    settings.cache_enabled = False
+    payloads = _images(size, repeat + 1, seed)
+    url = f"/api/enhance?full_resolution={str(full_resolution).lower()}&mode={mode}"
+
+    with TestClient(app) as client:
+        def post(contents: bytes) -> int:
+            return client.post(url, files={"file": ("bench.png", contents, "image/png")}).status_code
+
+        result = _run_http(post, payloads, concurrency)
+    result["peak_rss_mb"] = peak_rss_mb(include_children=True)
+    return result
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def bench_uvicorn(size: int, repeat: int, full_resolution: bool, seed: int, concurrency: int,
+                  mode: str = "standard") -> dict:
+    """Round trip over real HTTP against a uvicorn subprocess"""
+    import httpx
+
+    port = _free_port()
+    env = {**os.environ, "CACHE_ENABLED": "false", "DEBUG": "false"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.2)
+
+        payloads = _images(size, repeat + 1, seed)
+        url = f"{base_url}/api/enhance?full_resolution={str(full_resolution).lower()}&mode={mode}"
+        with httpx.Client(timeout=300, limits=httpx.Limits(max_connections=concurrency)) as client:
+            def post(contents: bytes) -> int:
+                return client.post(url, files={"file": ("bench.png", contents, "image/png")}).status_code
+
+            result = _run_http(post, payloads, concurrency)
+        result["peak_rss_mb"] = _pid_peak_rss_mb(server.pid)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def _reverse_payload(upload) -> tuple:
+    """Handoff worker task: read every input byte and return as many"""
+    return (np.frombuffer(upload, dtype=np.uint8)[::-1].tobytes(),)
+
+def bench_handoff(size: int, repeat: int, seed: int) -> dict:
+    """
+    Round trip of a size x size byte payload (an uncompressed 8-bit scan)
+    through one worker, pickled with EnhancementPool.run and through a slab
+    with run_shared. The work is a single copy, so the difference is the
+    transfer overhead.
+    """
+    import asyncio
+    from app.slabs import size_class
+    from app.workers import EnhancementPool
+
+    rng = np.random.default_rng(seed)
+    payloads = [rng.integers(0, 256, size * size, dtype=np.uint8).tobytes() for _ in range(repeat + 1)]
+    pool = EnhancementPool(1, 2 * size_class(size * size))
+    pool.min_shared_bytes = 0
+
+    async def measure(shared: bool) -> List[float]:
+        latencies = []
+        for contents in payloads:
+            start = time.perf_counter()
+            if shared:
+                (result,) = await pool.run_shared(_reverse_payload, contents, len(contents))
+            else:
+                (result,) = await pool.run(_reverse_payload, contents)
+            latencies.append(time.perf_counter() - start)
+            assert len(result) == len(contents)
+        return latencies[1:]  # the first call of each path is a warm-up
+
+    pool.start()
+    try:
+        pickled = summarize(asyncio.run(measure(False)))
+        shared = summarize(asyncio.run(measure(True)))
+    finally:
+        pool.shutdown()
+    return {
+        "latency": shared,
+        "pickled_latency": pickled,
+        "payload_mb": size * size / 2 ** 20,
+        "saved_p50_ms": pickled["p50_ms"] - shared["p50_ms"],
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def compare(results: List[dict], baseline: dict, tolerance: float) -> List[str]:
+    """Describe every p50/p95 latency that regressed past the tolerance"""
+    def key(entry: dict):
+        # Results written before modes existed are standard-mode runs
+        return entry["suite"], entry["size"], entry.get("mode", "standard")
+
+    previous = {key(entry): entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(key(entry))
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = old["latency"][metric], entry["latency"][metric]
+            if before > 0 and after > before * (1 + tolerance):
+                regressions.append(
+                    f"{entry['suite']} {entry['size']}px {key(entry)[2]} {metric}: {before:.1f} -> {after:.1f} "
+                    f"(+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fingerprint enhancement pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Square image sides in pixels")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent HTTP requests")
+    parser.add_argument("--full-resolution", action="store_true", help="Enhance at capture resolution")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["standard"], help="Enhancement modes to time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed fractional slowdown")
+    args = parser.parse_args(argv)
+
+    results = []
+    for suite in args.suites:
+        for size in args.sizes:
+            for mode in args.modes:
+                if suite == "handoff" and mode != args.modes[0]:
+                    continue  # the payload does not depend on the mode
+                print(f"[{suite}] {size}x{size} {mode} ...", flush=True)
+                if suite == "stages":
+                    result = bench_stages(size, args.repeat, args.full_resolution, args.seed, mode)
+                elif suite == "handoff":
+                    result = bench_handoff(size, args.repeat, args.seed)
+                elif suite == "testclient":
+                    result = bench_testclient(
+                        size, args.repeat, args.full_resolution, args.seed, args.concurrency, mode
+                    )
+                else:
+                    result = bench_uvicorn(size, args.repeat, args.full_resolution, args.seed, args.concurrency, mode)
+                result.update({"suite": suite, "size": size, "mode": mode})
+                if mode != "standard" and suite == "stages":
+                    result["quality"] = mode_quality(size, mode, args.full_resolution, args.seed)
+                results.append(result)
+
+                latency = result["latency"]
+                print(
+                    f"    p50 {latency['p50_ms']:.1f}ms  p95 {latency['p95_ms']:.1f}ms  p99 {latency['p99_ms']:.1f}ms  "
+                    f"{latency['throughput_per_s']:.2f}/s  peak RSS {result.get('peak_rss_mb') or 0:.0f}MB"
+                )
+                if "pickled_latency" in result:
+                    print(
+                        f"    {result['payload_mb']:.1f}MB each way: pickled p50 "
+                        f"{result['pickled_latency']['p50_ms']:.2f}ms, shared memory p50 "
+                        f"{result['latency']['p50_ms']:.2f}ms ({result['saved_p50_ms']:+.2f}ms saved)"
+                    )
+                if "foreground_fraction" in result:
+                    print(f"    foreground {result['foreground_fraction'] * 100:.0f}% of the frame")
+                if "quality" in result:
+                    quality = result["quality"]
+                    print(
+                        f"    vs standard: {quality['pixel_agreement'] * 100:.2f}% pixels agree; ridge frequency "
+                        f"error {quality['freq_rel_error'] * 100:.1f}% (standard "
+                        f"{quality['standard_freq_rel_error'] * 100:.1f}%)"
+                    )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+        },
+        "results": results
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
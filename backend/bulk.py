@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+"""
+Offline bulk enhancement
+
+Runs the backend enhancement pipeline over whole fingerprint databases
+without going through the HTTP API. Inputs can be directories (walked
+recursively), tar archives (read as a stream, compressed or not) and zip
+archives (read one member at a time); only IMAGE_EXTENSION_MIMES files are
+enhanced.
+
+- Images are enhanced in a spawned process pool. Each worker writes its own
+  output, so writes run in parallel and enhanced bytes never travel back.
+- In-flight work is bounded by the admission cost estimate of each image
+  (--memory-mb) and by a per-worker backlog, so reading stops while the
+  pool catches up instead of buffering an archive in memory.
+- Every finished image is appended to a JSONL manifest. On a rerun, images
+  already recorded as done or rejected by the quality gate are skipped;
+  failures are retried.
+- Progress and the final summary report images per second.
+
+Outputs mirror the input layout under --output, rooted at the name of each
+input directory, archive or file (so inputs must have distinct names). Each
+output keeps its input's full name, extension included, with the output
+format's extension appended (prints/a.bmp -> prints/a.bmp.jpg), so inputs
+that differ only in extension never share an output or a manifest entry.
+
+Examples (from backend/):
+    python bulk.py /data/sd4 --output /data/sd4-enhanced
+    python bulk.py /data/legacy.tar.gz /data/more.zip --output out --workers 8 --format png
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.admission import estimate_memory_bytes, scratch_limit_bytes
+from app.config import settings
+from app.exceptions import LowQualityError
+from app.utils import ENHANCEMENT_MODES, IMAGE_EXTENSION_MIMES, OUTPUT_FORMATS
+
+# Manifest statuses that are final; anything else is retried on resume
+DONE_STATUSES = ("ok", "low_quality")
+
+# Queued images per worker beyond the one it is running
+BACKLOG_PER_WORKER = 2
+
+MANIFEST_NAME = "manifest.jsonl"
+
+# (key, reader) pairs; a tar stream's reader must be called before the next item
+Source = Iterator[Tuple[str, Callable[[], bytes]]]
+
+def _is_image(name: str) -> bool:
+    return Path(name).suffix.lower() in IMAGE_EXTENSION_MIMES
+
+def _member_key(root: str, name: str) -> Optional[str]:
+    """Manifest key of an archive member, or None for unsafe paths"""
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ".." in parts:
+        return None
+    return str(PurePosixPath(root, *parts))
+
+def _walk_directory(directory: Path) -> Source:
+    for current, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if _is_image(name):
+                path = Path(current, name)
+                key = str(PurePosixPath(directory.name, *path.relative_to(directory).parts))
+                yield key, path.read_bytes
+
+def _read_tar(path: Path) -> Source:
+    # Stream mode never seeks, so compressed archives are read in one pass
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            key = _member_key(path.name, member.name)
+            if member.isfile() and key is not None and _is_image(member.name):
+                yield key, archive.extractfile(member).read
+
+def _read_zip(path: Path) -> Source:
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            key = _member_key(path.name, info.filename)
+            if not info.is_dir() and key is not None and _is_image(info.filename):
+                yield key, lambda info=info: archive.read(info)
+
+def duplicate_roots(inputs: List[Path]) -> List[str]:
+    """Input names used more than once, which would map onto the same keys"""
+    names = [path.name for path in inputs]
+    return sorted({name for name in names if names.count(name) > 1})
+
+def iter_sources(inputs: List[Path]) -> Source:
+    """Yield (key, reader) for every image in the given directories, archives and files"""
+    duplicates = duplicate_roots(inputs)
+    if duplicates:
+        raise ValueError(f"Inputs must have distinct names: {', '.join(duplicates)}")
+    for path in inputs:
+        if path.is_dir():
+            yield from _walk_directory(path)
+        elif path.is_file() and _is_image(path.name):
+            yield path.name, path.read_bytes
+        elif path.is_file() and zipfile.is_zipfile(path):
+            yield from _read_zip(path)
+        elif path.is_file() and tarfile.is_tarfile(path):
+            yield from _read_tar(path)
+        else:
+            raise ValueError(f"Not an image, directory or archive: {path}")
+
+def read_manifest(path: Path) -> Dict[str, dict]:
+    """Latest manifest record per key; a line cut short by a crash is ignored"""
+    records = {}
+    if path.exists():
+        with open(path) as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["key"]] = record
+    return records
+
+def _warm_worker(scratch_limit: int):
+    from app.enhancer import set_scratch_limit, warm_kernel_bank
+    set_scratch_limit(scratch_limit)
+    warm_kernel_bank()
+
+def enhance_to_file(contents: bytes, output_path: str, full_resolution: bool, output_format: str,
+                    mode: str) -> dict:
+    """Worker task: enhance one image and write it atomically to output_path"""
+    from app.utils import enhance_image_bytes
+
+    start = time.perf_counter()
+    try:
+        image_bytes, _, stats = enhance_image_bytes(contents, None, full_resolution, output_format, mode)
+    except LowQualityError as e:
+        quality = (e.extra or {}).get("quality") or {}
+        return {"status": "low_quality", "quality": quality.get("score")}
+
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+    partial.write_bytes(image_bytes)
+    os.replace(partial, path)
+    return {
+        "status": "ok",
+        "output": output_path,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "quality": stats["quality"]["score"]
+    }
+
+def output_path_for_key(output_dir: Path, key: str, output_format: str) -> Path:
+    """Output path of a key: its input name, extension included, plus the format's extension"""
+    extension, _ = OUTPUT_FORMATS[output_format]
+    return output_dir / (key + extension)
+
+def run(inputs: List[Path], output_dir: Path, workers: int = 0, memory_mb: Optional[int] = None,
+        full_resolution: bool = False, output_format: str = "jpeg", mode: str = "standard",
+        manifest_path: Optional[Path] = None, progress_interval: float = 10.0) -> dict:
+    """
+    Enhance every image under inputs into output_dir
+
+    Returns:
+        Summary counts with elapsed seconds and images per second
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    memory_budget = (memory_mb or settings.admission_memory_mb) * 1024 * 1024
+    # Idle float32 workers keep their scratch buffers, so that is not available to in-flight images
+    scratch_limit = scratch_limit_bytes(workers, memory_budget, mode == "float32")
+    memory_budget -= workers * scratch_limit
+    manifest_path = manifest_path or output_dir / MANIFEST_NAME
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    done = {key for key, record in read_manifest(manifest_path).items() if record["status"] in DONE_STATUSES}
+    counts = {"ok": 0, "low_quality": 0, "failed": 0, "skipped": 0}
+    in_flight: Dict[Future, Tuple[str, int]] = {}
+    memory_in_use = 0
+    start = last_report = time.perf_counter()
+
+    def report(final: bool = False):
+        elapsed = time.perf_counter() - start
+        processed = counts["ok"] + counts["low_quality"] + counts["failed"]
+        line = (f"{processed} processed ({counts['ok']} ok, {counts['low_quality']} low quality, "
+                f"{counts['failed']} failed), {counts['skipped']} skipped, "
+                f"{processed / elapsed if elapsed > 0 else 0.0:.2f} images/s")
+        print(("done: " if final else "") + line, file=sys.stderr, flush=True)
+
+    def collect(finished, manifest):
+        nonlocal memory_in_use, last_report
+        for future in finished:
+            key, cost = in_flight.pop(future)
+            memory_in_use -= cost
+            try:
+                record = {"key": key, **future.result()}
+            except Exception as e:
+                record = {"key": key, "status": "failed", "error": str(e)}
+            counts[record["status"]] += 1
+            manifest.write(json.dumps(record) + "\n")
+        manifest.flush()
+        if progress_interval and time.perf_counter() - last_report >= progress_interval:
+            last_report = time.perf_counter()
+            report()
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker,
+        initargs=(scratch_limit,)
+    )
+    seen = set()
+    with executor, open(manifest_path, "a") as manifest:
+        for key, read in iter_sources(inputs):
+            if key in done:
+                counts["skipped"] += 1
+                continue
+            if key in seen:
+                # An archive may hold the same member name twice; the first one wins
+                counts["failed"] += 1
+                manifest.write(json.dumps({"key": key, "status": "failed", "error": "Duplicate entry"}) + "\n")
+                continue
+            seen.add(key)
+            try:
+                contents = read()
+            except Exception as e:
+                # An unreadable file or corrupt member fails on its own, like a worker error
+                counts["failed"] += 1
+                manifest.write(json.dumps({"key": key, "status": "failed", "error": f"Read failed: {e}"}) + "\n")
+                continue
+            cost = estimate_memory_bytes(contents, full_resolution)
+            # Always admit one image so a single oversized one cannot stall the run
+            while in_flight and (len(in_flight) >= workers * (1 + BACKLOG_PER_WORKER)
+                                 or memory_in_use + cost > memory_budget):
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished, manifest)
+
+            output_path = output_path_for_key(output_dir, key, output_format)
+            future = executor.submit(enhance_to_file, contents, str(output_path), full_resolution,
+                                     output_format, mode)
+            in_flight[future] = (key, cost)
+            memory_in_use += cost
+            del contents
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(finished, manifest)
+
+    elapsed = time.perf_counter() - start
+    processed = counts["ok"] + counts["low_quality"] + counts["failed"]
+    report(final=True)
+    return {
+        **counts,
+        "processed": processed,
+        "elapsed_s": round(elapsed, 3),
+        "images_per_s": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        "manifest": str(manifest_path)
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Enhance directories and archives of fingerprint images")
+    parser.add_argument("inputs", type=Path, nargs="+", help="Directories, tar/zip archives or image files")
+    parser.add_argument("--output", type=Path, required=True, help="Directory enhanced images are written to")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--memory-mb", type=int, help="Estimated memory of in-flight images "
+                                                      "(default: ADMISSION_MEMORY_MB)")
+    parser.add_argument("--full-resolution", action="store_true", help="Enhance at capture resolution")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="jpeg", dest="output_format")
+    parser.add_argument("--mode", choices=ENHANCEMENT_MODES, default="standard")
+    parser.add_argument("--manifest", type=Path, help=f"Progress manifest (default: OUTPUT/{MANIFEST_NAME})")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        if not path.exists():
+            parser.error(f"{path} does not exist")
+    duplicates = duplicate_roots(args.inputs)
+    if duplicates:
+        parser.error(f"inputs must have distinct names: {', '.join(duplicates)}")
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    try:
+        scratch_limit_bytes(workers, (args.memory_mb or settings.admission_memory_mb) * 1024 * 1024,
+                            args.mode == "float32")
+    except ValueError as e:
+        parser.error(str(e))
+
+    summary = run(
+        args.inputs, args.output, args.workers, args.memory_mb, args.full_resolution,
+        args.output_format, args.mode, args.manifest, args.progress_interval
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
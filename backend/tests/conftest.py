@@ -2,9 +2,39 @@
 Backend test configuration and fixtures
 """
 
+import atexit
+import os
+import shutil
+import tempfile
+
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
+
+# Spawned enhancement workers read their directories from the environment when
+# they start, so point every process away from the repo before the app loads
+_STORAGE_ROOT = tempfile.mkdtemp(prefix="fingerprint-tests-")
+atexit.register(shutil.rmtree, _STORAGE_ROOT, ignore_errors=True)
+for _name, _dir in (("UPLOAD_DIR", "uploads"), ("ENHANCED_DIR", "enhanced"), ("TEMPLATE_INDEX_DIR", "templates")):
+    os.environ[_name] = os.path.join(_STORAGE_ROOT, _dir)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Keep saved outputs, the disk cache and the retention index in tmp_path"""
+    from app.cache import enhancement_cache
+    from app.config import settings
+    from app.storage import INDEX_FILE_NAME, retention_index, retention_sweeper
+    
+    enhanced_dir = tmp_path / "enhanced"
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "enhanced_dir", str(enhanced_dir))
+    if enhancement_cache.disk_dir is not None:
+        monkeypatch.setattr(enhancement_cache, "disk_dir", enhanced_dir / "cache")
+    monkeypatch.setattr(retention_index, "db_path", str(enhanced_dir / INDEX_FILE_NAME))
+    monkeypatch.setattr(retention_index, "_initialized", False)
+    monkeypatch.setattr(retention_sweeper, "directories", [settings.upload_dir, settings.enhanced_dir])
 
 
 @pytest.fixture
@@ -28,3 +58,28 @@ def sample_image_file():
     img_io.seek(0)
     
     return ('test_image.jpg', img_io, 'image/jpeg')
+
+
+@pytest.fixture
+def anyio_backend():
+    """Run async tests on asyncio only (the app never runs under trio)"""
+    return "asyncio"
+
+
+@pytest.fixture
+def ridge_image_file():
+    """Create a synthetic ridge-pattern image the enhancer can process"""
+    import io
+    import numpy as np
+    from PIL import Image
+    
+    # Concentric rings with a ~9px period, roughly like a 500 dpi whorl
+    y, x = np.mgrid[0:240, 0:200]
+    radius = np.hypot(x - 100, y - 120)
+    pixels = (127 + 100 * np.sin(2 * np.pi * radius / 9)).astype(np.uint8)
+    
+    img_io = io.BytesIO()
+    Image.fromarray(pixels).save(img_io, 'PNG')
+    img_io.seek(0)
+    
+    return ('ridges.png', img_io, 'image/png')
@@ -0,0 +1,139 @@
+"""
+Admission control tests
+"""
+
+import asyncio
+import io
+import struct
+
+import pytest
+
+from app.admission import AdmissionController, estimate_memory_bytes, scratch_limit_bytes
+from app.config import settings
+from app.exceptions import ServiceUnavailableError
+
+
+def _bmp_header(width: int, height: int) -> bytes:
+    return b"BM" + b"\x00" * 16 + struct.pack("<iiHH", width, height, 1, 8) + b"\x00" * 24
+
+
+def test_memory_estimate_follows_dimensions():
+    """Test that larger frames and full resolution cost more"""
+    small = estimate_memory_bytes(_bmp_header(500, 500))
+    large = estimate_memory_bytes(_bmp_header(4000, 4000))
+    large_full = estimate_memory_bytes(_bmp_header(4000, 4000), full_resolution=True)
+    
+    assert small < large < large_full
+
+
+@pytest.mark.anyio
+async def test_waits_then_admits_in_order():
+    """Test that work beyond the concurrency limit queues and runs FIFO"""
+    controller = AdmissionController(max_concurrent=1, memory_budget_bytes=100, max_waiting=4,
+                                     wait_timeout_seconds=5)
+    order = []
+    
+    async def work(name: str):
+        async with controller.admit(10):
+            order.append(name)
+            await asyncio.sleep(0.01)
+    
+    await asyncio.gather(work("a"), work("b"), work("c"))
+    assert order == ["a", "b", "c"]
+    assert controller.active == 0 and controller.memory_in_use == 0
+
+
+@pytest.mark.anyio
+async def test_memory_budget_limits_admission():
+    """Test that an expensive request waits for memory even with free slots"""
+    controller = AdmissionController(max_concurrent=4, memory_budget_bytes=100, max_waiting=4,
+                                     wait_timeout_seconds=0.05)
+    async with controller.admit(80):
+        with pytest.raises(ServiceUnavailableError) as excinfo:
+            async with controller.admit(50):
+                pass
+        assert excinfo.value.headers["Retry-After"].isdigit()
+        # A cheap one still fits alongside
+        async with controller.admit(20):
+            assert controller.active == 2
+
+
+@pytest.mark.anyio
+async def test_worker_scratch_is_reserved_from_the_budget():
+    """Test that retained scratch shrinks the budget and must leave some of it"""
+    controller = AdmissionController(max_concurrent=4, memory_budget_bytes=100, max_waiting=4,
+                                     wait_timeout_seconds=0.05, reserved_bytes=40)
+    assert controller.stats()["memory_budget_bytes"] == 60
+    async with controller.admit(50):
+        with pytest.raises(ServiceUnavailableError):
+            async with controller.admit(20):
+                pass
+
+    with pytest.raises(ValueError):
+        AdmissionController(max_concurrent=2, memory_budget_bytes=100, max_waiting=4,
+                            wait_timeout_seconds=0.05, reserved_bytes=100)
+
+
+def test_scratch_limit_fits_the_pool_into_the_budget(monkeypatch):
+    """Test that scratch is only kept for float32, is capped per pool and fails when it cannot fit"""
+    mb = 1024 * 1024
+    monkeypatch.setattr(settings, "enhancement_scratch_mb", 64)
+    monkeypatch.setattr(settings, "enhancement_memory_budget_mb", 512)
+
+    assert scratch_limit_bytes(4, 2048 * mb) == 64 * mb
+    assert scratch_limit_bytes(64, 2048 * mb) == 8 * mb
+    assert scratch_limit_bytes(64, 2048 * mb, float32=False) == 0
+    with pytest.raises(ValueError):
+        scratch_limit_bytes(4, 600 * mb)
+    monkeypatch.setattr(settings, "enhancement_scratch_mb", 0)
+    assert scratch_limit_bytes(4, 600 * mb) == 0
+
+
+@pytest.mark.anyio
+async def test_sheds_when_wait_queue_is_full():
+    """Test 503 once the bounded wait queue is full, unless shedding is off"""
+    controller = AdmissionController(max_concurrent=1, memory_budget_bytes=100, max_waiting=1,
+                                     wait_timeout_seconds=5)
+    release = asyncio.Event()
+    
+    async def hold():
+        async with controller.admit(10):
+            await release.wait()
+    
+    async def queued(shed: bool):
+        async with controller.admit(10, shed=shed):
+            pass
+    
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(queued(True))
+    await asyncio.sleep(0)
+    
+    with pytest.raises(ServiceUnavailableError):
+        await queued(True)
+    internal = asyncio.create_task(queued(False))
+    await asyncio.sleep(0)
+    assert controller.waiting == 2
+    
+    release.set()
+    await asyncio.gather(holder, waiter, internal)
+    assert controller.active == 0
+
+
+def test_enhance_returns_503_with_retry_after(client, ridge_image_file, monkeypatch):
+    """Test that a saturated server sheds /api/enhance with Retry-After"""
+    from app.admission import admission_controller
+    from app.cache import enhancement_cache
+    enhancement_cache.clear()
+    monkeypatch.setattr(admission_controller, "active", admission_controller.max_concurrent)
+    monkeypatch.setattr(admission_controller, "max_waiting", 0)
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance",
+        files={"file": (filename, io.BytesIO(file_io.getvalue() + b"\x00"), content_type)}
+    )
+    
+    assert response.status_code == 503
+    assert response.json()["error_code"] == "SERVICE_UNAVAILABLE"
+    assert int(response.headers["Retry-After"]) >= 1
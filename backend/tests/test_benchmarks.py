@@ -0,0 +1,64 @@
+"""
+Benchmark suite helper tests
+"""
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_fingerprint, encode_png
+from benchmarks.run import summarize, compare, mode_quality
+from app.utils import enhance_image_bytes
+
+
+def test_synthetic_fingerprint_is_enhanceable():
+    """Test that generated images are distinct per seed and go through the pipeline"""
+    first = synthetic_fingerprint(256, seed=1)
+    assert first.shape == (256, 256)
+    assert first.dtype == np.uint8
+    assert not np.array_equal(first, synthetic_fingerprint(256, seed=2))
+    
+    jpeg_bytes, _, stats = enhance_image_bytes(encode_png(first))
+    assert jpeg_bytes[:2] == b"\xff\xd8"
+    assert stats["dimensions"] == (256, 256)
+
+
+def test_summarize_percentiles():
+    """Test latency summary in milliseconds"""
+    summary = summarize([0.001 * i for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert round(summary["p50_ms"], 1) == 50.5
+    assert 95 <= summary["p95_ms"] <= 96
+    assert summary["throughput_per_s"] > 0
+
+
+def test_compare_flags_regressions():
+    """Test baseline comparison against the tolerance"""
+    def entry(p50, p95):
+        return {"suite": "stages", "size": 512, "latency": {"p50_ms": p50, "p95_ms": p95}}
+    
+    baseline = {"results": [entry(100, 120)]}
+    assert compare([entry(105, 125)], baseline, tolerance=0.10) == []
+    regressions = compare([entry(130, 125)], baseline, tolerance=0.10)
+    assert len(regressions) == 1
+    assert "p50_ms" in regressions[0]
+
+
+def test_compare_matches_results_by_mode():
+    """Test that modes are compared separately and old baselines count as standard"""
+    def entry(p50, mode=None):
+        result = {"suite": "stages", "size": 512, "latency": {"p50_ms": p50, "p95_ms": p50}}
+        if mode is not None:
+            result["mode"] = mode
+        return result
+    
+    baseline = {"results": [entry(100), entry(50, "pyramid")]}
+    assert compare([entry(100, "standard"), entry(52, "pyramid")], baseline, tolerance=0.10) == []
+    regressions = compare([entry(70, "pyramid")], baseline, tolerance=0.10)
+    assert len(regressions) == 2
+    assert all("pyramid" in line for line in regressions)
+
+
+def test_mode_quality_scales_the_ridge_period_with_the_working_resize():
+    """Test that the standard engine matches the known ridge frequency of a resized synthetic image"""
+    quality = mode_quality(512, "standard", full_resolution=False, seed=1, count=1)
+    assert quality["pixel_agreement"] == 1.0
+    assert quality["standard_freq_rel_error"] < 0.05
@@ -0,0 +1,106 @@
+"""
+Offline bulk enhancement CLI tests
+"""
+
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from benchmarks.synthetic import synthetic_fingerprint, encode_png
+from bulk import iter_sources, main, read_manifest
+
+
+def _tar_gz(path, members):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def _inputs(tmp_path):
+    pngs = [encode_png(synthetic_fingerprint(256, seed=seed)) for seed in range(4)]
+    folder = tmp_path / "db" / "nested"
+    folder.mkdir(parents=True)
+    (folder / "a.png").write_bytes(pngs[0])
+    (folder / "a.bmp").write_bytes(pngs[0])
+    (folder / "corrupt.png").write_bytes(b"not an image")
+    (folder / "notes.txt").write_text("ignored")
+    _tar_gz(tmp_path / "legacy.tar.gz", {"prints/b.png": pngs[1], "../escape.png": pngs[1], "a.png": pngs[1]})
+    with zipfile.ZipFile(tmp_path / "more.zip", "w") as archive:
+        archive.writestr("c.png", pngs[2])
+        archive.writestr("d/e.png", pngs[3])
+    return [tmp_path / "db", tmp_path / "legacy.tar.gz", tmp_path / "more.zip"]
+
+
+def test_sources_cover_directories_and_archives(tmp_path):
+    """Test that only safe image entries are listed, keyed by their input"""
+    keys = [key for key, read in iter_sources(_inputs(tmp_path)) if read()]
+    assert keys == ["db/nested/a.bmp", "db/nested/a.png", "db/nested/corrupt.png", "legacy.tar.gz/prints/b.png",
+                    "legacy.tar.gz/a.png", "more.zip/c.png", "more.zip/d/e.png"]
+
+
+def test_inputs_with_the_same_name_are_refused(tmp_path):
+    """Test that two inputs that would share keys are rejected up front"""
+    for parent in ("first", "second"):
+        (tmp_path / parent / "db").mkdir(parents=True)
+    inputs = [tmp_path / "first" / "db", tmp_path / "second" / "db"]
+    
+    with pytest.raises(ValueError):
+        list(iter_sources(inputs))
+    with pytest.raises(SystemExit):
+        main([str(path) for path in inputs] + ["--output", str(tmp_path / "out")])
+
+
+def test_float32_scratch_that_cannot_fit_is_refused(tmp_path):
+    """Test that a memory budget too small for the workers' scratch fails at parse time"""
+    argv = [str(tmp_path), "--output", str(tmp_path / "out"), "--workers", "2", "--memory-mb", "1"]
+    with pytest.raises(SystemExit):
+        main(argv + ["--mode", "float32"])
+
+
+def test_bulk_run_and_resume(tmp_path, capsys):
+    """Test that a run enhances everything, records failures, and a rerun only retries those"""
+    inputs = [str(path) for path in _inputs(tmp_path)]
+    output = tmp_path / "out"
+    argv = inputs + ["--output", str(output), "--workers", "2", "--format", "png", "--memory-mb", "1"]
+
+    assert main(argv) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["ok"], summary["failed"], summary["skipped"]) == (6, 1, 0)
+    assert summary["images_per_s"] > 0
+    for name in ("db/nested/a.png", "db/nested/a.bmp", "legacy.tar.gz/prints/b.png", "legacy.tar.gz/a.png",
+                 "more.zip/c.png", "more.zip/d/e.png"):
+        assert (output / (name + ".png")).read_bytes()[:4] == b"\x89PNG"
+    assert not list(output.rglob("*.part"))
+
+    records = read_manifest(output / "manifest.jsonl")
+    assert records["db/nested/corrupt.png"]["status"] == "failed"
+    assert records["more.zip/c.png"]["status"] == "ok"
+
+    assert main(argv) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["processed"], summary["failed"], summary["skipped"]) == (1, 1, 6)
+
+
+def test_unreadable_member_fails_on_its_own(tmp_path, capsys):
+    """Test that a corrupt archive member is recorded as failed while the rest is enhanced"""
+    png = encode_png(synthetic_fingerprint(256, seed=0))
+    with zipfile.ZipFile(tmp_path / "prints.zip", "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("bad.png", png)
+        archive.writestr("good.png", png)
+    data = bytearray((tmp_path / "prints.zip").read_bytes())
+    # Flip a byte of the first member's data so its CRC check fails
+    data[data.index(png[:16]) + 100] ^= 0xFF
+    (tmp_path / "prints.zip").write_bytes(bytes(data))
+    output = tmp_path / "out"
+    
+    assert main([str(tmp_path / "prints.zip"), "--output", str(output), "--workers", "1", "--format", "png"]) == 1
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["ok"], summary["failed"]) == (1, 1)
+    records = read_manifest(output / "manifest.jsonl")
+    assert records["prints.zip/bad.png"]["error"].startswith("Read failed")
+    assert records["prints.zip/good.png"]["status"] == "ok"
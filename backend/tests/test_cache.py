@@ -0,0 +1,64 @@
+"""
+Enhancement result cache tests
+"""
+
+import os
+import time
+
+from app.cache import EnhancementCache
+from app.storage import retention_index
+
+
+def test_key_depends_on_bytes_and_params():
+    """Test that keys change with either the input or the parameters"""
+    key = EnhancementCache.make_key(b"image", {"version": 1})
+    assert key == EnhancementCache.make_key(b"image", {"version": 1})
+    assert key != EnhancementCache.make_key(b"image", {"version": 2})
+    assert key != EnhancementCache.make_key(b"other", {"version": 1})
+
+
+def test_memory_tier_respects_byte_budget():
+    """Test LRU eviction once the byte budget is exceeded"""
+    cache = EnhancementCache(memory_budget_bytes=10, disk_dir=None, retention_hours=1)
+    cache.put("a", b"12345", {})
+    cache.put("b", b"12345", {})
+    cache.get("a")  # refresh "a" so "b" is least recently used
+    cache.put("c", b"12345", {})
+    
+    assert cache.get("b") is None
+    assert cache.get("a")[2] == "memory"
+    assert cache.stats()["memory_bytes"] <= 10
+
+
+def test_disk_tier_survives_memory_eviction_and_expires(tmp_path):
+    """Test disk hits and retention-based expiry"""
+    cache = EnhancementCache(memory_budget_bytes=0, disk_dir=str(tmp_path), retention_hours=1)
+    cache.put("abcdef", b"jpeg", {"dimensions": [10, 20]})
+    
+    data, stats, tier = cache.get("abcdef")
+    assert (data, stats, tier) == (b"jpeg", {"dimensions": [10, 20]}, "disk")
+    # Both files are handed to the retention sweeper
+    assert len(retention_index) == 2
+    
+    # Age the entry past the retention window
+    old = time.time() - 2 * 3600
+    os.utime(tmp_path / "ab" / "abcdef.jpg", (old, old))
+    # Only the looked-up entry is checked; the retention sweeper deletes the rest
+    assert cache.get("abcdef") is None
+    assert not (tmp_path / "ab" / "abcdef.jpg").exists()
+
+
+def test_repeated_upload_is_served_from_cache(client, ridge_image_file):
+    """Test that resubmitting the same image hits the memory tier"""
+    filename, file_io, content_type = ridge_image_file
+    contents = file_io.getvalue()
+    
+    first = client.post("/api/enhance", files={"file": (filename, contents, content_type)})
+    before = client.get("/status").json()["cache"]
+    second = client.post("/api/enhance", files={"file": (filename, contents, content_type)})
+    after = client.get("/status").json()["cache"]
+    
+    assert first.status_code == second.status_code == 200
+    assert first.json()["enhanced_image"] == second.json()["enhanced_image"]
+    assert after["memory_hits"] == before["memory_hits"] + 1
+    assert after["misses"] == before["misses"]
@@ -53,3 +53,191 @@ def test_download_path_traversal_protection(client):
     response = client.get("/api/download/../../etc/passwd")
     
     assert response.status_code == 400  # Should be blocked
+
+
+
+def test_enhance_does_not_persist_by_default(client, ridge_image_file):
+    """Test that the in-memory path returns no download name unless asked"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance",
+        files={"file": (filename, file_io, content_type)}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["enhanced_image"].startswith("data:image/jpeg;base64,")
+    assert data["file_name"] is None
+
+
+def test_enhance_image_bytes_in_memory(ridge_image_file, tmp_path, monkeypatch):
+    """Test in-memory enhancement and the optional persisted copy"""
+    from app.config import settings
+    from app.utils import enhance_image_bytes
+    monkeypatch.setattr(settings, "enhanced_dir", str(tmp_path))
+    contents = ridge_image_file[1].getvalue()
+    
+    jpeg_bytes, output_path, stats = enhance_image_bytes(contents)
+    assert jpeg_bytes[:2] == b"\xff\xd8"
+    assert output_path is None
+    assert stats["dimensions"] == (200, 240)
+    assert list(tmp_path.iterdir()) == []
+    
+    _, output_path, _ = enhance_image_bytes(contents, save_as="ridges.png")
+    with open(output_path, "rb") as f:
+        assert f.read() == jpeg_bytes
+
+
+def test_enhance_batch_reports_per_item_errors(client, ridge_image_file):
+    """Test that one bad file in a batch yields a per-item error"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance/batch",
+        files=[
+            ("files", (filename, file_io.getvalue(), content_type)),
+            ("files", ("notes.txt", b"not an image", "text/plain")),
+        ]
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert data["succeeded"] == 1
+    assert data["success"] is False
+    assert data["results"][0]["success"] is True
+    assert data["results"][1]["error_code"] == "FILE_UPLOAD_ERROR"
+
+
+def test_enhance_batch_accepts_zip(client, ridge_image_file):
+    """Test that images inside a zip archive are enhanced individually"""
+    import io
+    import zipfile
+    
+    filename, file_io, _ = ridge_image_file
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("finger_1.png", file_io.getvalue())
+        zf.writestr("finger_2.png", file_io.getvalue())
+    
+    response = client.post(
+        "/api/enhance/batch",
+        files={"files": ("fingers.zip", archive.getvalue(), "application/zip")}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 2
+    assert [item["source_name"] for item in data["results"]] == ["finger_1.png", "finger_2.png"]
+
+
+def test_enhance_batch_caps_inflated_archive_size(client, monkeypatch):
+    """Test that zip members are capped by their combined inflated size"""
+    import io
+    import zipfile
+    from app.config import settings
+    from app.exceptions import FileUploadError
+    from app.utils import extract_zip_images
+    
+    monkeypatch.setattr(settings, "max_batch_size_mb", 1)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for index in range(3):
+            zf.writestr(f"bomb_{index}.png", bytes(600 * 1024))
+    assert len(archive.getvalue()) < 64 * 1024
+    
+    assert len(extract_zip_images(archive.getvalue(), 2 * 1024 * 1024)) == 3
+    with pytest.raises(FileUploadError):
+        extract_zip_images(archive.getvalue())
+    
+    response = client.post(
+        "/api/enhance/batch",
+        files={"files": ("bomb.zip", archive.getvalue(), "application/zip")}
+    )
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "FILE_UPLOAD_ERROR"
+
+
+def test_enhance_reports_stage_timings(client, ridge_image_file):
+    """Test that the response breaks processing time down by stage"""
+    from app.cache import enhancement_cache
+    enhancement_cache.clear()
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance?full_resolution=true",
+        files={"file": (filename, file_io, content_type)}
+    )
+    
+    assert response.status_code == 200
+    names = [entry["name"] for entry in response.json()["stages"]]
+    assert names[-1] == "base64"
+    assert {"decode", "segmentation", "orientation", "frequency", "gabor_filter", "encode"} <= set(names)
+
+
+def test_enhance_returns_raw_png_when_accepted(client, ridge_image_file):
+    """Test that Accept: image/png streams PNG bytes with metadata headers"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance",
+        files={"file": (filename, file_io, content_type)},
+        headers={"Accept": "image/png"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content[:8] == b"\x89PNG\r\n\x1a\n"
+    assert response.headers["x-original-width"] == "200"
+    assert response.headers["x-original-height"] == "240"
+    assert int(response.headers["x-image-height"]) > 0
+    assert "gabor_filter" in response.headers["x-stage-timings"] or response.headers["x-cache"] != "miss"
+
+
+def test_enhance_pyramid_mode(client, ridge_image_file):
+    """Test that mode=pyramid is selectable per request and reported back"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance?mode=pyramid",
+        files={"file": (filename, file_io, content_type)},
+        headers={"Accept": "image/jpeg"}
+    )
+    
+    assert response.status_code == 200
+    assert response.content[:2] == b"\xff\xd8"
+    assert response.headers["x-enhancement-mode"] == "pyramid"
+    assert 0 < float(response.headers["x-foreground-fraction"]) <= 1
+    
+    file_io.seek(0)
+    response = client.post("/api/enhance?mode=bogus", files={"file": (filename, file_io, content_type)})
+    assert response.status_code == 400
+
+
+def test_enhance_float32_mode(client, ridge_image_file):
+    """Test that mode=float32 is selectable per request and reported back"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance?mode=float32",
+        files={"file": (filename, file_io, content_type)},
+        headers={"Accept": "image/png"}
+    )
+    
+    assert response.status_code == 200
+    assert response.content[:4] == b"\x89PNG"
+    assert response.headers["x-enhancement-mode"] == "float32"
+
+
+def test_enhance_accept_negotiation():
+    """Test Accept parsing, including q-values and the JSON default"""
+    from app.routes.enhancement import _negotiate_output
+    
+    assert _negotiate_output(None) is None
+    assert _negotiate_output("application/json") is None
+    assert _negotiate_output("*/*") is None
+    assert _negotiate_output("application/octet-stream") == "jpeg"
+    assert _negotiate_output("image/jpeg, application/json;q=0.5") == "jpeg"
+    assert _negotiate_output("image/png;q=0.4, application/json") is None
+    assert _negotiate_output("text/html, image/png;q=0.9") == "png"
@@ -0,0 +1,128 @@
+"""
+Vectorized enhancement engine tests
+"""
+
+import numpy as np
+import pytest
+
+from app.enhancer import FingerprintEnhancer, ScratchBuffers, gabor_kernel_bank, scratch_buffers
+
+# Maximum fraction of output pixels allowed to differ from the reference engine
+MAX_PIXEL_MISMATCH = 0.01
+
+# Pyramid mode trades a little agreement with the standard engine for speed
+MAX_PYRAMID_MISMATCH = 0.03
+
+# Single precision may flip the odd pixel sitting on the binarisation threshold
+MAX_FLOAT32_MISMATCH = 0.001
+
+
+def _synthetic_fingerprint(rows=480, cols=400, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols]
+    radius = np.hypot(x - cols / 2, y - rows / 2) + 3 * np.sin(x / 20)
+    img = 127 + 90 * np.sin(2 * np.pi * radius / 9) + rng.normal(0, 20, radius.shape)
+    img[:, :60] = 200  # flat background strip
+    return img.clip(0, 255).astype(np.uint8)
+
+
+def test_kernel_bank_is_cached():
+    """Test that the kernel bank is built once per frequency"""
+    bank = gabor_kernel_bank(0.11, 3.0, 0.65, 0.65)
+    assert bank.shape[0] == 60
+    assert gabor_kernel_bank(0.11, 3.0, 0.65, 0.65) is bank
+
+
+def test_kernel_bank_index_matches_orientation():
+    """Test that kernel k is oriented at k * angle_inc degrees, as in the reference engine"""
+    bank = gabor_kernel_bank(0.11, 3.0, 0.65, 0.65)
+    # 0 and 90 degrees are exact quarter turns of each other
+    assert np.allclose(bank[0], bank[30].T, atol=1e-9)
+
+
+def test_enhance_output_shape():
+    """Test that enhancement returns a boolean map at the resized shape"""
+    result = FingerprintEnhancer().enhance(_synthetic_fingerprint(), invert_output=True)
+    assert result.dtype == bool
+    assert result.shape == (350, 291)
+
+
+def test_enhance_rejects_flat_image():
+    """Test that a blank image is rejected"""
+    with pytest.raises(ValueError):
+        FingerprintEnhancer().enhance(np.full((100, 100), 128, dtype=np.uint8))
+
+
+def test_matches_reference_engine():
+    """Test parity with fingerprint_enhancer.FingerprintImageEnhancer"""
+    reference = pytest.importorskip("fingerprint_enhancer.fingerprint_image_enhancer")
+    img = _synthetic_fingerprint()
+    
+    expected = reference.FingerprintImageEnhancer().enhance(img, invert_output=True)
+    actual = FingerprintEnhancer().enhance(img, invert_output=True)
+    
+    assert actual.shape == expected.shape
+    assert np.mean(actual != expected) < MAX_PIXEL_MISMATCH
+
+
+@pytest.mark.parametrize("levels", [1, 2])
+def test_pyramid_mode_tracks_standard(levels):
+    """Test that coarse orientation/frequency estimation stays close to the standard fields"""
+    img = _synthetic_fingerprint()
+    standard = FingerprintEnhancer()
+    expected = standard.enhance(img, resize=False)
+    pyramid = FingerprintEnhancer(pyramid_levels=levels)
+    actual = pyramid.enhance(img, resize=False)
+    
+    assert actual.shape == expected.shape == img.shape
+    assert np.mean(actual != expected) < MAX_PYRAMID_MISMATCH
+    # Ridge period of the synthetic image is 9 px
+    assert abs(pyramid._mean_freq - 1 / 9) < 0.015
+
+
+def test_processing_is_limited_to_foreground():
+    """Test that cropping to the segmented ROI leaves the output unchanged"""
+    img = np.full((400, 400), 200, dtype=np.uint8)
+    img[120:300, 100:280] = _synthetic_fingerprint(180, 180)
+    
+    cropped = FingerprintEnhancer()
+    actual = cropped.enhance(img, resize=False)
+    expected = FingerprintEnhancer(foreground_only=False).enhance(img, resize=False)
+    
+    assert np.array_equal(actual, expected)
+    # Block-aligned box around the ridges (the helper's first 60 columns are flat)
+    assert cropped.roi.bbox == (112, 304, 160, 288)
+    assert 0.1 < cropped.roi.fraction < 0.2
+    assert not actual[:100].any()
+
+
+@pytest.mark.parametrize("resize", [True, False])
+def test_float32_mode_tracks_float64(resize):
+    """Test that single precision keeps the ridge map and reuses its scratch buffers"""
+    for seed in range(3):
+        img = _synthetic_fingerprint(seed=seed)
+        expected = FingerprintEnhancer()
+        expected_map = expected.enhance(img, resize=resize)
+        reduced = FingerprintEnhancer(dtype="float32")
+        actual = reduced.enhance(img, resize=resize)
+        
+        assert np.mean(actual != expected_map) < MAX_FLOAT32_MISMATCH
+        assert abs(reduced._mean_freq - expected._mean_freq) < 1e-6
+        assert reduced._normim.dtype == np.float32
+    
+    held = scratch_buffers.nbytes
+    FingerprintEnhancer(dtype="float32").enhance(img, resize=resize)
+    assert scratch_buffers.nbytes == held
+
+
+def test_scratch_buffers_are_reused_within_limit():
+    """Test that smaller requests share a buffer and the limit caps what is kept"""
+    scratch = ScratchBuffers(limit_bytes=1 << 20)
+    first = scratch.get("image", (100, 100), np.float32)
+    smaller = scratch.get("image", (50, 80), np.float32)
+    assert np.shares_memory(first, smaller) and smaller.flags.c_contiguous
+    assert not np.shares_memory(first, scratch.get("freq", (100, 100), np.float32))
+    
+    oversized = scratch.get("gabor", (1024, 1024), np.float32)
+    assert oversized.shape == (1024, 1024)
+    assert scratch.nbytes == 2 * 100 * 100 * 4
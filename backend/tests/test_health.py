@@ -36,3 +36,85 @@ def test_root_endpoint(client):
     assert "message" in data
     assert "version" in data
     assert "docs" in data
+
+
+def test_metrics_endpoint(client):
+    """Test Prometheus metrics exposition"""
+    client.get("/health")
+    client.post("/api/enhance", files={"file": ("test.txt", b"not an image", "text/plain")})
+    
+    response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in body
+    assert 'errors_total{error_code="FILE_UPLOAD_ERROR"}' in body
+    assert "enhancements_in_flight" in body
+    assert "http_request_duration_seconds_bucket" in body
+
+
+def test_ready_reports_warm_up_state(client, monkeypatch):
+    """Test that /ready is 503 until warm-up finishes, unlike /health"""
+    from app.workers import enhancement_pool
+    
+    monkeypatch.setattr(enhancement_pool, "ready", False)
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+    
+    monkeypatch.setattr(enhancement_pool, "ready", True)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_lifespan_warm_up_marks_ready():
+    """Test that the startup warm-up runs in the background and ends ready"""
+    import time
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.workers import enhancement_pool
+    
+    enhancement_pool.ready = False
+    with TestClient(app) as client:
+        deadline = time.time() + 120
+        while client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.1)
+        assert client.get("/ready").status_code == 200
+
+
+def test_app_import_defers_image_libraries():
+    """Test that importing the app does not load OpenCV, NumPy or SciPy"""
+    import subprocess
+    import sys
+    from pathlib import Path
+    
+    code = "import sys, app.main; print(sorted(m for m in ('cv2', 'numpy', 'scipy') if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_metrics_multiprocess_dir_is_read_from_env_file(tmp_path):
+    """Test that PROMETHEUS_MULTIPROC_DIR set only in .env enables multiprocess metrics"""
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+    
+    metrics_dir = tmp_path / "metrics"
+    (tmp_path / ".env").write_text(f"PROMETHEUS_MULTIPROC_DIR={metrics_dir}\n")
+    env = {name: value for name, value in os.environ.items() if name.upper() != "PROMETHEUS_MULTIPROC_DIR"}
+    env["PYTHONPATH"] = str(Path(__file__).resolve().parent.parent)
+    code = ("from app import metrics; metrics.http_requests_total.labels('GET', '/', '200').inc(); "
+            "print(metrics.MULTIPROCESS)")
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, cwd=tmp_path, env=env, timeout=60
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "True"
+    assert list(metrics_dir.glob("counter_*.db"))
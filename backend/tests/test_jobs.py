@@ -0,0 +1,162 @@
+"""
+Asynchronous job API tests
+"""
+
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.jobs import InMemoryJobStore, Job, JobState
+
+
+@pytest.fixture
+def live_client():
+    """Test client with lifespan running so job runners are active"""
+    with TestClient(app) as client:
+        yield client
+
+
+def _wait_for_job(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = client.get(f"/api/jobs/{job_id}").json()
+        if data["status"] in ("done", "failed"):
+            return data
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_lifecycle(live_client, ridge_image_file):
+    """Test submit, poll and result retrieval"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = live_client.post("/api/jobs", files={"file": (filename, file_io, content_type)})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status"] in ("queued", "running")
+    
+    data = _wait_for_job(live_client, job_id)
+    assert data["status"] == "done"
+    assert {"queued_ms", "processing_ms", "total_ms"} <= set(data["timings"])
+    
+    result = live_client.get(data["result_url"])
+    assert result.status_code == 200
+    assert result.headers["content-type"] == "image/jpeg"
+    assert result.content[:2] == b"\xff\xd8"
+
+
+def test_failed_job_result_conflict(live_client, sample_image_file):
+    """Test that a failed job reports its error and has no result"""
+    filename, file_io, content_type = sample_image_file
+    
+    job_id = live_client.post("/api/jobs", files={"file": (filename, file_io, content_type)}).json()["job_id"]
+    data = _wait_for_job(live_client, job_id)
+    
+    assert data["status"] == "failed"
+    # A flat frame is caught by the quality gate before any filtering
+    assert data["error_code"] == "LOW_QUALITY"
+    assert live_client.get(f"/api/jobs/{job_id}/result").status_code == 409
+
+
+def test_unknown_job(client):
+    """Test that unknown job ids return 404"""
+    assert client.get("/api/jobs/does-not-exist").status_code == 404
+
+
+def test_store_evicts_oldest_finished_jobs():
+    """Test that the in-memory store stays bounded without dropping pending jobs"""
+    store = InMemoryJobStore(max_retained=2)
+    pending = Job(id="pending", source_name="a.png")
+    store.add(pending)
+    for job_id in ("done-1", "done-2"):
+        store.add(Job(id=job_id, source_name="b.png", state=JobState.DONE))
+        store.set_result(job_id, b"jpeg")
+    
+    assert store.get("pending") is pending
+    assert store.get("done-1") is None
+    assert store.get_result("done-1") is None
+    assert store.get("done-2") is not None
+
+
+def test_store_caps_result_bytes_and_age(monkeypatch):
+    """Test that results are dropped oldest first over the byte cap or once expired, on any access"""
+    store = InMemoryJobStore(max_retained=10, max_result_bytes=10, result_ttl_seconds=60)
+    for job_id in ("a", "b", "c"):
+        store.add(Job(id=job_id, source_name="a.png", state=JobState.DONE))
+        store.set_result(job_id, b"x" * 4)
+    
+    assert store.get_result("a") is None
+    assert store.get_result("b") is not None and store.result_bytes == 8
+    store.add(Job(id="d", source_name="a.png", state=JobState.DONE))
+    store.set_result("d", b"x" * 20)
+    assert store.get_result("d") is not None and store.result_bytes == 20
+    
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert store.get("d") is not None
+    assert store.result_bytes == 0 and store.get_result("d") is None
+
+
+def test_preview_then_full_result(live_client, ridge_image_file, monkeypatch):
+    """Test that a preview answers immediately and the full result follows as a job"""
+    from app.config import settings
+    # A cold worker pool may still be warming up; the budget is not under test here
+    monkeypatch.setattr(settings, "preview_budget_ms", 60000)
+    filename, file_io, content_type = ridge_image_file
+    
+    response = live_client.post(
+        "/api/enhance?preview=true&full_resolution=true",
+        files={"file": (filename, file_io, content_type)},
+        headers={"Accept": "image/jpeg"}
+    )
+    
+    assert response.status_code == 200
+    assert response.content[:2] == b"\xff\xd8"
+    assert response.headers["x-preview"] == "true"
+    assert response.headers["x-enhancement-mode"] == "pyramid"
+    
+    data = _wait_for_job(live_client, response.headers["x-job-id"])
+    assert data["status"] == "done"
+    assert data["result_url"] == response.headers["x-result-url"]
+    assert live_client.get(data["result_url"]).content[:2] == b"\xff\xd8"
+
+
+def test_preview_over_budget_still_queues_the_job(live_client, ridge_image_file, monkeypatch):
+    """Test that a preview that cannot meet its budget is answered with 202 and the queued job"""
+    from app.config import settings
+    monkeypatch.setattr(settings, "preview_budget_ms", 0)
+    filename, file_io, content_type = ridge_image_file
+    
+    response = live_client.post("/api/enhance?preview=true", files={"file": (filename, file_io, content_type)})
+    
+    assert response.status_code == 202
+    data = response.json()
+    assert data["enhanced_image"] is None and not data["preview"]
+    assert _wait_for_job(live_client, data["job_id"])["status"] == "done"
+    
+    binary = live_client.post(
+        "/api/enhance?preview=true",
+        files={"file": (filename, file_io.getvalue() + b"\x00", content_type)},
+        headers={"Accept": "image/jpeg"}
+    )
+    assert binary.status_code == 202 and binary.content == b""
+    assert _wait_for_job(live_client, binary.headers["x-job-id"])["status"] == "done"
+    
+    # The abandoned preview still holds its admission slot until the worker
+    # is done, and its result is cached for the retry
+    from app.admission import admission_controller
+    from app.routes.enhancement import _pending_previews
+    deadline = time.time() + 60
+    while (_pending_previews or admission_controller.active) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not _pending_previews and admission_controller.active == 0
+    
+    monkeypatch.setattr(settings, "preview_budget_ms", 60000)
+    retry = live_client.post(
+        "/api/enhance?preview=true",
+        files={"file": (filename, file_io.getvalue(), content_type)},
+        headers={"Accept": "image/jpeg"}
+    )
+    assert retry.status_code == 200
+    assert retry.headers["x-cache"] == "memory"
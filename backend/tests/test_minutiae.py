@@ -0,0 +1,92 @@
+"""
+Minutiae extraction tests
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.minutiae import BIFURCATION, ENDING, extract_minutiae, thin
+
+
+def _dislocation(period=10, size=240):
+    """Parallel ridges with one extra ridge starting at the centre"""
+    y, x = np.mgrid[0:size, 0:size]
+    phase = 2 * np.pi * y / period + np.arctan2(y - size / 2, x - size / 2)
+    return np.sin(phase) > 0
+
+
+def test_thinning_leaves_one_pixel_wide_ridges():
+    """Test that a 5px-wide bar thins to a single centre line"""
+    bar = np.zeros((20, 60), dtype=bool)
+    bar[8:13, 5:55] = True
+    
+    skeleton = thin(bar)
+    
+    assert skeleton[:, 15:45].sum(axis=0).tolist() == [1] * 30
+    assert skeleton[10, 15:45].all()
+
+
+@pytest.mark.parametrize("invert, kind", [(False, ENDING), (True, BIFURCATION)])
+def test_dislocation_yields_one_minutia(invert, kind):
+    """Test that a ridge ending and its dual bifurcation are found at the fork"""
+    ridges = _dislocation()
+    minutiae = extract_minutiae(~ridges if invert else ridges)
+    
+    assert len(minutiae) == 1
+    assert minutiae.type[0] == kind
+    assert np.hypot(minutiae.x[0] - 120, minutiae.y[0] - 120) < 6
+    # Ridges run horizontally, so the angle lies on the x axis
+    assert abs(np.cos(minutiae.angle[0])) > 0.95
+    assert minutiae.quality[0] > 0.8
+    assert minutiae.ridge_period == pytest.approx(10, rel=0.1)
+
+
+def test_ending_points_back_along_its_ridge():
+    """Test that the angle of an ending faces the ridge it terminates"""
+    y, _ = np.mgrid[0:200, 0:300]
+    ridges = np.mod(y, 10) < 5
+    ridges[100:105, 150:] = False
+    
+    minutiae = extract_minutiae(ridges)
+    
+    assert minutiae.type.tolist() == [ENDING]
+    assert 140 <= minutiae.x[0] <= 150 and 100 <= minutiae.y[0] <= 105
+    assert minutiae.angle[0] == pytest.approx(np.pi, abs=0.1)
+
+
+def test_image_edges_are_not_minutiae():
+    """Test that ridges cut off by the frame do not count as endings"""
+    y, _ = np.mgrid[0:200, 0:300]
+    assert len(extract_minutiae(np.mod(y, 10) < 5)) == 0
+
+
+def test_minutiae_endpoint(client, ridge_image_file):
+    """Test /api/minutiae returns parallel arrays in ridge-map coordinates"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post("/api/minutiae", files={"file": (filename, file_io, content_type)})
+    
+    assert response.status_code == 200
+    data = response.json()
+    for field in ("x", "y", "angle", "type", "quality"):
+        assert len(data[field]) == data["count"]
+    assert set(data["type"]) <= {ENDING, BIFURCATION}
+    assert data["dimensions"] == [200, 240]
+    width, height = data["enhanced_dimensions"]
+    assert all(0 <= x < width for x in data["x"]) and all(0 <= y < height for y in data["y"])
+    assert {"thinning", "minutiae"} <= {stage["name"] for stage in data["stages"]}
+
+
+def test_minutiae_endpoint_rejects_blank_capture(client):
+    """Test that the quality gate applies before extraction"""
+    img_io = io.BytesIO()
+    Image.fromarray(np.full((200, 200), 128, dtype=np.uint8)).save(img_io, "PNG")
+    img_io.seek(0)
+    
+    response = client.post("/api/minutiae", files={"file": ("blank.png", img_io, "image/png")})
+    
+    assert response.status_code == 422
+    assert response.json()["error_code"] == "LOW_QUALITY"
@@ -0,0 +1,35 @@
+"""
+Profiling helper tests
+"""
+
+import numpy as np
+
+from app.config import settings
+from app.profiling import StageTimer, sampled_profile, PROFILE_DIR
+
+
+def test_stage_timer_records_order_and_memory():
+    """Test named stages and optional peak-memory sampling"""
+    timer = StageTimer(track_memory=True)
+    with timer.stage("allocate"):
+        np.ones(1_000_000)
+    with timer.stage("noop"):
+        pass
+    
+    assert [entry["name"] for entry in timer.stages] == ["allocate", "noop"]
+    assert timer.stages[0]["peak_memory_bytes"] >= 8_000_000
+    assert timer.stages[1]["peak_memory_bytes"] < 8_000_000
+
+
+def test_sampled_profile_dumps_when_sampled(monkeypatch):
+    """Test that a sampled call writes a cProfile dump"""
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    before = set(PROFILE_DIR.glob("unittest_*.prof")) if PROFILE_DIR.exists() else set()
+    
+    with sampled_profile("unittest"):
+        sum(range(1000))
+    
+    written = set(PROFILE_DIR.glob("unittest_*.prof")) - before
+    assert len(written) == 1
+    for path in written:
+        path.unlink()
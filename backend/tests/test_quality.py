@@ -0,0 +1,69 @@
+"""
+Quality assessment and early rejection tests
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.quality import assess_quality
+from tests.test_enhancer import _synthetic_fingerprint
+
+
+def _noise(rows=400, cols=400, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (rows, cols)).astype(np.uint8)
+
+
+def _png(pixels):
+    img_io = io.BytesIO()
+    Image.fromarray(pixels).save(img_io, "PNG")
+    img_io.seek(0)
+    return img_io
+
+
+def test_clean_ridges_outscore_noise_and_low_contrast():
+    """Test that coherence, contrast and area each pull the score down"""
+    ridges = _synthetic_fingerprint()
+    clean = assess_quality(ridges)
+    faint = assess_quality((128 + (ridges.astype(float) - 128) * 0.1).astype(np.uint8))
+    noise = assess_quality(_noise())
+    partial_img = np.full((480, 400), 200, dtype=np.uint8)
+    partial_img[200:280, 160:240] = ridges[200:280, 160:240]
+    partial = assess_quality(partial_img)
+    
+    assert clean.score > 60 and clean.coherence > 0.8
+    assert noise.coherence < 0.2 and noise.score < 20
+    assert faint.contrast < clean.contrast / 5 and faint.score < 20
+    assert partial.foreground_fraction < 0.1 and partial.score < clean.score / 2
+
+
+def test_blank_image_scores_zero():
+    """Test that a flat frame is scored instead of raising"""
+    report = assess_quality(np.full((200, 200), 128, dtype=np.uint8))
+    assert report.score == 0
+
+
+def test_quality_endpoint(client, ridge_image_file):
+    """Test /api/quality returns the score and its components"""
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post("/api/quality", files={"file": (filename, file_io, content_type)})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["acceptable"] is True
+    assert data["score"] >= data["min_score"]
+    assert 0 < data["coherence"] <= 1
+    assert data["dimensions"] == [200, 240]
+
+
+def test_low_quality_upload_is_rejected_before_enhancement(client):
+    """Test that noise is rejected with a structured LOW_QUALITY error"""
+    response = client.post("/api/enhance", files={"file": ("noise.png", _png(_noise(seed=7)), "image/png")})
+    
+    assert response.status_code == 422
+    body = response.json()
+    assert body["error_code"] == "LOW_QUALITY"
+    assert body["quality"]["score"] < 20
+    assert set(body["quality"]) == {"score", "coherence", "contrast", "foreground_fraction"}
@@ -0,0 +1,102 @@
+"""
+Shared-memory slab handoff tests
+"""
+
+import asyncio
+import time
+
+import cv2
+import pytest
+
+from app.slabs import MIN_SLAB_BYTES, SlabHandle, SlabPool, read_result, run_on_slab, size_class
+from app.utils import enhance_image_bytes
+from app.workers import EnhancementPool
+from benchmarks.synthetic import synthetic_fingerprint
+
+
+def _reverse(upload, suffix=b""):
+    return bytes(upload)[::-1] + suffix, len(upload)
+
+
+def _slow_reverse(upload, delay):
+    time.sleep(delay)
+    return _reverse(upload)
+
+
+def test_slabs_are_recycled_within_budget():
+    """Test size classes, reuse of released slabs and falling back when full"""
+    assert size_class(10) == MIN_SLAB_BYTES
+    assert size_class(MIN_SLAB_BYTES + 1) == 2 * MIN_SLAB_BYTES
+
+    pool = SlabPool(3 * MIN_SLAB_BYTES)
+    first = pool.lease(b"abc")
+    assert bytes(first.buf[:3]) == b"abc"
+    pool.release(first)
+    second = pool.lease(b"xyz", capacity=100)
+    assert second.name == first.name and (pool.created, pool.reused) == (1, 1)
+
+    large = pool.lease(b"", capacity=2 * MIN_SLAB_BYTES)
+    assert pool.lease(b"more") is None
+    pool.release(second)
+    pool.release(large)
+    # A size class with no idle slab evicts idle slabs of other sizes
+    assert pool.lease(b"", capacity=3 * MIN_SLAB_BYTES) is None
+    assert pool.lease(b"", capacity=MIN_SLAB_BYTES + 1).size == 2 * MIN_SLAB_BYTES
+    pool.clear()
+    assert pool.total_bytes == 2 * MIN_SLAB_BYTES
+    assert SlabPool(0).lease(b"abc") is None
+
+
+def test_run_on_slab_writes_result_back_when_it_fits():
+    """Test that a fitting result comes back as a length and an oversized one inline"""
+    pool = SlabPool(MIN_SLAB_BYTES)
+    slab = pool.lease(b"abc")
+    try:
+        result, size = run_on_slab(_reverse, SlabHandle(slab.name, 3, slab.size))
+        assert (result, size) == (3, 3)
+        assert read_result(slab, result) == b"cba"
+
+        # The first result was written over the input
+        oversized = b"x" * slab.size
+        result, _ = run_on_slab(_reverse, SlabHandle(slab.name, 3, slab.size), oversized)
+        assert result == b"abc" + oversized
+    finally:
+        pool.release(slab)
+        pool.clear()
+
+
+@pytest.mark.anyio
+async def test_run_shared_matches_pickled_enhancement():
+    """Test that the shared-memory path returns the same output and reuses its slab"""
+    contents = cv2.imencode(".bmp", synthetic_fingerprint(768, seed=3, ridge_period=18))[1].tobytes()
+    pool = EnhancementPool(1, 16 * MIN_SLAB_BYTES)
+    try:
+        expected, _, _ = await pool.run(enhance_image_bytes, contents, None, False, "png")
+        for _ in range(2):
+            image_bytes, output_path, stats = await pool.run_shared(
+                enhance_image_bytes, contents, 1 << 20, None, False, "png"
+            )
+            assert image_bytes == expected
+            assert output_path is None and stats["original_size"] == len(contents)
+        assert (pool.slabs.created, pool.slabs.reused) == (1, 1)
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.anyio
+async def test_cancelled_caller_keeps_slab_until_worker_finishes():
+    """Test that a slab is only recycled once the worker is done with it"""
+    pool = EnhancementPool(1, 4 * MIN_SLAB_BYTES)
+    pool.start()
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run_shared(_slow_reverse, b"x" * MIN_SLAB_BYTES, 0, 1.0), 0.2)
+        assert pool.slabs.lease(b"", capacity=MIN_SLAB_BYTES) is not None
+        assert pool.slabs.reused == 0
+
+        deadline = time.monotonic() + 10
+        while not pool.slabs._idle.get(MIN_SLAB_BYTES) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert pool.slabs._idle.get(MIN_SLAB_BYTES)
+    finally:
+        pool.shutdown()
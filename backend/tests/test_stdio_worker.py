@@ -0,0 +1,54 @@
+"""
+Framed stdin/stdout enhancement worker tests
+"""
+
+import io
+import subprocess
+import sys
+from pathlib import Path
+
+from app.stdio_worker import read_frame, serve, write_frame
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_serve_answers_pipelined_requests_in_order(ridge_image_file):
+    """Test ping, enhance and error replies matched by request id"""
+    requests = io.BytesIO()
+    write_frame(requests, {"id": 1, "op": "ping"})
+    write_frame(requests, {"id": 2, "op": "enhance"}, ridge_image_file[1].getvalue())
+    write_frame(requests, {"id": 3, "op": "enhance"}, b"not an image")
+    requests.seek(0)
+    
+    responses = io.BytesIO()
+    serve(requests, responses)
+    responses.seek(0)
+    
+    pong, _ = read_frame(responses)
+    assert (pong["id"], pong["pong"]) == (1, True)
+    
+    enhanced, jpeg_bytes = read_frame(responses)
+    assert enhanced["ok"] is True and enhanced["id"] == 2
+    assert jpeg_bytes[:2] == b"\xff\xd8"
+    assert enhanced["stats"]["dimensions"] == [200, 240]
+    
+    failed, payload = read_frame(responses)
+    assert (failed["id"], failed["ok"], payload) == (3, False, b"")
+    assert failed["error_code"] == "IMAGE_PROCESSING_ERROR"
+    assert read_frame(responses) is None
+
+
+def test_worker_process_keeps_stdout_for_frames():
+    """Test that logging does not corrupt the frame stream of a real worker"""
+    requests = io.BytesIO()
+    write_frame(requests, {"id": 1, "op": "ping"})
+    
+    result = subprocess.run(
+        [sys.executable, "-m", "app.stdio_worker"],
+        input=requests.getvalue(), capture_output=True, cwd=BACKEND_DIR, timeout=120
+    )
+    
+    assert result.returncode == 0
+    header, _ = read_frame(io.BytesIO(result.stdout))
+    assert header["pong"] is True
+    assert b"ready" in result.stderr
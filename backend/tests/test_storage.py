@@ -0,0 +1,80 @@
+"""
+Output storage and retention sweeper tests
+"""
+
+import time
+
+import pytest
+
+from app.config import settings
+from app.storage import RetentionIndex, RetentionSweeper, adopt_existing_files, output_path_for, resolve_output
+
+
+def test_sweep_only_removes_expired_files(tmp_path):
+    """Test that a sweep deletes expired entries and keeps the rest"""
+    index = RetentionIndex(str(tmp_path / "index.sqlite3"))
+    old, fresh = tmp_path / "old.jpg", tmp_path / "fresh.jpg"
+    old.write_bytes(b"old")
+    fresh.write_bytes(b"fresh")
+    index.track([str(old)], retention_seconds=-1)
+    index.track([str(fresh)], retention_seconds=3600)
+    
+    assert index.sweep() == 1
+    assert not old.exists()
+    assert fresh.exists()
+    assert len(index) == 1
+
+
+def test_adopt_existing_files_uses_mtime(tmp_path, monkeypatch):
+    """Test that files predating the index expire from their mtime"""
+    import os
+    monkeypatch.setattr(settings, "file_retention_hours", 1)
+    index = RetentionIndex(str(tmp_path / "index.sqlite3"))
+    legacy = tmp_path / "outputs" / "legacy.jpg"
+    legacy.parent.mkdir()
+    legacy.write_bytes(b"legacy")
+    stale = time.time() - 2 * 3600
+    os.utime(legacy, (stale, stale))
+    
+    assert adopt_existing_files(index, [str(legacy.parent)]) == 1
+    assert adopt_existing_files(index, [str(legacy.parent)]) == 0
+    assert index.sweep() == 1
+    assert not legacy.exists()
+
+
+def test_saved_outputs_are_sharded_and_resolvable(tmp_path, monkeypatch):
+    """Test sharded placement, download lookup and legacy flat files"""
+    from app.utils import save_enhanced_bytes
+    monkeypatch.setattr(settings, "enhanced_dir", str(tmp_path))
+    
+    path = save_enhanced_bytes(b"jpeg", "finger.png")
+    name = path.rsplit("/", 1)[-1]
+    assert path == str(output_path_for(name))
+    assert resolve_output(name) == output_path_for(name)
+    
+    (tmp_path / "enhanced_legacy.jpg").write_bytes(b"jpeg")
+    assert resolve_output("enhanced_legacy.jpg") == tmp_path / "enhanced_legacy.jpg"
+    assert resolve_output("../enhanced_legacy.jpg") is None
+    assert resolve_output("missing.jpg") is None
+
+
+@pytest.mark.anyio
+async def test_sweeper_runs_in_background(tmp_path):
+    """Test that the started sweeper clears expired files without a request"""
+    import asyncio
+    index = RetentionIndex(str(tmp_path / "index.sqlite3"))
+    expired = tmp_path / "expired.jpg"
+    expired.write_bytes(b"jpeg")
+    index.track([str(expired)], retention_seconds=-1)
+    
+    sweeper = RetentionSweeper(index, interval_seconds=0.05, directories=[])
+    sweeper.start()
+    try:
+        for _ in range(100):
+            if not expired.exists():
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await sweeper.stop()
+    
+    assert not expired.exists()
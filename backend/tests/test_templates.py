@@ -0,0 +1,171 @@
+"""
+Template index enrollment and 1:N search tests
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.minutiae import Minutiae
+from app import template_index
+from app.template_index import TemplateIndex, make_template, score_candidates
+
+
+def _finger(rng, count=40):
+    return rng.uniform(0, 320, count), rng.uniform(0, 420, count), rng.uniform(0, 2 * np.pi, count)
+
+
+def _impression(rng, finger, rotation=0.0, shift=(0.0, 0.0), jitter=2.0):
+    """Template of a finger seen rotated, shifted and with 10% of minutiae missed"""
+    x, y, angle = finger
+    kept = rng.random(len(x)) > 0.1
+    x, y, angle = x[kept], y[kept], angle[kept]
+    cos, sin = np.cos(rotation), np.sin(rotation)
+    moved_x = cos * x - sin * y + shift[0] + rng.normal(0, jitter, len(x))
+    moved_y = sin * x + cos * y + shift[1] + rng.normal(0, jitter, len(x))
+    # Rotating y-down coordinates by +rotation turns displayed directions clockwise
+    moved_angle = np.mod(-(angle + rotation + rng.normal(0, 0.1, len(x))), 2 * np.pi)
+    return make_template(Minutiae(
+        np.round(moved_x).astype(np.int32), np.round(moved_y).astype(np.int32), moved_angle.astype(np.float32),
+        np.ones(len(x), dtype=np.uint8), np.ones(len(x), dtype=np.float32), 8.0
+    ))
+
+
+def _dislocations_png(seed=3, count=12, size=320, period=9, rotation=0):
+    """Parallel ridges broken by phase dislocations, i.e. known minutiae"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    phase = 2 * np.pi * y / period
+    for center_x, center_y in rng.uniform(40, size - 40, (count, 2)):
+        phase += rng.choice([-1, 1]) * np.arctan2(y - center_y, x - center_x)
+    img = Image.fromarray((127 + 100 * np.sin(phase)).astype(np.uint8))
+    if rotation:
+        img = img.rotate(rotation, resample=Image.BILINEAR, fillcolor=127)
+    img_io = io.BytesIO()
+    img.save(img_io, "PNG")
+    img_io.seek(0)
+    return img_io
+
+
+def test_search_finds_rotated_and_shifted_mate(tmp_path):
+    """Test that the prefilter shortlists the mate and alignment ranks it first"""
+    rng = np.random.default_rng(0)
+    fingers = [_finger(rng) for _ in range(300)]
+    index = TemplateIndex(str(tmp_path))
+    for number, finger in enumerate(fingers):
+        index.add(f"subject-{number}", _impression(rng, finger))
+    
+    for number in (7, 150, 299):
+        query = _impression(rng, fingers[number], rotation=0.3, shift=(25, -15))
+        candidates, shortlisted = index.search(query, limit=5, shortlist=20)
+        
+        assert shortlisted == 20
+        assert candidates[0]["subject_id"] == f"subject-{number}"
+        assert candidates[0]["score"] > 3 * candidates[1]["score"]
+
+
+def test_inverted_index_counts_shared_keys_across_rebuilds(tmp_path, monkeypatch):
+    """Test that indexed and newly enrolled rows are looked up exactly like a full comparison"""
+    monkeypatch.setattr(template_index, "TAIL_MIN_ROWS", 16)
+    rng = np.random.default_rng(4)
+    fingers = [_finger(rng) for _ in range(120)]
+    index = TemplateIndex(str(tmp_path))
+    templates = [_impression(rng, finger) for finger in fingers]
+    for number, template in enumerate(templates):
+        index.add(f"subject-{number}", template)
+    
+    assert len(index) == 120 and 0 < index._indexed < 120
+    # Only the current generation of postings is kept
+    assert [path.name for path in tmp_path.glob("postings-*")] == [f"postings-{index._indexed}.u32"]
+    
+    query = _impression(rng, fingers[5], rotation=0.3, shift=(25, -15))
+    query_keys = template_index.triplet_keys(query).astype(np.int64)
+    rows, shared = template_index._shared_keys(
+        query_keys, index._postings, index._offsets, index._indexed, index._headers[index._indexed:120], index._keys
+    )
+    expected = np.array([len(np.intersect1d(query_keys, template_index.triplet_keys(t))) for t in templates])
+    assert rows.tolist() == np.flatnonzero(expected).tolist()
+    assert shared.tolist() == expected[expected > 0].tolist()
+    # Unrelated templates rarely share a key, so most rows are never touched
+    assert len(rows) < 60 and rows[shared.argmax()] == 5
+    
+    candidates, shortlisted = index.search(query, limit=1, shortlist=100)
+    assert shortlisted == len(rows)
+    assert candidates[0]["subject_id"] == "subject-5"
+
+
+def test_score_is_symmetric_in_quality(tmp_path):
+    """Test that an identical template scores 1 and an unrelated one near 0"""
+    rng = np.random.default_rng(1)
+    template = _impression(rng, _finger(rng), jitter=0)
+    rows = np.zeros((2, template_index.MAX_TEMPLATE_MINUTIAE), dtype=template_index.MINUTIA_DTYPE)
+    rows[0, :len(template)] = template
+    other = _impression(rng, _finger(rng))
+    rows[1, :len(other)] = other
+    
+    scores = score_candidates(template, rows, np.array([len(template), len(other)]))
+    
+    assert scores[0] == pytest.approx(1.0)
+    assert scores[1] < 0.1
+
+
+def test_index_grows_and_is_shared_between_instances(tmp_path, monkeypatch):
+    """Test that rows appended by one opener (process) are seen by another"""
+    monkeypatch.setattr(template_index, "INITIAL_CAPACITY", 4)
+    rng = np.random.default_rng(2)
+    writer, reader = TemplateIndex(str(tmp_path)), TemplateIndex(str(tmp_path))
+    assert len(reader) == 0
+    
+    fingers = [_finger(rng) for _ in range(10)]
+    ids = [writer.add(f"subject-{number % 5}", _impression(rng, finger)) for number, finger in enumerate(fingers)]
+    
+    assert ids == list(range(10))
+    assert len(reader) == 10
+    candidates, _ = reader.search(_impression(rng, fingers[8]), limit=10)
+    assert candidates[0] == {"subject_id": "subject-3", "template_id": 8, "score": candidates[0]["score"]}
+    # One entry per subject even though each has two templates
+    assert len({candidate["subject_id"] for candidate in candidates}) == len(candidates) == 5
+
+
+def test_enroll_and_search_endpoints(client, tmp_path, monkeypatch):
+    """Test enrolling a capture and finding it again through the API"""
+    monkeypatch.setattr(settings, "template_index_dir", str(tmp_path))
+    
+    enrolled = client.post(
+        "/api/templates", params={"subject_id": "alice"},
+        files={"file": ("print.png", _dislocations_png(), "image/png")}
+    )
+    assert enrolled.status_code == 200
+    assert enrolled.json()["template_id"] == 0 and enrolled.json()["index_size"] == 1
+    client.post(
+        "/api/templates", params={"subject_id": "bob"},
+        files={"file": ("other.png", _dislocations_png(seed=11), "image/png")}
+    )
+    
+    response = client.post("/api/templates/search", files={"file": ("print.png", _dislocations_png(), "image/png")})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["index_size"] == 2
+    assert data["candidates"][0]["subject_id"] == "alice"
+    assert data["candidates"][0]["score"] > 90
+    
+    rotated = client.post(
+        "/api/templates/search", files={"file": ("turned.png", _dislocations_png(rotation=20), "image/png")}
+    ).json()
+    assert rotated["candidates"][0]["subject_id"] == "alice"
+    assert rotated["candidates"][0]["score"] > 3 * rotated["candidates"][1]["score"]
+
+
+def test_enroll_rejects_capture_without_minutiae(client, tmp_path, monkeypatch, ridge_image_file):
+    """Test that a print with too few minutiae to match is refused"""
+    monkeypatch.setattr(settings, "template_index_dir", str(tmp_path))
+    filename, file_io, content_type = ridge_image_file
+    
+    response = client.post("/api/templates", params={"subject_id": "rings"}, files={"file": (filename, file_io, content_type)})
+    
+    assert response.status_code == 422
+    assert response.json()["error_code"] == "VALIDATION_ERROR"
@@ -0,0 +1,62 @@
+"""
+Tiled full-resolution enhancement tests
+"""
+
+import numpy as np
+
+from app.enhancer import FingerprintEnhancer
+from app.tiling import plan_tiles, enhance_tiled, required_halo
+
+
+def _synthetic_fingerprint(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols]
+    radius = np.hypot(x - cols / 2, y - rows / 2) + 3 * np.sin(x / 30)
+    img = 127 + 90 * np.sin(2 * np.pi * radius / 9) + rng.normal(0, 15, radius.shape)
+    return img.clip(0, 255).astype(np.uint8)
+
+
+def test_small_images_are_not_tiled():
+    """Test that frames within the budget run in one piece"""
+    assert plan_tiles((300, 300), FingerprintEnhancer(), 512 * 1024 * 1024) is None
+
+
+def test_plan_respects_budget_and_alignment():
+    """Test tile sizing against the memory budget and block grid"""
+    enhancer = FingerprintEnhancer()
+    plan = plan_tiles((2000, 1500), enhancer, 20 * 1024 * 1024, max_tile_size=512)
+    
+    assert plan is not None
+    assert plan.tile_size % enhancer.ridge_segment_blksze == 0
+    assert plan.halo == required_halo(enhancer)
+    covered = np.zeros((2000, 1500), dtype=int)
+    for tile in plan.tiles:
+        covered[tile.core] += 1
+    assert (covered == 1).all()
+
+
+def test_tiled_output_is_seamless():
+    """Test that stitched tiles equal whole-frame processing with the same globals"""
+    img = _synthetic_fingerprint(600, 500)
+    plan = plan_tiles(img.shape, FingerprintEnhancer(), 8 * 1024 * 1024, max_tile_size=192)
+    assert len(plan.tiles) > 4
+    
+    tiled = enhance_tiled(img, plan)
+    whole = FingerprintEnhancer().enhance(img, resize=False)
+    
+    assert tiled.shape == img.shape
+    assert np.mean(tiled != whole) < 0.001
+
+
+def test_background_tiles_are_skipped():
+    """Test that tiles without foreground blocks stay empty and the fraction is reported"""
+    img = np.full((700, 700), 200, dtype=np.uint8)
+    img[250:450, 250:450] = _synthetic_fingerprint(200, 200)
+    plan = plan_tiles(img.shape, FingerprintEnhancer(), 8 * 1024 * 1024, max_tile_size=192)
+    
+    tiled = enhance_tiled(img, plan)
+    uncropped = enhance_tiled(img, plan, {"foreground_only": False})
+    
+    assert np.array_equal(tiled, uncropped)
+    assert not tiled[:200].any()
+    assert 0.05 < plan.foreground_fraction < 0.15
@@ -0,0 +1,125 @@
+"""
+Upload ingestion tests
+"""
+
+import io
+import struct
+
+import pytest
+
+from app.config import settings
+from app.exceptions import FileUploadError
+from app.uploads import read_image_header, validate_image_bytes
+
+
+def _bmp_header(width: int, height: int, bits: int = 24) -> bytes:
+    return b"BM" + b"\x00" * 16 + struct.pack("<iiHH", width, height, 1, bits) + b"\x00" * 24
+
+
+def test_reads_image_headers(ridge_image_file):
+    """Test format, dimensions and channels from PNG, JPEG and BMP headers"""
+    import cv2
+    import numpy as np
+    
+    header = read_image_header(ridge_image_file[1].getvalue())
+    assert (header.format, header.width, header.height) == ("png", 200, 240)
+    
+    ok, jpeg = cv2.imencode(".jpg", np.zeros((123, 456, 3), dtype=np.uint8))
+    header = read_image_header(jpeg.tobytes()[:1024])  # only the header is needed
+    assert (header.format, header.width, header.height, header.channels) == ("jpeg", 456, 123, 3)
+    
+    header = read_image_header(_bmp_header(640, -480, bits=8))
+    assert (header.width, header.height, header.channels) == (640, 480, 1)
+    assert read_image_header(b"not an image") is None
+
+
+def test_validate_rejects_non_images_and_huge_frames(monkeypatch):
+    """Test that sniffing ignores names and content types"""
+    with pytest.raises(FileUploadError):
+        validate_image_bytes(b"GIF89a" + b"\x00" * 100)
+    
+    monkeypatch.setattr(settings, "max_image_megapixels", 10)
+    with pytest.raises(FileUploadError):
+        validate_image_bytes(_bmp_header(5000, 5000))
+
+
+def test_enhance_sniffs_content_not_content_type(client, ridge_image_file):
+    """Test that a PNG labelled as text is accepted and a fake JPEG is not"""
+    _, file_io, _ = ridge_image_file
+    
+    response = client.post(
+        "/api/enhance",
+        files={"file": ("scan.bin", file_io.getvalue(), "application/octet-stream")}
+    )
+    assert response.status_code == 200
+    
+    response = client.post(
+        "/api/enhance",
+        files={"file": ("scan.jpg", b"<html>not a jpeg</html>", "image/jpeg")}
+    )
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "FILE_UPLOAD_ERROR"
+
+
+def test_oversized_upload_is_rejected_with_413(client, monkeypatch):
+    """Test both the per-file cap and the streamed request body cap"""
+    monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+    payload = b"\x89PNG\r\n\x1a\n" + b"\x00" * (2 * 1024 * 1024)
+    
+    response = client.post("/api/enhance", files={"file": ("big.png", payload, "image/png")})
+    assert response.status_code == 413
+    assert response.json()["error_code"] == "PAYLOAD_TOO_LARGE"
+    
+    # Without a usable Content-Length the cap applies while streaming
+    def chunks():
+        yield b"--x\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.png\"\r\n\r\n"
+        for _ in range(40):
+            yield b"\x00" * 65536
+        yield b"\r\n--x--\r\n"
+    
+    response = client.post(
+        "/api/enhance",
+        content=chunks(),
+        headers={"Content-Type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 413
+
+
+def test_batch_body_is_capped_by_total_size(client, monkeypatch):
+    """Test that a batch is limited by MAX_BATCH_SIZE_MB rather than files x per-file cap"""
+    monkeypatch.setattr(settings, "max_upload_size_mb", 1)
+    monkeypatch.setattr(settings, "max_batch_size_mb", 1)
+    part = b"\x89PNG\r\n\x1a\n" + b"\x00" * (600 * 1024)
+    
+    response = client.post(
+        "/api/enhance/batch",
+        files=[("files", ("a.png", part, "image/png")), ("files", ("b.png", part, "image/png"))]
+    )
+    assert response.status_code == 413
+    assert response.json()["error_code"] == "PAYLOAD_TOO_LARGE"
+
+
+@pytest.mark.anyio
+async def test_read_upload_sniffs_spooled_file_before_loading_it(ridge_image_file):
+    """Test that uploads spool to disk and non-images fail on their first bytes"""
+    from starlette.datastructures import UploadFile
+    from starlette.formparsers import MultiPartParser
+    from app.uploads import HEADER_SCAN_BYTES, read_upload
+    
+    # The app must not raise the parser's in-memory threshold to the upload cap
+    assert MultiPartParser.max_file_size == 1024 * 1024
+    
+    _, file_io, _ = ridge_image_file
+    contents, header = await read_upload(UploadFile(io.BytesIO(file_io.getvalue())))
+    assert contents == file_io.getvalue() and header.format == "png"
+    
+    class CountingReads(io.BytesIO):
+        requested = 0
+        
+        def read(self, size=-1):
+            CountingReads.requested += size if size >= 0 else len(self.getvalue())
+            return super().read(size)
+    
+    with pytest.raises(FileUploadError):
+        await read_upload(UploadFile(CountingReads(b"%PDF-1.7" + b"\x00" * (4 * 1024 * 1024))))
+    assert CountingReads.requested == HEADER_SCAN_BYTES
@@ -0,0 +1,28 @@
+"""
+Enhancement worker pool tests
+"""
+
+import os
+import pytest
+
+from app.workers import EnhancementPool, _ping
+
+
+def test_pool_size_defaults_to_cpu_count():
+    """Test that a non-positive size means one worker per core"""
+    pool = EnhancementPool(0)
+    assert pool.max_workers == (os.cpu_count() or 1)
+    assert pool.started is False
+
+
+@pytest.mark.anyio
+async def test_pool_runs_in_separate_process():
+    """Test that work runs outside the calling process"""
+    pool = EnhancementPool(1)
+    pool.start()
+    try:
+        worker_pid = await pool.run(_ping, 0)
+        assert worker_pid != os.getpid()
+    finally:
+        pool.shutdown()
+    assert pool.started is False
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import Header from './components/Header';
 import UploadSection from './components/UploadSection';
 import PreviewSection from './components/PreviewSection';
@@ -9,6 +9,9 @@ import axios from 'axios';
 import './App.css';
 
 const API_URL = process.env.REACT_APP_API_URL || 'https://fingerprint-enhancer-we.onrender.com';
+const JOB_POLL_INTERVAL_MS = 500;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 function App() {
   const [originalImage, setOriginalImage] = useState(null);
@@ -18,6 +21,9 @@ function App() {
   const [message, setMessage] = useState(null);
   const [currentFile, setCurrentFile] = useState(null);
   const [enhancedFileName, setEnhancedFileName] = useState(null);
+  const [isPreview, setIsPreview] = useState(false);
+  // Bumped on every new enhancement or reset so stale job polls stop
+  const requestToken = useRef(0);
 
   const showMessage = (text, type) => {
     setMessage({ text, type });
@@ -39,50 +45,121 @@ function App() {
     const reader = new FileReader();
     reader.onload = (e) => {
       setOriginalImage(e.target.result);
-      setEnhancedImage(null);
+      setEnhancedImage((previous) => {
+        if (previous) {
+          URL.revokeObjectURL(previous);
+        }
+        return null;
+      });
     };
     reader.readAsDataURL(file);
   };
 
+  const replaceEnhancedImage = (blob) => {
+    setEnhancedImage((previous) => {
+      if (previous) {
+        URL.revokeObjectURL(previous);
+      }
+      return URL.createObjectURL(blob);
+    });
+  };
+
+  // Error bodies are still JSON, but arrive as a Blob with responseType 'blob'
+  const errorDetail = async (error) => {
+    let detail = error.response?.data;
+    if (detail instanceof Blob) {
+      try {
+        detail = JSON.parse(await detail.text());
+      } catch (parseError) {
+        detail = null;
+      }
+    }
+    return detail?.message || detail?.error || error.message;
+  };
+
+  // Poll the full-resolution job queued behind a preview and swap it in
+  const awaitFullResult = async (jobId, token) => {
+    for (;;) {
+      await sleep(JOB_POLL_INTERVAL_MS);
+      if (requestToken.current !== token) return;
+
+      const { data: job } = await axios.get(`${API_URL}/api/jobs/${jobId}`);
+      if (job.status === 'failed') {
+        throw new Error(job.message || 'Full-resolution enhancement failed');
+      }
+      if (job.status === 'done') {
+        const result = await axios.get(`${API_URL}${job.result_url}`, { responseType: 'blob' });
+        if (requestToken.current !== token) return;
+        replaceEnhancedImage(result.data);
+        setEnhancedFileName(job.file_name || null);
+        setIsPreview(false);
+        return;
+      }
+    }
+  };
+
   const enhanceImage = async (file) => {
+    const token = ++requestToken.current;
     setLoading(true);
     setIsEnhancing(true);
 
     const formData = new FormData();
     formData.append('file', file);
 
+    let jobId = null;
     try {
-      const response = await axios.post(`${API_URL}/api/enhance`, formData, {
+      // A quick working-size preview comes back first; the full-resolution
+      // result is queued as a job. Raw JPEG body, metadata in headers. A
+      // busy server answers 202 without a preview and only queues the job.
+      const response = await axios.post(`${API_URL}/api/enhance?preview=true&full_resolution=true`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
+          Accept: 'image/jpeg',
         },
+        responseType: 'blob',
       });
 
-      const data = response.data;
-      setEnhancedImage(data.enhanced_image);
-      setEnhancedFileName(data.file_name);
-      showMessage('Fingerprint enhanced successfully!', 'success');
+      if (response.status !== 202) {
+        replaceEnhancedImage(response.data);
+        setIsPreview(true);
+      }
+      jobId = response.headers['x-job-id'];
     } catch (error) {
-      showMessage(
-        `Enhancement failed: ${error.response?.data?.error || error.message}`,
-        'error'
-      );
+      showMessage(`Enhancement failed: ${await errorDetail(error)}`, 'error');
       reset();
+      return;
     } finally {
       setLoading(false);
-      setIsEnhancing(false);
+    }
+
+    try {
+      await awaitFullResult(jobId, token);
+      if (requestToken.current === token) {
+        showMessage('Fingerprint enhanced successfully!', 'success');
+      }
+    } catch (error) {
+      if (requestToken.current === token) {
+        showMessage(`Full-resolution enhancement failed: ${await errorDetail(error)}`, 'error');
+      }
+    } finally {
+      if (requestToken.current === token) {
+        setIsEnhancing(false);
+      }
     }
   };
 
   const downloadEnhancedImage = () => {
-    if (!enhancedFileName) {
+    if (!enhancedImage) {
       showMessage('No enhanced image available', 'error');
       return;
     }
 
+    // The API only keeps a server-side copy when asked to (?save=true), so
+    // download straight from the object URL we already have.
+    const downloadName = enhancedFileName || `enhanced_${currentFile?.name || 'fingerprint.jpg'}`;
     const link = document.createElement('a');
-    link.href = `${API_URL}/api/download/${enhancedFileName}`;
-    link.download = enhancedFileName;
+    link.href = enhancedFileName ? `${API_URL}/api/download/${enhancedFileName}` : enhancedImage;
+    link.download = downloadName;
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
@@ -90,6 +167,12 @@ function App() {
   };
 
   const reset = () => {
+    requestToken.current += 1;
+    if (enhancedImage) {
+      URL.revokeObjectURL(enhancedImage);
+    }
+    setIsPreview(false);
+    setIsEnhancing(false);
     setCurrentFile(null);
     setEnhancedFileName(null);
     setOriginalImage(null);
@@ -114,6 +197,7 @@ function App() {
           <PreviewSection
             originalImage={originalImage}
             enhancedImage={enhancedImage}
+            isPreview={isPreview}
             isEnhancing={isEnhancing}
             onReset={reset}
             onDownload={downloadEnhancedImage}
@@ -1,7 +1,7 @@
 import React from 'react';
 import './PreviewSection.css';
 
-function PreviewSection({ originalImage, enhancedImage, isEnhancing, onReset, onDownload, onEnhance }) {
+function PreviewSection({ originalImage, enhancedImage, isPreview, isEnhancing, onReset, onDownload, onEnhance }) {
   return (
     <div className="preview-section">
       <div className="image-comparison">
@@ -13,8 +13,8 @@ function PreviewSection({ originalImage, enhancedImage, isEnhancing, onReset, on
         <div className="image-wrapper enhanced">
           {enhancedImage ? (
             <>
-              <img src={enhancedImage} alt="Enhanced" />
-              <label>Enhanced Image</label>
+              <img src={enhancedImage} alt="Enhanced" className={isPreview ? 'preview' : undefined} />
+              <label>{isPreview ? 'Preview (full resolution in progress...)' : 'Enhanced Image'}</label>
             </>
           ) : isEnhancing ? (
             <div className="placeholder">
@@ -41,7 +41,7 @@ function PreviewSection({ originalImage, enhancedImage, isEnhancing, onReset, on
         <button
           className="btn btn-success"
           onClick={onDownload}
-          disabled={!enhancedImage}
+          disabled={!enhancedImage || isPreview}
         >
           Download Enhanced Image
         </button>
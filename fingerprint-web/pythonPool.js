@@ -0,0 +1,208 @@
+const { spawn } = require('child_process');
+const path = require('path');
+
+// Pool of long-lived Python enhancement workers (backend/app/stdio_worker.py).
+//
+// Each frame is a 4-byte big-endian header length, a JSON header and a payload
+// whose size is the header's `length`. Requests carry an id, so several can be
+// pipelined to one worker and replies are matched by id. Workers are pinged
+// periodically and respawned when they exit or stop answering.
+
+const BACKEND_DIR = path.join(__dirname, '..', 'backend');
+
+function encodeFrame(header, payload = Buffer.alloc(0)) {
+  const json = Buffer.from(JSON.stringify({ ...header, length: payload.length }));
+  const prefix = Buffer.alloc(4);
+  prefix.writeUInt32BE(json.length, 0);
+  return Buffer.concat([prefix, json, payload]);
+}
+
+class PythonWorker {
+  constructor(pool, index) {
+    this.pool = pool;
+    this.index = index;
+    this.pending = new Map();
+    this.buffer = Buffer.alloc(0);
+    this.ready = false;
+    this.pinging = false;
+    this.spawn();
+  }
+
+  spawn() {
+    const { python, backendDir } = this.pool.options;
+    const child = spawn(python, ['-m', 'app.stdio_worker'], {
+      cwd: backendDir,
+      stdio: ['pipe', 'pipe', 'pipe'],
+    });
+    this.process = child;
+    this.ready = false;
+    this.buffer = Buffer.alloc(0);
+
+    child.stdout.on('data', (chunk) => this.onData(chunk));
+    child.stderr.on('data', (data) => {
+      process.stderr.write(`[python worker ${this.index}] ${data}`);
+    });
+    // Writes to a dead worker fail with EPIPE; onExit handles the fallout
+    child.stdin.on('error', () => {});
+    child.on('exit', (code, signal) => this.onExit(code, signal));
+    child.on('error', (err) => {
+      console.error(`Python worker ${this.index} failed to start: ${err.message}`);
+      if (child.pid === undefined) {
+        this.onExit(null, null);
+      }
+    });
+
+    // The first pong arrives once imports and kernel warm-up are done
+    this.ping()
+      .then(() => {
+        this.ready = true;
+        this.pool.dispatch();
+      })
+      .catch(() => {});
+  }
+
+  get load() {
+    return this.pending.size;
+  }
+
+  send(header, payload) {
+    return new Promise((resolve, reject) => {
+      const id = this.pool.nextId++;
+      this.pending.set(id, { resolve, reject });
+      this.process.stdin.write(encodeFrame({ ...header, id }, payload), (err) => {
+        if (err && this.pending.delete(id)) {
+          reject(err);
+        }
+      });
+    });
+  }
+
+  onData(chunk) {
+    this.buffer = Buffer.concat([this.buffer, chunk]);
+    for (;;) {
+      if (this.buffer.length < 4) return;
+      const headerLength = this.buffer.readUInt32BE(0);
+      if (this.buffer.length < 4 + headerLength) return;
+      const header = JSON.parse(this.buffer.subarray(4, 4 + headerLength).toString());
+      const end = 4 + headerLength + (header.length || 0);
+      if (this.buffer.length < end) return;
+
+      const payload = this.buffer.subarray(4 + headerLength, end);
+      this.buffer = this.buffer.subarray(end);
+
+      const request = this.pending.get(header.id);
+      if (!request) continue;
+      this.pending.delete(header.id);
+      if (header.ok) {
+        request.resolve({ header, payload: Buffer.from(payload) });
+      } else {
+        const error = new Error(header.message || 'Enhancement failed');
+        error.code = header.error_code;
+        request.reject(error);
+      }
+    }
+  }
+
+  onExit(code, signal) {
+    console.error(`Python worker ${this.index} exited (code ${code}, signal ${signal})`);
+    this.ready = false;
+    for (const { reject } of this.pending.values()) {
+      reject(new Error('Python worker exited'));
+    }
+    this.pending.clear();
+    if (!this.pool.closed) {
+      setTimeout(() => this.spawn(), this.pool.options.respawnDelayMs);
+    }
+  }
+
+  // Resolves on pong; a worker that stays silent past the timeout is killed
+  // (and respawned by onExit). Pings queue behind pipelined work, so the
+  // timeout has to cover maxInFlightPerWorker enhancements.
+  ping() {
+    const timer = setTimeout(() => {
+      console.error(`Python worker ${this.index} unresponsive, restarting`);
+      this.process.kill('SIGKILL');
+    }, this.pool.options.pingTimeoutMs);
+    return this.send({ op: 'ping' }).finally(() => clearTimeout(timer));
+  }
+
+  healthCheck() {
+    if (!this.ready || this.pinging) return;
+    this.pinging = true;
+    this.ping()
+      .catch(() => {})
+      .finally(() => {
+        this.pinging = false;
+      });
+  }
+
+  kill() {
+    this.process.stdin.end();
+    this.process.kill();
+  }
+}
+
+class PythonWorkerPool {
+  constructor(options = {}) {
+    this.options = {
+      size: 2,
+      python: process.env.PYTHON || 'python',
+      backendDir: BACKEND_DIR,
+      maxInFlightPerWorker: 2,
+      pingIntervalMs: 10000,
+      pingTimeoutMs: 120000,
+      respawnDelayMs: 1000,
+      ...options,
+    };
+    this.nextId = 1;
+    this.closed = false;
+    this.queue = [];
+    this.workers = Array.from({ length: this.options.size }, (_, i) => new PythonWorker(this, i));
+    this.healthTimer = setInterval(() => this.workers.forEach((w) => w.healthCheck()), this.options.pingIntervalMs);
+    this.healthTimer.unref();
+  }
+
+  // Enhance image bytes; resolves with { image: Buffer, stats }.
+  // mode is 'standard' or 'pyramid' (coarse orientation/frequency estimation).
+  enhance(imageBuffer, { fullResolution = false, mode = 'standard' } = {}) {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ imageBuffer, fullResolution, mode, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.queue.length > 0) {
+      const worker = this.workers
+        .filter((w) => w.ready && w.load < this.options.maxInFlightPerWorker)
+        .sort((a, b) => a.load - b.load)[0];
+      if (!worker) return;
+
+      const { imageBuffer, fullResolution, mode, resolve, reject } = this.queue.shift();
+      worker
+        .send({ op: 'enhance', full_resolution: fullResolution, mode }, imageBuffer)
+        .then(({ header, payload }) => resolve({ image: payload, stats: header.stats }))
+        .catch(reject)
+        .finally(() => this.dispatch());
+    }
+  }
+
+  status() {
+    return {
+      workers: this.workers.map((w) => ({ pid: w.process.pid, ready: w.ready, inFlight: w.load })),
+      queued: this.queue.length,
+    };
+  }
+
+  close() {
+    this.closed = true;
+    clearInterval(this.healthTimer);
+    this.workers.forEach((w) => w.kill());
+    for (const { reject } of this.queue) {
+      reject(new Error('Worker pool closed'));
+    }
+    this.queue = [];
+  }
+}
+
+module.exports = { PythonWorkerPool, encodeFrame };
@@ -2,8 +2,8 @@ const express = require('express');
 const multer = require('multer');
 const path = require('path');
 const fs = require('fs');
-const { spawn } = require('child_process');
 const cors = require('cors');
+const { PythonWorkerPool } = require('./pythonPool');
 
 const app = express();
 const PORT = process.env.PORT || 5000;
@@ -13,27 +13,21 @@ app.use(cors());
 app.use(express.static('public'));
 app.use(express.json());
 
-// Create upload directories
-const uploadDir = path.join(__dirname, 'uploads');
+// Create output directory (uploads are kept in memory)
 const enhancedDir = path.join(__dirname, 'enhanced');
 
-if (!fs.existsSync(uploadDir)) {
-  fs.mkdirSync(uploadDir, { recursive: true });
-}
 if (!fs.existsSync(enhancedDir)) {
   fs.mkdirSync(enhancedDir, { recursive: true });
 }
 
-// Multer configuration
-const storage = multer.diskStorage({
-  destination: uploadDir,
-  filename: (req, file, cb) => {
-    cb(null, Date.now() + path.extname(file.originalname));
-  }
+// Warm Python workers, reused across uploads instead of one process per request
+const workerPool = new PythonWorkerPool({
+  size: parseInt(process.env.PYTHON_WORKERS, 10) || 2
 });
 
+// Multer configuration: uploads stay in memory and are piped to a worker
 const upload = multer({
-  storage: storage,
+  storage: multer.memoryStorage(),
   fileFilter: (req, file, cb) => {
     const allowedMimes = ['image/jpeg', 'image/png', 'image/jpg', 'image/bmp'];
     if (allowedMimes.includes(file.mimetype)) {
@@ -54,49 +48,36 @@ app.post('/api/enhance', upload.single('image'), (req, res) => {
     return res.status(400).json({ error: 'No file uploaded' });
   }
 
-  const inputPath = req.file.path;
-  const outputPath = path.join(enhancedDir, `enhanced_${req.file.filename}`);
-  const pythonScriptPath = path.join(__dirname, '..', 'src', 'enhance_api.py');
-
-  // Call Python script to enhance image
-  const pythonProcess = spawn('python', [pythonScriptPath, inputPath, outputPath]);
-
-  let errorData = '';
-
-  pythonProcess.stderr.on('data', (data) => {
-    errorData += data.toString();
-  });
-
-  pythonProcess.on('close', (code) => {
-    if (code !== 0) {
-      fs.unlinkSync(inputPath);
-      return res.status(500).json({ error: 'Enhancement failed', details: errorData });
-    }
-
-    // Read the enhanced image
-    fs.readFile(outputPath, (err, data) => {
-      if (err) {
-        return res.status(500).json({ error: 'Could not read enhanced image' });
-      }
-
-      const base64Image = data.toString('base64');
-      
-      // Cleanup
-      fs.unlinkSync(inputPath);
-
-      res.json({
-        success: true,
-        enhanced: `data:image/jpeg;base64,${base64Image}`,
-        fileName: `enhanced_${req.file.originalname}`,
-        outputPath: outputPath
+  const fileName = `enhanced_${Date.now()}.jpg`;
+  const outputPath = path.join(enhancedDir, fileName);
+
+  workerPool
+    .enhance(req.file.buffer)
+    .then(({ image }) => {
+      // Keep a copy for /api/download, fully written before the response
+      // points at it
+      fs.writeFile(outputPath, image, (err) => {
+        if (err) {
+          console.error(`Could not save enhanced image: ${err.message}`);
+        }
+
+        res.json({
+          success: true,
+          enhanced: `data:image/jpeg;base64,${image.toString('base64')}`,
+          fileName: `enhanced_${req.file.originalname}`,
+          outputPath: err ? null : outputPath
+        });
       });
+    })
+    .catch((err) => {
+      res.status(500).json({ error: 'Enhancement failed', details: err.message });
     });
-  });
+});
 
-  pythonProcess.on('error', (err) => {
-    fs.unlinkSync(inputPath);
-    res.status(500).json({ error: 'Python process error', details: err.message });
-  });
+app.get('/api/health', (req, res) => {
+  const status = workerPool.status();
+  const ready = status.workers.some((worker) => worker.ready);
+  res.status(ready ? 200 : 503).json({ status: ready ? 'ok' : 'starting', ...status });
 });
 
 app.get('/api/download/:filename', (req, res) => {
@@ -110,6 +91,13 @@ app.get('/api/download/:filename', (req, res) => {
   res.download(filepath);
 });
 
-app.listen(PORT, () => {
+const server = app.listen(PORT, () => {
   console.log(`🖐️  Fingerprint Enhancer Web Server running on http://localhost:${PORT}`);
 });
+
+const shutdown = () => {
+  workerPool.close();
+  server.close(() => process.exit(0));
+};
+process.on('SIGTERM', shutdown);
+process.on('SIGINT', shutdown);